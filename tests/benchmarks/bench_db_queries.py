@@ -0,0 +1,197 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Query latency benchmark for the schema indexes.
+
+The benchmark creates a synthetic SQLite database with several terms of groups, test
+sets and 100k test results. It measures the latency of the frequent queries of the
+scheduler and the reporting without the indexes and after applying the index
+migration.
+
+Usage (from the repository root): python -m tests.benchmarks.bench_db_queries
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import random
+import tempfile
+import numpy as np
+import sqlalchemy as sa
+import testsystem.config as cnf
+import testsystem.db as db
+import testsystem.migrations as migrations
+import testsystem.models.test_set as testset
+
+from sqlalchemy.orm import Session
+from testsystem.models import Group, MSP430, TestResult, TestSet
+
+TERMS = ["SS22", "WS22", "SS23", "WS23", "SS24"]
+GROUPS_PER_TERM = 40
+RESULT_CNT = 100000
+RESULTS_PER_TEST_SET = 25
+MSP_CNT = 200
+REPETITIONS = 50
+
+
+def _populate(engine: sa.engine.Engine):
+    rnd = random.Random(0)
+    groups = []
+    for term in TERMS:
+        for nr in range(1, GROUPS_PER_TERM + 1):
+            groups.append(
+                {
+                    "id": len(groups) + 1,
+                    "group_nr": nr,
+                    "group_name": Group.get_name(nr, term),
+                    "term": term,
+                    "active": term == TERMS[-1],
+                    "queue_time": 0,
+                    "abs_queue_time": 0,
+                }
+            )
+    test_sets = []
+    results = []
+    for id in range(1, RESULT_CNT // RESULTS_PER_TEST_SET + 1):
+        test_sets.append(
+            {
+                "id": id,
+                "group_id": rnd.randint(1, len(groups)),
+                "commit_hash": f"{id:040x}",
+                "commit_time": rnd.randint(0, 10**12),
+                "finished": rnd.random() > 0.01,
+                "timestamp": 0,
+            }
+        )
+        for tc_id in range(RESULTS_PER_TEST_SET):
+            results.append(
+                {
+                    "test_set_id": id,
+                    "test_case_id": tc_id,
+                    "successful": rnd.random() > 0.3,
+                    "result": rnd.random(),
+                    "timestamp": 0,
+                }
+            )
+    msps = [
+        {"serial_number": f"SN{i:08}", "flash_counter": 0, "defective": False}
+        for i in range(MSP_CNT)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Group.__table__.insert(), groups)
+        conn.execute(TestSet.__table__.insert(), test_sets)
+        conn.execute(TestResult.__table__.insert(), results)
+        conn.execute(MSP430.__table__.insert(), msps)
+
+
+def _drop_indexes(engine: sa.engine.Engine):
+    with engine.begin() as conn:
+        for index_names in migrations._INDEXES.values():
+            for name in index_names:
+                conn.execute(sa.text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def _get_queries(engine: sa.engine.Engine) -> dict:
+    term = TERMS[-1]
+    first_id = (len(TERMS) - 1) * GROUPS_PER_TERM + 1
+    group_ids = list(range(first_id, first_id + GROUPS_PER_TERM))
+    test_set_id = RESULT_CNT // RESULTS_PER_TEST_SET // 2
+
+    def active_groups(session: Session):
+        return (
+            session.query(Group)
+            .where(Group.term == term)
+            .where(Group.active == True)
+            .all()
+        )
+
+    def latest_finished(session: Session):
+        return testset._get_latest_finished_test_sets(session, group_ids)
+
+    def unfinished(session: Session):
+        return session.query(TestSet).filter(TestSet.finished == False).all()
+
+    def test_set_results(session: Session):
+        return (
+            session.query(TestResult)
+            .filter(TestResult.test_set_id == test_set_id)
+            .all()
+        )
+
+    def msp_by_serial(session: Session):
+        return (
+            session.query(MSP430)
+            .filter(MSP430.serial_number == f"SN{MSP_CNT - 1:08}")
+            .first()
+        )
+
+    return {
+        "Active groups of a term": active_groups,
+        "Latest finished test sets": latest_finished,
+        "Unfinished test sets": unfinished,
+        "Results of a test set": test_set_results,
+        "MSP by serial number": msp_by_serial,
+    }
+
+
+def _measure(engine: sa.engine.Engine, query) -> str:
+    latencies = []
+    for _ in range(REPETITIONS):
+        with Session(engine) as session:
+            start = time.perf_counter()
+            query(session)
+            latencies.append(time.perf_counter() - start)
+    latencies_ms = np.array(latencies) * 1000
+    return (
+        f"p50={np.percentile(latencies_ms, 50):8.3f}ms"
+        f" p95={np.percentile(latencies_ms, 95):8.3f}ms"
+    )
+
+
+def main():
+    config = cnf.Config()
+    config.db_type = "sqlite"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config.db_file = os.path.join(tmp_dir, "bench.db")
+        engine = db.create_engine(config)
+        db.Base.metadata.create_all(engine)
+        _drop_indexes(engine)
+        _populate(engine)
+        print(
+            f"Query latency with {len(TERMS)} terms, {len(TERMS) * GROUPS_PER_TERM}"
+            f" groups and {RESULT_CNT} test results:"
+        )
+        results = {}
+        for indexed in [False, True]:
+            if indexed:
+                migrations.run_migrations(engine, db.Base.metadata)
+            for name, query in _get_queries(engine).items():
+                results.setdefault(name, []).append(_measure(engine, query))
+        for name, (plain, indexed) in results.items():
+            print(f"{name:<28} no indexes: {plain}  indexes: {indexed}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Concurrency benchmark for the database engine profiles.
+
+Worker threads, the scheduler and the reporting open many short sessions concurrently.
+The benchmark starts N writer threads, which each open short sessions that read and
+update a row, and reports the session throughput and latency of a SQLite database with
+the rollback journal and with the tuned engine profile (write-ahead log,
+``synchronous=NORMAL``, memory-mapped I/O).
+
+Usage (from the repository root): python -m tests.benchmarks.bench_db_sessions
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import tempfile
+import threading
+import numpy as np
+import testsystem.config as cnf
+import testsystem.db as db
+
+from sqlalchemy.orm import Session
+from testsystem.models import Lease
+
+THREAD_CNTS = [1, 4, 8, 16]
+DURATION_S = 3.0
+
+
+def _run_writer(engine, name: str, stop_event: threading.Event, latencies: list[float]):
+    with Session(engine) as session:
+        session.add(Lease(name=name, owner="bench", expiry=0))
+        session.commit()
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        with Session(engine) as session:
+            lease = session.get(Lease, name)
+            lease.expiry += 1
+            session.commit()
+        latencies.append(time.perf_counter() - start)
+
+
+def benchmark(config: cnf.Config, thread_cnt: int) -> str:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config.db_file = os.path.join(tmp_dir, "bench.db")
+        engine = db.create_engine(config)
+        db.Base.metadata.create_all(engine)
+        stop_event = threading.Event()
+        latencies: list[list[float]] = [[] for _ in range(thread_cnt)]
+        threads = [
+            threading.Thread(
+                target=_run_writer, args=(engine, f"W{i}", stop_event, latencies[i])
+            )
+            for i in range(thread_cnt)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(DURATION_S)
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+    all_latencies = np.concatenate([np.array(lat) for lat in latencies]) * 1000
+    return (
+        f"{len(all_latencies) / DURATION_S:8.0f} sessions/s"
+        f" p50={np.percentile(all_latencies, 50):6.2f}ms"
+        f" p95={np.percentile(all_latencies, 95):6.2f}ms"
+    )
+
+
+def _create_config(tuned: bool) -> cnf.Config:
+    config = cnf.Config()
+    config.db_type = "sqlite"
+    if not tuned:
+        config.db_sqlite_wal = False
+        config.db_sqlite_synchronous = "FULL"
+        config.db_sqlite_mmap_size = 0
+    return config
+
+
+def main():
+    print(f"SQLite session throughput over {DURATION_S}s:")
+    for thread_cnt in THREAD_CNTS:
+        for tuned in [False, True]:
+            profile = "tuned" if tuned else "rollback journal"
+            result = benchmark(_create_config(tuned), thread_cnt)
+            print(f"{thread_cnt:3} writers, {profile:<17}{result}")
+
+
+if __name__ == "__main__":
+    main()
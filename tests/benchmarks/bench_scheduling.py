@@ -0,0 +1,95 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Scheduling policy benchmark. Replays the same synthetic commit trace with different
+scheduler configurations and prints throughput, time to report, fairness across groups
+and test unit utilisation for each configuration.
+
+Usage (from the repository root): python -m tests.benchmarks.bench_scheduling
+"""
+
+from __future__ import annotations
+
+import testsystem.config as cnf
+
+from testsystem.simulation import Simulation, SimTestUnit, Workload
+
+GROUP_CNT = 20
+DURATION_H = 4
+TEST_UNIT_CNT = 6
+SCOPE_UNIT_CNT = 2
+
+
+def _get_policies() -> dict[str, cnf.Config]:
+    legacy = cnf.Config()
+    legacy.scheduling_policy = "queue_time"
+    legacy.supersede_test_runs = False
+    legacy.priority_band_width = 0
+    legacy.tu_scope_preference = False
+
+    fair_share = cnf.Config()
+    fair_share.supersede_test_runs = False
+    fair_share.priority_band_width = 0
+    fair_share.tu_scope_preference = False
+
+    supersede = cnf.Config()
+    supersede.priority_band_width = 0
+    supersede.tu_scope_preference = False
+
+    runtime_aware = cnf.Config()
+    runtime_aware.priority_band_width = 1.0
+    runtime_aware.tu_scope_preference = False
+
+    scope_preference = cnf.Config()
+    scope_preference.priority_band_width = 1.0
+
+    debounce = cnf.Config()
+    debounce.priority_band_width = 1.0
+    debounce.commit_debounce_s = 120
+
+    return {
+        "Legacy": legacy,
+        "Fair share": fair_share,
+        "+ Supersede": supersede,
+        "+ Runtime-aware": runtime_aware,
+        "+ Scope preference": scope_preference,
+        "+ Debounce 120s": debounce,
+    }
+
+
+def main():
+    workload = Workload.generate(group_cnt=GROUP_CNT, duration_h=DURATION_H, seed=1)
+    test_units = [
+        SimTestUnit(f"TU{i}", scope=i < SCOPE_UNIT_CNT) for i in range(TEST_UNIT_CNT)
+    ]
+    print(
+        f"{GROUP_CNT} groups, {len(workload.commits)} pushes in {DURATION_H}h,"
+        f" {TEST_UNIT_CNT} test units ({SCOPE_UNIT_CNT} with scope)"
+    )
+    for name, config in _get_policies().items():
+        result = Simulation(workload, test_units, config, seed=1).run()
+        print(f"{name:<20}{result.summary()}")
+
+
+if __name__ == "__main__":
+    main()
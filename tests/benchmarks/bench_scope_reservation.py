@@ -0,0 +1,72 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Simulation benchmark for the dispatch of timing tests on test units with a scope.
+
+The benchmark replays a burst of test sets on a simulated test unit pool and reports
+the makespan per test set (time from the push until the report is available) with and
+without scope preference.
+
+Usage (from the repository root): python -m tests.benchmarks.bench_scope_reservation
+"""
+
+from __future__ import annotations
+
+import testsystem.config as cnf
+
+from testsystem.simulation import Simulation, SimCommit, SimTestUnit, Workload
+
+GROUP_CNT = 12
+TEST_UNIT_CNT = 6
+SCOPE_UNIT_CNT = 2
+ARRIVAL_INTERVAL_S = 120
+
+
+def simulate(scope_preference: bool, scope_reserved: int, seed: int = 0) -> str:
+    commits = [SimCommit(i * ARRIVAL_INTERVAL_S, i + 1) for i in range(GROUP_CNT)]
+    workload = Workload(GROUP_CNT, commits, Workload.default_test_cases(seed=seed))
+    test_units = [
+        SimTestUnit(f"TU{i}", scope=i < SCOPE_UNIT_CNT) for i in range(TEST_UNIT_CNT)
+    ]
+    config = cnf.Config()
+    config.tu_scope_preference = scope_preference
+    config.tu_scope_reserved = scope_reserved
+    result = Simulation(workload, test_units, config, seed=seed).run()
+    return (
+        f"p50={result.percentile(50):7.0f}s p95={result.percentile(95):7.0f}s"
+        f" max={result.percentile(100):7.0f}s util={result.utilisation():5.3f}"
+    )
+
+
+def main():
+    print(
+        f"{GROUP_CNT} test sets, {TEST_UNIT_CNT} test units ({SCOPE_UNIT_CNT} with"
+        " scope). Makespan per test set:"
+    )
+    print(f"{'No scope preference':<30}{simulate(False, 0)}")
+    print(f"{'Scope preference':<30}{simulate(True, 0)}")
+    print(f"{'Scope preference, 1 reserved':<30}{simulate(True, 1)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,7 @@
 
 import testsystem.config as cnf
 import testsystem.db as db
+import sqlalchemy as sa
 import pytest
 import unittest.mock as mock
 
@@ -51,3 +52,55 @@ def test_init_db_twice(m_get_config):
     engine1 = db.get_engine()
     engine2 = db.get_engine()
     assert engine1 == engine2
+
+
+def test_sqlite_engine_profile(tmp_path):
+    c = cnf.Config()
+    c.db_file = str(tmp_path / "profile.db")
+    c.db_sqlite_mmap_size = 1048576
+    engine = db.create_engine(c)
+
+    with engine.connect() as connection:
+        pragma = lambda name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+        assert "wal" == pragma("journal_mode")
+        assert 1 == pragma("synchronous")  # NORMAL
+        assert 1048576 == pragma("mmap_size")
+        assert pragma("busy_timeout") > 0
+    engine.dispose()
+
+
+def test_sqlite_engine_with_unknown_synchronous_mode():
+    c = cnf.Config()
+    c.db_sqlite_synchronous = "SOMETIMES"
+
+    with pytest.raises(ValueError):
+        db.create_engine(c)
+
+
+@mock.patch("testsystem.db._instrument")
+@mock.patch("testsystem.db.sa.create_engine")
+def test_mysql_engine_profile(m_create_engine, m_instrument):
+    c = cnf.Config()
+    c.db_type = "mysql"
+    c.db_pool_size = 4
+    c.db_pool_recycle_s = 600
+
+    db.create_engine(c)
+
+    kwargs = m_create_engine.call_args.kwargs
+    assert 4 == kwargs["pool_size"]
+    assert 600 == kwargs["pool_recycle"]
+    assert kwargs["pool_pre_ping"]
+
+
+def test_statements_add_db_wait_time(tmp_path):
+    c = cnf.Config()
+    c.db_file = str(tmp_path / "wait.db")
+    engine = db.create_engine(c)
+    wait_time = db.get_wait_time()
+
+    with engine.connect() as conn:
+        conn.execute(sa.text("SELECT 1"))
+
+    assert db.get_wait_time() > wait_time
+    engine.dispose()
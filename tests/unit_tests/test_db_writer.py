@@ -0,0 +1,84 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import time
+import pytest
+import threading
+import unittest.mock as mock
+import testsystem.db as db
+import testsystem.db_writer as db_writer
+
+from db_fixtures import *
+
+
+def _write(session, values: list, value: int) -> int:
+    values.append((value, threading.get_ident()))
+    return value
+
+
+def _fail(session):
+    raise ValueError("Write failed")
+
+
+@pytest.fixture()
+def writer(db_engine):
+    with mock.patch("testsystem.db_writer.db.get_write_engine", return_value=db_engine):
+        db_writer.start()
+        yield
+        if db_writer._writer_thread is not None:
+            db_writer.stop()
+
+
+def test_writes_are_executed_in_order_by_one_thread(writer):
+    values = []
+
+    futures = [db_writer.submit(_write, values, i) for i in range(20)]
+    result = db_writer.execute(_write, values, 20)
+    db_writer.stop()
+
+    assert 20 == result
+    assert list(range(21)) == [v for v, _ in values]
+    assert 1 == len(set(t for _, t in values))
+    assert threading.get_ident() != values[0][1]
+    assert all(f.done() for f in futures)
+
+
+def test_failed_write_raises_on_wait(writer):
+    with pytest.raises(ValueError):
+        db_writer.execute(_fail)
+    assert 1 == db_writer.execute(_write, [], 1)
+
+
+def test_waiting_for_writes_adds_db_wait_time(writer):
+    wait_time = db.get_wait_time()
+
+    db_writer.execute(lambda session: time.sleep(0.05))
+
+    assert db.get_wait_time() - wait_time >= 0.05
+
+
+def test_writes_without_writer_thread_are_executed_directly(db_engine):
+    values = []
+    with mock.patch("testsystem.db_writer.db.get_write_engine", return_value=db_engine):
+        future = db_writer.submit(_write, values, 1)
+
+    assert future.done()
+    assert [(1, threading.get_ident())] == values
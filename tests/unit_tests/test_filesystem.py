@@ -19,7 +19,13 @@
 # OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 
-from testsystem.filesystem import _create_msp_identifier_program
+import os
+import git
+import unittest.mock as mock
+
+import testsystem.filesystem as fs
+
+from testsystem.filesystem import _create_msp_identifier_program, _commit_files
 from testsystem.constants import MSP_ID_DEVICE_ID_TEMPLATE, MSP_ID_GENERATOR_DEFINE
 
 
@@ -34,3 +40,74 @@ def test_msp_identifier_program_generation():
     program = _create_msp_identifier_program(template, device_id)  # type: ignore
     assert f"#define {MSP_ID_GENERATOR_DEFINE}" in program
     assert "#define DEVICE_ID 0xdeadbeaf" in program
+
+
+def _create_clone(tmp_path) -> git.Repo:  # type: ignore
+    remote = git.Repo.init(tmp_path / "remote.git", bare=True)  # type: ignore
+    repo = git.Repo.clone_from(remote.git_dir, tmp_path / "clone")  # type: ignore
+    repo.git.config("user.name", "Test System")
+    repo.git.config("user.email", "testsystem@localhost")
+    repo.git.checkout(b="main")
+    (tmp_path / "clone" / "main.c").write_text("int main() {}")
+    repo.git.add("main.c")
+    repo.git.commit(m="Initial commit")
+    repo.git.push("origin", "main")
+    return repo
+
+
+def test_commit_files_without_working_tree(tmp_path):
+    repo = _create_clone(tmp_path)
+    files = {"reports/README.md": "# Report"}
+
+    changed = _commit_files(repo, "testresults", "main", files, "Test Report 1")
+    unchanged = _commit_files(repo, "testresults", "main", files, "Test Report 2")
+
+    remote = git.Repo(tmp_path / "remote.git")  # type: ignore
+    assert changed and not unchanged
+    assert "# Report" == remote.git.show("testresults:reports/README.md")
+    assert "int main() {}" == remote.git.show("testresults:main.c")
+    assert "Test Report 1" == remote.commit("testresults").message.strip()
+    assert "main" == repo.active_branch.name
+    assert not os.path.exists(tmp_path / "clone" / "reports")
+    assert not repo.is_dirty(untracked_files=True)
+
+
+def test_commit_files_updates_existing_branch(tmp_path):
+    repo = _create_clone(tmp_path)
+    _commit_files(repo, "main", "main", {"README.md": "Status 1"}, "Update 1")
+
+    _commit_files(repo, "main", "main", {"reports/g1/README.md": "Report"}, "Update 2")
+
+    remote = git.Repo(tmp_path / "remote.git")  # type: ignore
+    assert "Status 1" == remote.git.show("main:README.md")
+    assert "Report" == remote.git.show("main:reports/g1/README.md")
+    assert 3 == len(list(remote.iter_commits("main")))
+
+
+def test_group_report_holds_git_lock():
+    # Group reports are committed to the group repositories shared with the scheduler
+    locked = []
+    with mock.patch(
+        "testsystem.filesystem._publish_group_report",
+        side_effect=lambda *_: locked.append(fs._git_lock.locked()),
+    ):
+        fs.publish_group_report("group01", "0123456789", "Report")
+
+    assert [True] == locked
+
+
+def test_test_case_files_version_changes_with_testbench(tmp_path):
+    testbench = tmp_path / "testbenches" / "001"
+    testbench.mkdir(parents=True)
+    (tmp_path / "testcases.txt").write_text("#001")
+    (testbench / "main.c").write_text("int main() {}")
+
+    with mock.patch("testsystem.filesystem.get_config") as m_get_config:
+        m_get_config.return_value.tc_root_path = str(tmp_path)
+        version = fs.get_test_case_files_version()
+        same_version = fs.get_test_case_files_version()
+        (testbench / "main.c").write_text("int main() { return 1; }")
+        new_version = fs.get_test_case_files_version()
+
+    assert version == same_version
+    assert version != new_version
@@ -0,0 +1,108 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import pytest
+import unittest.mock as mock
+import testsystem.models.group
+
+from sqlalchemy.orm import Session
+from testsystem.models import Group
+from db_fixtures import *
+
+
+@pytest.fixture()
+def group(db_engine):
+    with mock.patch("testsystem.models.group.db") as m_db, mock.patch(
+        "testsystem.db_writer.db"
+    ) as m_writer_db:
+        m_db.get_engine = mock.Mock(return_value=db_engine)
+        m_writer_db.get_write_engine = mock.Mock(return_value=db_engine)
+        with Session(db_engine, expire_on_commit=False) as session:
+            group = Group(group_name="test_queue_time", group_nr=997, term="SS0")
+            session.add(group)
+            session.commit()
+        yield group
+        Group.flush_queue_times()
+        with Session(db_engine) as session:
+            session.delete(session.get(Group, group.id))
+            session.commit()
+
+
+def _get_db_queue_time(db_engine, group: Group) -> float:
+    with Session(db_engine) as session:
+        return session.get(Group, group.id).queue_time
+
+
+def test_queue_time_is_written_on_flush(db_engine, group):
+    group.add_queue_time(10)
+    group.add_queue_time(5)
+
+    assert 0 == _get_db_queue_time(db_engine, group)
+    assert 15 == group.get_queue_time()
+    assert 15 == Group.get_max_queue_time()
+
+    Group.flush_queue_times()
+
+    assert 15 == _get_db_queue_time(db_engine, group)
+    assert 15 == group.get_queue_time()
+
+
+def test_reset_queue_time_drops_pending_queue_time(db_engine, group):
+    group.add_queue_time(10)
+    Group.flush_queue_times()
+    group.add_queue_time(5)
+
+    group.reset_queue_time()
+    Group.flush_queue_times()
+
+    assert 0 == _get_db_queue_time(db_engine, group)
+    assert 0 == group.get_queue_time()
+
+
+@mock.patch("testsystem.models.group.get_config")
+@mock.patch("testsystem.models.group.db")
+def test_group_activation_is_reconciled_on_config_change(m_db, m_cnf, db_engine):
+    m_db.get_engine = mock.Mock(return_value=db_engine)
+    m_cnf.return_value = mock.MagicMock(group_ids=[1, 2])
+    Group.invalidate_cache()
+
+    with mock.patch(
+        "testsystem.models.group._reconcile_groups",
+        wraps=testsystem.models.group._reconcile_groups,
+    ) as m_reconcile:
+        assert [1, 2] == sorted(g.group_nr for g in Group.get_by_term("SS1"))
+        assert 2 == Group.get(2, "SS1").group_nr
+        Group.get_by_term("SS1")
+        assert 1 == m_reconcile.call_count
+
+        m_cnf.return_value = mock.MagicMock(group_ids=[2, 3])
+        assert [2, 3] == sorted(g.group_nr for g in Group.get_by_term("SS1"))
+        assert [1] == [g.group_nr for g in Group.get_by_term("SS1", active=False)]
+        assert 1 == Group.get(1, "SS1").group_nr
+        assert Group.get(4, "SS1") is None
+        assert 2 == m_reconcile.call_count
+
+    with Session(db_engine) as session:
+        for group in session.query(Group).where(Group.term == "SS1"):
+            session.delete(group)
+        session.commit()
+    Group.invalidate_cache()
@@ -0,0 +1,105 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import pytest
+import testsystem.db as db
+
+from testsystem.models import GroupShare
+from sqlalchemy.orm import Session
+from db_fixtures import *
+
+
+@pytest.fixture()
+def group_shares(db_engine):
+    prev_engine = db.set_engine(db_engine)
+    GroupShare.clear_cache()
+    yield GroupShare
+    GroupShare.clear_cache()
+    db.set_engine(prev_engine)
+
+
+def test_lag_of_active_groups(group_shares):
+    group_shares.activate(1)
+    group_shares.activate(2)
+    group_shares.add_service(1, 100)
+    group_shares.add_service(2, 40)
+
+    assert 40 == group_shares.get_virtual_time()
+    assert 60 == group_shares.get_lag(1)
+    assert 0 == group_shares.get_lag(2)
+
+
+def test_idle_group_does_not_build_up_credit(group_shares):
+    group_shares.activate(1)
+    group_shares.activate(2)
+    group_shares.add_service(1, 100)
+    group_shares.add_service(2, 300)
+    group_shares.deactivate(1)
+    group_shares.add_service(2, 300)
+
+    group_shares.activate(1)
+
+    assert 600 == group_shares.get_service(2)
+    assert 600 == group_shares.get_service(1)
+    assert 0 == group_shares.get_lag(1)
+
+
+def test_checkpoint_persists_services(group_shares):
+    group_shares.activate(1)
+    group_shares.add_service(1, 25)
+
+    group_shares.checkpoint()
+    group_shares.clear_cache()
+
+    assert 25 == group_shares.get_service(1)
+
+
+def test_checkpoint_adds_services_of_other_instances(group_shares, db_engine):
+    group_shares.activate(42)
+    group_shares.add_service(42, 25)
+    group_shares.checkpoint()
+    service = group_shares.get_service(42)
+
+    # Another test system instance sharing the database
+    with Session(db_engine) as session:
+        session.get(GroupShare, 42).service += 10
+        session.commit()
+    group_shares.add_service(42, 5)
+    group_shares.checkpoint()
+
+    assert service + 15 == group_shares.get_service(42)
+
+
+def test_checkpoint_without_local_service_reloads_services(group_shares, db_engine):
+    group_shares.activate(43)
+    group_shares.add_service(43, 25)
+    group_shares.checkpoint()
+    service = group_shares.get_service(43)
+
+    # Another test system instance sharing the database
+    with Session(db_engine) as session:
+        session.get(GroupShare, 43).service += 10
+        session.commit()
+    group_shares.checkpoint()
+
+    assert service + 10 == group_shares.get_service(43)
+    assert service + 10 == group_shares.get_virtual_time()
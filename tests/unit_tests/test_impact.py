@@ -0,0 +1,273 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+from __future__ import annotations
+
+import pytest
+import unittest.mock as mock
+import testsystem.impact as impact
+
+from testsystem.config import Config
+from testsystem.models import TestCaseDef, TestResult
+
+GROUP_NAME = "RTOS_SS23_Group01"
+GROUP_SRC = f"/testenv/abc/001/{GROUP_NAME}/middleware/src/kernel/smartos/msp430f5529"
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        pytest.param(f"{GROUP_SRC}/scheduler.c", "scheduler.c", id="Source file"),
+        pytest.param(f"{GROUP_SRC}//os.h", "os.h", id="Double slash"),
+        pytest.param(f"{GROUP_SRC}/sub/os.h", None, id="Sub directory"),
+        pytest.param(f"{GROUP_SRC}/", None, id="Directory"),
+        pytest.param("/usr/msp430/include/msp430.h", None, id="System header"),
+        pytest.param(
+            GROUP_SRC.replace(GROUP_NAME, "RTOS_SS23_GroupXX") + "/os.h",
+            None,
+            id="Other group",
+        ),
+    ],
+)
+def test_get_group_src_file(path, expected):
+    assert expected == impact.get_group_src_file(path, GROUP_NAME)
+
+
+def test_parse_make_dependencies():
+    content = (
+        "build/main.o: main.c ../testsystem.h \\\n"
+        f" {GROUP_SRC}/scheduler.c \\\n"
+        f"  {GROUP_SRC}/os.h\n"
+        "\n"
+        "../testsystem.h:\n"
+    )
+
+    deps = impact.parse_make_dependencies(content)
+
+    assert [
+        "main.c",
+        "../testsystem.h",
+        f"{GROUP_SRC}/scheduler.c",
+        f"{GROUP_SRC}/os.h",
+    ] == deps
+
+
+def test_parse_linker_map():
+    content = (
+        "Archive member included to satisfy reference by file (symbol)\n\n"
+        f"{GROUP_SRC}/libkernel.a(scheduler.o)\n"
+        "                              build/main.o (os_init)\n"
+        f"LOAD {GROUP_SRC}/tasks.o\n"
+        " .text          0x0000000000004400       0x2c build/main.o\n"
+    )
+
+    objects = impact.parse_linker_map(content)
+
+    assert f"{GROUP_SRC}/scheduler.o" in objects
+    assert f"{GROUP_SRC}/tasks.o" in objects
+    assert "build/main.o" in objects
+    assert f"{GROUP_SRC}/libkernel.a" not in objects
+
+
+def test_collect_dependencies(tmp_path):
+    build_dir = tmp_path / "build"
+    build_dir.mkdir()
+    (build_dir / "main.d").write_text(
+        f"main.o: main.c {GROUP_SRC}/scheduler.c {GROUP_SRC}/os.h {GROUP_SRC}/a.txt\n"
+    )
+    (build_dir / "main.map").write_text(f"LOAD {GROUP_SRC}/tasks.o\n")
+
+    deps = impact.collect_dependencies(str(tmp_path), GROUP_NAME)
+
+    assert ["os.h", "scheduler.c", "tasks.*"] == deps
+
+
+@pytest.mark.parametrize(
+    "deps, changed, expected",
+    [
+        pytest.param(["os.h", "scheduler.c"], ["scheduler.c"], True, id="Changed"),
+        pytest.param(["os.h", "scheduler.c"], ["tasks.c"], False, id="Unchanged"),
+        pytest.param(["tasks.*"], ["tasks.s"], True, id="Pattern"),
+        pytest.param(["os.h"], [], False, id="No changes"),
+    ],
+)
+def test_is_affected(deps, changed, expected):
+    assert expected == impact.is_affected(deps, changed)
+
+
+def test_get_exercise_files():
+    conf = Config()
+    conf.impact_exercise_files = ["1:os.h", "2:scheduler.c", "3:*.s", "invalid"]
+
+    files = impact.get_exercise_files(2, conf)
+
+    assert ["os.h", "scheduler.c"] == files
+
+
+def _mock_group(results: list[TestResult], run_cnt: int = 1):
+    group = mock.MagicMock()
+    group.id = 1
+    group.get_impact_run_cnt.return_value = run_cnt
+    group.group_name = GROUP_NAME
+    parent = mock.MagicMock()
+    parent.commit_hash = "0000aaaa"
+    parent.public_commit_hash = "2222cccc"
+    parent.tc_version = "v1"
+    parent.test_results = results
+    group.get_latest_finished_test_set.return_value = parent
+    return group
+
+
+def _mock_test_env(public_commit_hash: str = "2222cccc", tc_version: str = "v1"):
+    test_env = mock.MagicMock()
+    test_env.commit_hash = "1111bbbb"
+    test_env.public_commit_hash = public_commit_hash
+    test_env.tc_version = tc_version
+    return test_env
+
+
+@mock.patch("testsystem.impact.TestCaseDependency")
+@mock.patch("testsystem.impact.fs.get_changed_group_files")
+@mock.patch("testsystem.impact.cnf.get_config")
+def test_select_test_cases_inherits_unaffected(m_get_config, m_changed, m_deps):
+    conf = Config()
+    conf.enable_test_impact_analysis = True
+    m_get_config.return_value = conf
+    m_changed.return_value = ["scheduler.c"]
+    m_deps.get_by_group.return_value = {
+        1: ["os.h"],
+        2: ["os.h", "scheduler.c"],
+    }
+    tc_defs = [TestCaseDef(id=1), TestCaseDef(id=2), TestCaseDef(id=3)]
+    results = [
+        TestResult(test_case_id=1, successful=True, result=1, output="OK"),
+        TestResult(test_case_id=2, successful=True, result=1, output="OK"),
+        TestResult(test_case_id=3, successful=True, result=1, output="OK"),
+    ]
+    group = _mock_group(results)
+
+    selected, inherited = impact.select_test_cases(group, _mock_test_env(), tc_defs)
+
+    assert [tc_defs[1], tc_defs[2]] == selected
+    assert 1 == len(inherited)
+    assert 1 == inherited[0].test_case_id
+    assert "OK" == inherited[0].output
+    assert inherited[0] is not results[0]
+    group.set_impact_run_cnt.assert_called_once_with(2)
+
+
+@mock.patch("testsystem.impact.TestCaseDependency")
+@mock.patch("testsystem.impact.fs.get_changed_group_files")
+@mock.patch("testsystem.impact.cnf.get_config")
+def test_select_test_cases_without_ancestor(m_get_config, m_changed, m_deps):
+    conf = Config()
+    conf.enable_test_impact_analysis = True
+    m_get_config.return_value = conf
+    m_changed.return_value = None
+    m_deps.get_by_group.return_value = {1: ["os.h"]}
+    tc_defs = [TestCaseDef(id=1)]
+    group = _mock_group([TestResult(test_case_id=1, successful=True)])
+
+    selected, inherited = impact.select_test_cases(group, _mock_test_env(), tc_defs)
+
+    assert tc_defs == selected
+    assert 0 == len(inherited)
+    group.set_impact_run_cnt.assert_called_once_with(0)
+
+
+@pytest.mark.parametrize(
+    "audit, interval, run_cnt, full_run, expected_full_run",
+    [
+        pytest.param(True, 10, 1, False, True, id="Audit"),
+        pytest.param(False, 10, 0, False, False, id="First run after full run"),
+        pytest.param(False, 10, 9, False, True, id="Periodic run"),
+        pytest.param(False, 1, 0, False, True, id="Every run"),
+        pytest.param(False, 10, 5, True, True, id="Forced run"),
+        pytest.param(False, 10, 5, False, False, id="Regular run"),
+        pytest.param(False, 0, 20, False, False, id="Sampling disabled"),
+    ],
+)
+@mock.patch("testsystem.impact.TestCaseDependency")
+@mock.patch("testsystem.impact.fs.get_changed_group_files")
+@mock.patch("testsystem.impact.cnf.get_config")
+def test_select_test_cases_full_run(
+    m_get_config,
+    m_changed,
+    m_deps,
+    audit,
+    interval,
+    run_cnt,
+    full_run,
+    expected_full_run,
+):
+    conf = Config()
+    conf.enable_test_impact_analysis = True
+    conf.impact_audit = audit
+    conf.impact_full_run_interval = interval
+    m_get_config.return_value = conf
+    m_changed.return_value = []
+    m_deps.get_by_group.return_value = {1: ["os.h"]}
+    tc_defs = [TestCaseDef(id=1)]
+    group = _mock_group([TestResult(test_case_id=1, successful=True)], run_cnt)
+
+    selected, _ = impact.select_test_cases(group, _mock_test_env(), tc_defs, full_run)
+
+    assert expected_full_run == (len(selected) == 1)
+    if not expected_full_run:
+        expected_calls = [mock.call(run_cnt + 1)]
+    elif run_cnt > 0:
+        expected_calls = [mock.call(0)]
+    else:
+        expected_calls = []
+    assert expected_calls == group.set_impact_run_cnt.call_args_list
+
+
+@pytest.mark.parametrize(
+    "parent_public_commit_hash, parent_tc_version",
+    [
+        pytest.param("3333dddd", "v1", id="Public repository changed"),
+        pytest.param("2222cccc", "v2", id="Test cases changed"),
+        pytest.param(None, None, id="Unknown versions"),
+    ],
+)
+@mock.patch("testsystem.impact.TestCaseDependency")
+@mock.patch("testsystem.impact.fs.get_changed_group_files")
+@mock.patch("testsystem.impact.cnf.get_config")
+def test_select_test_cases_after_test_environment_change(
+    m_get_config, m_changed, m_deps, parent_public_commit_hash, parent_tc_version
+):
+    conf = Config()
+    conf.enable_test_impact_analysis = True
+    m_get_config.return_value = conf
+    m_changed.return_value = []
+    m_deps.get_by_group.return_value = {1: ["os.h"]}
+    tc_defs = [TestCaseDef(id=1)]
+    group = _mock_group([TestResult(test_case_id=1, successful=True)])
+    parent = group.get_latest_finished_test_set.return_value
+    parent.public_commit_hash = parent_public_commit_hash
+    parent.tc_version = parent_tc_version
+
+    selected, inherited = impact.select_test_cases(group, _mock_test_env(), tc_defs)
+
+    assert tc_defs == selected
+    assert 0 == len(inherited)
+    group.set_impact_run_cnt.assert_called_once_with(0)
@@ -0,0 +1,183 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import pytest
+import sqlalchemy as sa
+import testsystem.db as db
+import testsystem.migrations as migrations
+import unittest.mock as mock
+
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import mysql
+from testsystem.db import Base
+from testsystem.models import Group, TestResult
+
+
+def _create_legacy_database(path) -> sa.engine.Engine:
+    engine = sa.create_engine(f"sqlite+pysqlite:///{path}", future=True)
+    Base.metadata.create_all(engine)
+    # Test results as stored before the outputs were moved to TestResultBlobs
+    legacy_test_results = sa.Table(
+        "TestResults",
+        sa.MetaData(),
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("test_set_id", sa.Integer, nullable=False),
+        sa.Column("result", sa.Float, nullable=True),
+        sa.Column("test_case_id", sa.Integer, nullable=False),
+        sa.Column("successful", sa.Boolean, nullable=False),
+        sa.Column("output", sa.Text, nullable=False),
+        sa.Column("build_output", sa.Text, nullable=True),
+        sa.Column("build_error", sa.Text, nullable=True),
+        sa.Column("flash_output", sa.Text, nullable=True),
+        sa.Column("flash_error", sa.Text, nullable=True),
+        sa.Column("timestamp", sa.BigInteger, nullable=False),
+    )
+    with engine.begin() as conn:
+        conn.execute(sa.text("DROP TABLE TestResults"))
+        legacy_test_results.create(conn)
+        conn.execute(sa.text("ALTER TABLE Groups DROP COLUMN impact_run_cnt"))
+        conn.execute(sa.text("ALTER TABLE TestSets DROP COLUMN public_commit_hash"))
+        conn.execute(sa.text("ALTER TABLE TestSets DROP COLUMN tc_version"))
+        conn.execute(
+            sa.text(
+                "INSERT INTO Groups (id, group_nr, group_name, term, active,"
+                " abs_queue_time, queue_time) VALUES (1, 1, 'Group01', 'SS23', 1, 0, 0)"
+            )
+        )
+        conn.execute(
+            sa.text(
+                "INSERT INTO TestResults (id, test_set_id, test_case_id, successful,"
+                " timestamp, output, build_error) VALUES"
+                " (1, 1, 1, 1, 0, 'Hello', NULL), (2, 1, 2, 0, 0, '', 'Error')"
+            )
+        )
+    return engine
+
+
+@mock.patch("testsystem.migrations.DB_MIGRATION_BATCH_SIZE", 1)
+def test_run_migrations_on_legacy_database(tmp_path):
+    engine = _create_legacy_database(tmp_path / "legacy.db")
+    statements = []
+    sa.event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *_: statements.append(statement),
+    )
+
+    cnt = migrations.run_migrations(engine, Base.metadata)
+
+    inspector = sa.inspect(engine)
+    columns = [c["name"] for c in inspector.get_columns("TestResults")]
+    indexes = [i["name"] for i in inspector.get_indexes("TestResults")]
+    test_set_columns = [c["name"] for c in inspector.get_columns("TestSets")]
+    with Session(engine) as session:
+        results = session.query(TestResult).order_by(TestResult.id).all()
+        outputs = [(r.output, r.build_error) for r in results]
+        impact_run_cnt = session.get(Group, 1).impact_run_cnt
+    assert len(migrations.MIGRATIONS) == cnt
+    assert [m.version for m in migrations.MIGRATIONS] == (
+        migrations.get_applied_versions(engine)
+    )
+    assert not any(c in columns for c in ["output", "build_error", "flash_output"])
+    # Not supported by SQLite before 3.35
+    assert not any("DROP COLUMN" in statement for statement in statements)
+    assert "ix_TestResults_test_set_id" in indexes
+    assert [("Hello", None), ("", "Error")] == outputs
+    assert 0 == impact_run_cnt
+    assert "public_commit_hash" in test_set_columns
+    assert "tc_version" in test_set_columns
+    assert 0 == migrations.run_migrations(engine, Base.metadata)
+    engine.dispose()
+
+
+def test_failed_migration_is_not_recorded(tmp_path):
+    engine = sa.create_engine(f"sqlite+pysqlite:///{tmp_path / 'fail.db'}", future=True)
+    Base.metadata.create_all(engine)
+    apply = mock.Mock(side_effect=[Exception("Failed"), None])
+    failing = [migrations.Migration(1, "Test", apply)]
+
+    with pytest.raises(Exception):
+        migrations.run_migrations(engine, Base.metadata, failing)
+    versions = migrations.get_applied_versions(engine)
+    cnt = migrations.run_migrations(engine, Base.metadata, failing)
+
+    assert [] == versions
+    assert 1 == cnt
+    assert [1] == migrations.get_applied_versions(engine)
+    engine.dispose()
+
+
+def test_concurrent_run_with_stale_applied_versions(tmp_path):
+    engine = _create_legacy_database(tmp_path / "concurrent.db")
+    first_cnt = migrations.run_migrations(engine, Base.metadata)
+
+    # A second instance read the applied versions before the first one finished
+    with mock.patch("testsystem.migrations.get_applied_versions", return_value=[]):
+        stale_cnt = migrations.run_migrations(engine, Base.metadata)
+        # and recorded them after this instance checked inside the transaction
+        with mock.patch("testsystem.migrations._is_applied", side_effect=[False, True]):
+            raced_cnt = migrations.run_migrations(
+                engine, Base.metadata, migrations.MIGRATIONS[0:1]
+            )
+
+    assert len(migrations.MIGRATIONS) == first_cnt
+    assert 0 == stale_cnt
+    assert 0 == raced_cnt
+    assert [m.version for m in migrations.MIGRATIONS] == (
+        migrations.get_applied_versions(engine)
+    )
+    engine.dispose()
+
+
+def test_store_results_after_init_of_legacy_database(tmp_path):
+    engine = _create_legacy_database(tmp_path / "store.db")
+
+    db._init_schema(engine)
+    with Session(engine) as session:
+        session.add(
+            TestResult(
+                test_set_id=1,
+                test_case_id=3,
+                successful=True,
+                timestamp=0,
+                output="New",
+            )
+        )
+        session.commit()
+    with Session(engine) as session:
+        results = session.query(TestResult).order_by(TestResult.id).all()
+        outputs = [r.output for r in results]
+
+    assert ["Hello", "", "New"] == outputs
+    engine.dispose()
+
+
+def test_add_columns_quotes_reserved_table_name():
+    conn = mock.MagicMock()
+    conn.dialect = mysql.dialect()
+    groups = Base.metadata.tables["Groups"]
+
+    with mock.patch("testsystem.migrations.sa.inspect") as m_inspect:
+        m_inspect.return_value.get_columns.return_value = [{"name": "id"}]
+        migrations._add_columns(conn, groups, ["impact_run_cnt"])
+
+    statement = str(conn.execute.call_args.args[0])
+    assert statement.startswith("ALTER TABLE `Groups` ADD COLUMN impact_run_cnt")
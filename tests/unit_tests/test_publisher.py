@@ -0,0 +1,129 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import pytest
+import unittest.mock as mock
+import testsystem.publisher as publisher
+import testsystem.models.publish_job as pj
+
+from testsystem.models import Group, PublishJob, TestSet
+from db_fixtures import *
+
+
+def _create_job(job_id: int, attempts: int = 0) -> PublishJob:
+    return PublishJob(id=job_id, test_set_id=job_id, attempts=attempts, next_try=0)
+
+
+def _create_test_set(group_name: str, commit: str) -> TestSet:
+    test_set = mock.MagicMock()
+    test_set.group.group_name = group_name
+    test_set.commit_hash = commit
+    return test_set
+
+
+@mock.patch("testsystem.publisher.fs")
+@mock.patch("testsystem.publisher.reporting")
+@mock.patch("testsystem.publisher.TestSet")
+@mock.patch("testsystem.publisher.PublishJob")
+def test_process_jobs_pushes_one_commit_per_repository(
+    publish_job_mock, test_set_mock, reporting_mock, fs_mock
+):
+    publish_job_mock.get_due.return_value = [_create_job(i) for i in range(1, 4)]
+    test_sets = {
+        1: _create_test_set("Group01", "aaaaaaaaaa"),
+        2: _create_test_set("Group02", "bbbbbbbbbb"),
+        3: _create_test_set("Group01", "cccccccccc"),
+    }
+    test_set_mock.get_by_id.side_effect = lambda id: test_sets[id]
+    reporting_mock.create_md_report_for_test_set.side_effect = lambda ts: ts.commit_hash
+
+    processed = publisher.process_jobs()
+
+    assert 3 == processed
+    # Only the latest group report of Group01 is published
+    assert 2 == fs_mock.publish_group_report.call_count
+    fs_mock.publish_group_report.assert_any_call(
+        "Group01", "cccccccccc", reporting_mock.create_md_group_report.return_value
+    )
+    fs_mock.publish_system_reports.assert_called_once()
+    reports, sys_report, _ = fs_mock.publish_system_reports.call_args.args
+    assert {"Group01": "cccccccccc", "Group02": "bbbbbbbbbb"} == reports
+    assert reporting_mock.create_md_system_report.return_value == sys_report
+    reporting_mock.create_md_system_report.assert_called_once()
+    publish_job_mock.remove.assert_has_calls(
+        [mock.call(1), mock.call(3), mock.call(2)], any_order=True
+    )
+    publish_job_mock.retry.assert_not_called()
+
+
+@mock.patch("testsystem.publisher.fs")
+@mock.patch("testsystem.publisher.reporting")
+@mock.patch("testsystem.publisher.TestSet")
+@mock.patch("testsystem.publisher.PublishJob")
+@pytest.mark.parametrize("attempts, delay", [(0, 60), (2, 240), (10, 3600)])
+def test_failed_job_is_retried_later(
+    publish_job_mock, test_set_mock, reporting_mock, fs_mock, attempts, delay
+):
+    publish_job_mock.get_due.return_value = [_create_job(1, attempts), _create_job(2)]
+    test_sets = {
+        1: _create_test_set("Group01", "aaaaaaaaaa"),
+        2: _create_test_set("Group02", "bbbbbbbbbb"),
+    }
+    test_set_mock.get_by_id.side_effect = lambda id: test_sets[id]
+    fs_mock.publish_group_report.side_effect = [Exception("Push rejected"), None]
+
+    processed = publisher.process_jobs()
+
+    assert 1 == processed
+    publish_job_mock.remove.assert_called_once_with(2)
+    publish_job_mock.retry.assert_called_once_with(1, delay, "Push rejected")
+    reports = fs_mock.publish_system_reports.call_args.args[0]
+    assert ["Group02"] == list(reports.keys())
+    test_sets[1].delete.assert_not_called()
+
+
+@mock.patch("testsystem.models.group_score.tcdef")
+@mock.patch("testsystem.models.publish_job.db")
+def test_enqueue_marks_test_set_finished(m_db, m_tcdef, db_engine):
+    m_tcdef.get_version.return_value = "v1"
+    m_db.get_engine = mock.Mock(return_value=db_engine)
+    with Session(bind=db_engine, expire_on_commit=False) as session:
+        group = Group(group_name="test_enqueue_publish_job", group_nr=997, term="SS0")
+        session.add(group)
+        session.flush()
+        test_set = TestSet(group_id=group.id, commit_hash="BEEF", timestamp=0)
+        session.add(test_set)
+        session.commit()
+
+        job_id = pj._enqueue(session, test_set.id)
+        session.refresh(test_set)
+
+        assert test_set.finished
+        assert [job_id] == [job.id for job in PublishJob.get_due()]
+        PublishJob.retry(job_id, 60, "Error")
+        assert 0 == len(PublishJob.get_due())
+        assert 1 == PublishJob.count()
+        PublishJob.remove(job_id)
+        assert 0 == PublishJob.count()
+        session.delete(test_set)
+        session.delete(group)
+        session.commit()
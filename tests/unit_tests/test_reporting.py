@@ -159,3 +159,51 @@ def test_group_report_status_info(m_create_table, property, value, is_last):
         expected += "\\\n"
 
     assert expected in report
+
+
+def _mock_score(test_set_id, total, exercise_results, ranking_results, stale=False):
+    score = mock.MagicMock(test_set_id=test_set_id, total=total, is_stale=stale)
+    score.exercise_results = exercise_results
+    score.ranking_results = ranking_results
+    return score
+
+
+@mock.patch("testsystem.reporting.compute_scores")
+@mock.patch("testsystem.reporting.TestSet")
+@mock.patch("testsystem.reporting.GroupScore")
+def test_group_stats_from_materialized_scores(m_score, m_test_set, m_compute):
+    groups = [mock.MagicMock(id=10 + i, group_nr=i) for i in range(3)]
+    m_score.get_by_groups.return_value = {
+        10: _mock_score(1, 2, {"0": 1, "1": 1}, {"3": 0.75}),
+        11: _mock_score(2, 0, {"0": 0}, {}),
+    }
+    m_compute.return_value = (1, {1: 1}, {})
+
+    stats = reporting._get_group_stats(groups, 2, "abcdef")
+
+    assert [2, 0, 1] == [s.total for s in stats]
+    assert [1, 1] == [stats[0].get_exercise_result(ex) for ex in range(2)]
+    assert 0.75 == stats[0].get_test_case_result(3)
+    assert stats[1].get_test_case_result(3) is None
+    assert [0, 1] == [stats[2].get_exercise_result(ex) for ex in range(2)]
+    groups[2].get_test_set.assert_called_once_with(commit="abcdef")
+    m_score.rebuild.assert_not_called()
+
+
+@mock.patch("testsystem.reporting.TestSet")
+@mock.patch("testsystem.reporting.GroupScore")
+def test_group_stats_rebuild_stale_scores(m_score, m_test_set):
+    groups = [mock.MagicMock(id=10 + i, group_nr=i) for i in range(3)]
+    m_score.get_by_groups.return_value = {
+        10: _mock_score(1, 2, {}, {}),
+        11: _mock_score(2, 0, {}, {}, stale=True),
+    }
+    m_test_set.get_latest_finished_test_sets.return_value = [
+        (10, 1, 100),
+        (11, 2, 100),
+        (12, 3, 100),
+    ]
+
+    reporting._get_group_stats(groups)
+
+    m_score.rebuild.assert_called_once_with([(11, 2, 100), (12, 3, 100)])
@@ -19,12 +19,31 @@
 # OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 
+from __future__ import annotations
+
 import pytest
 import unittest.mock as mock
 
-from testsystem.scheduling import get_next_task, schedule_task, TestRun
-from testsystem.models import Task
+import testsystem.scheduling as scheduling
+
+from testsystem.scheduling import get_next_task, schedule_task, queue_size, TestRun
+from testsystem.config import Config
+from testsystem.models import Task, QueuedTask
 from testsystem.constants import TUTAG_SCOPE
+from testsystem.exceptions import GitError
+
+
+@pytest.fixture(autouse=True)
+def test_case_runtime_mock():
+    with mock.patch("testsystem.scheduling.TestCaseRuntime") as runtime_mock:
+        runtime_mock.get_expected_runtime.return_value = 0.0
+        yield runtime_mock
+
+
+@pytest.fixture(autouse=True)
+def group_share_mock():
+    with mock.patch("testsystem.scheduling.GroupShare") as share_mock:
+        yield share_mock
 
 
 def test_schedule_task_once():
@@ -133,6 +152,26 @@ def test_schedule_task_on_tagged_test_unit():
     assert task3 == second_tu1
 
 
+def test_schedule_shortest_expected_task_first_within_priority_band():
+    conf = Config()
+    conf.priority_band_width = 1.0
+    test_unit = mock.MagicMock()
+    task1 = Task(priority=10.2)
+    task1.expected_runtime = 60
+    task2 = Task(priority=10.5)
+    task2.expected_runtime = 2
+    task3 = Task(priority=11.1)
+    task3.expected_runtime = 1
+
+    with mock.patch("testsystem.config.config_override", conf):
+        schedule_task(task3)
+        schedule_task(task1)
+        schedule_task(task2)
+        tasks = [get_next_task(test_unit) for _ in range(3)]
+
+    assert [task2, task1, task3] == tasks
+
+
 def test_get_tasks():
     tc1 = mock.MagicMock()
     tc1.timing = True
@@ -150,3 +189,504 @@ def test_get_tasks():
     assert 2 == len(tasks)
     assert TUTAG_SCOPE == tasks[0].test_unit_tag
     assert None == tasks[1].test_unit_tag
+
+
+def _create_test_run(tc_cnt: int, tagged: bool = False) -> TestRun:
+    tc_defs = []
+    for _ in range(tc_cnt):
+        tc_def = mock.MagicMock()
+        tc_def.timing = False
+        tc_defs.append(tc_def)
+    test_set = mock.MagicMock()
+    test_set.id = 1
+    test_set.group_id = 1
+    test_set.commit_hash = "0123456789"
+    return TestRun(tc_defs, test_set, mock.MagicMock(), tagged=tagged)
+
+
+def test_supersede_test_run_without_running_tasks():
+    test_run = _create_test_run(2)
+    for task in test_run.get_tasks(1):
+        schedule_task(task)
+
+    superseded = test_run.supersede()
+
+    assert superseded
+    assert 0 == queue_size()
+    test_run.test_set.delete.assert_called_once()
+    test_run.test_env.cleanup.assert_called_once()
+
+
+def test_supersede_test_run_waits_for_running_tasks():
+    test_run = _create_test_run(2)
+    for task in test_run.get_tasks(1):
+        schedule_task(task)
+    get_next_task(mock.MagicMock())
+
+    test_run.supersede()
+    test_run.test_set.delete.assert_not_called()
+    test_run.task_finished(mock.MagicMock())
+
+    assert 0 == queue_size()
+    assert 0 == len(test_run.finished_tcs)
+    test_run.test_set.delete.assert_called_once()
+    test_run.test_env.cleanup.assert_called_once()
+
+
+@mock.patch("testsystem.scheduling.fs")
+@mock.patch("testsystem.scheduling.TestSet")
+@mock.patch("testsystem.scheduling._setup_tasks")
+@pytest.mark.parametrize("tagged", [False, True])
+def test_new_commit_supersedes_untagged_test_run(
+    setup_tasks_mock, test_set_mock, fs_mock, tagged
+):
+    test_run = _create_test_run(1, tagged=tagged)
+    test_run.get_tasks(1)
+    scheduling._register_test_run(test_run)
+    group = mock.MagicMock()
+    group.id = 1
+    test_set_mock.get_latest_test_sets.return_value = {1: test_run.test_set}
+    test_run.test_set.finished = False
+    test_set_mock.get_existing_commits.return_value = set()
+    fs_mock.get_latest_commit.return_value = "abcdef0123"
+    fs_mock.get_tagged_group_commit.return_value = []
+    polling_pass = scheduling._PollingPass([group], [])
+
+    scheduling._check_group_for_new_tasks(group, [], polling_pass)
+    scheduling._unregister_test_run(test_run)
+
+    assert test_run.superseded != tagged
+    assert setup_tasks_mock.called != tagged
+
+
+@mock.patch("testsystem.scheduling.fs")
+@mock.patch("testsystem.scheduling.TestSet")
+@mock.patch("testsystem.scheduling._setup_tasks")
+def test_polling_pass_checks_commits_at_once(setup_tasks_mock, test_set_mock, fs_mock):
+    groups = [mock.MagicMock(id=id, group_name=f"Group{id}") for id in [1, 2, 3]]
+    heads = {"Group1": "a1", "Group2": "b1", "Group3": "c1"}
+    fs_mock.get_latest_commit.side_effect = lambda name: heads[name]
+    fs_mock.get_tagged_group_commit.side_effect = lambda name, tags: (
+        ["a1", "a0"] if name == "Group1" else []
+    )
+
+    def load_group(name: str):
+        if name == "Group3":
+            raise GitError("Clone failed.")
+
+    fs_mock.load_group.side_effect = load_group
+    test_set_mock.get_latest_test_sets.return_value = {}
+    test_set_mock.get_existing_commits.return_value = {(2, "b1")}
+
+    polling_pass = scheduling._PollingPass(groups, ["test"])
+    for group in groups[0:2]:
+        scheduling._check_group_for_new_tasks(group, [], polling_pass)
+        scheduling._check_group_for_forced_tasks(group, [], polling_pass)
+
+    assert not polling_pass.is_loaded(groups[2])
+    test_set_mock.get_latest_test_sets.assert_called_once_with([1, 2])
+    test_set_mock.get_existing_commits.assert_called_once_with(
+        [(1, "a1"), (1, "a0"), (2, "b1")]
+    )
+    test_set_mock.exists.assert_not_called()
+    assert [("a1", True), ("a0", True)] == [
+        (c.args[1], c.kwargs["tagged"]) for c in setup_tasks_mock.call_args_list
+    ]
+
+
+@mock.patch("testsystem.scheduling.time")
+@mock.patch("testsystem.scheduling.cnf")
+def test_commit_debounce(cnf_mock, time_mock):
+    cnf_mock.get_config.return_value.commit_debounce_s = 60
+    cnf_mock.get_config.return_value.commit_debounce_max_s = 300
+    group = mock.MagicMock()
+    group.id = 1
+
+    settled = []
+    for timestamp, commit in [(0, "a"), (30, "b"), (80, "b"), (90, "b"), (200, "c")]:
+        time_mock.time.return_value = timestamp
+        settled.append(scheduling._is_commit_settled(group, commit))
+    time_mock.time.return_value = 260
+    settled.append(scheduling._is_commit_settled(group, "c"))
+
+    assert [False, False, False, True, False, True] == settled
+
+
+@mock.patch("testsystem.scheduling.time")
+@mock.patch("testsystem.scheduling.cnf")
+def test_commit_debounce_max_delay(cnf_mock, time_mock):
+    cnf_mock.get_config.return_value.commit_debounce_s = 60
+    cnf_mock.get_config.return_value.commit_debounce_max_s = 100
+    group = mock.MagicMock()
+    group.id = 2
+
+    settled = []
+    for timestamp, commit in [(0, "a"), (50, "b"), (100, "c")]:
+        time_mock.time.return_value = timestamp
+        settled.append(scheduling._is_commit_settled(group, commit))
+
+    assert [False, False, True] == settled
+
+
+def test_predict_completion_times():
+    test_unit1 = mock.MagicMock()
+    test_unit2 = mock.MagicMock()
+    test_unit2.has_tag = lambda tag: tag is None
+    test_run = _create_test_run(3)
+    tasks = test_run.get_tasks(1)
+    for task, runtime in zip(tasks, [10, 20, 30]):
+        task.expected_runtime = runtime
+        schedule_task(task)
+    scheduling._register_test_run(test_run)
+
+    with mock.patch("testsystem.scheduling.time") as time_mock:
+        time_mock.time.return_value = 100
+        predictions = scheduling.predict_completion_times([test_unit1, test_unit2])
+    scheduling.unschedule_tasks(tasks)
+    scheduling._unregister_test_run(test_run)
+
+    assert {test_run.test_set.id: 140} == predictions
+
+
+def _create_task_worker(scope: bool):
+    worker = mock.MagicMock()
+    worker.test_unit.has_tag = lambda tag: tag is None or (scope and tag == TUTAG_SCOPE)
+    return worker
+
+
+def test_excluded_test_unit_gets_no_task():
+    worker1 = _create_task_worker(scope=False)
+    worker2 = _create_task_worker(scope=False)
+    task = Task(priority=1)
+    task.excluded_test_units = [worker1.test_unit]
+    schedule_task(task)
+
+    first_task = get_next_task(worker1)
+    second_task = get_next_task(worker2)
+
+    assert None == first_task
+    assert task == second_task
+
+
+@mock.patch("testsystem.scheduling.publisher")
+@mock.patch("testsystem.scheduling.fs")
+@mock.patch("testsystem.scheduling.testset")
+def test_first_result_of_speculative_duplicate_is_used(
+    testset_mock, fs_mock, publisher_mock
+):
+    test_run = _create_test_run(2)
+    testset_mock.add_result.return_value = test_run.test_set
+    tasks = test_run.get_tasks(1)
+    scheduling._register_test_run(test_run)
+    for task in tasks:
+        schedule_task(task)
+    straggler = get_next_task(_create_task_worker(scope=False))
+    other_task = get_next_task(_create_task_worker(scope=False))
+    assert straggler is not None and other_task is not None
+    straggler.test_unit = mock.MagicMock()
+    duplicate = scheduling.speculate(straggler)
+    assert duplicate is not None
+
+    # The straggler finishes before its duplicate started
+    test_run.task_finished(_create_test_case(other_task))
+    test_run.task_finished(_create_test_case(straggler))
+
+    assert [straggler.test_unit] == duplicate.excluded_test_units
+    assert 0 == queue_size()
+    assert test_run.completed
+    assert 2 == testset_mock.add_result.call_count
+    assert 0 == len(scheduling.get_active_test_runs())
+
+
+@mock.patch("testsystem.scheduling.publisher")
+@mock.patch("testsystem.scheduling.fs")
+@mock.patch("testsystem.scheduling.testset")
+def test_failed_original_of_finished_duplicate_is_not_rescheduled(
+    testset_mock, fs_mock, publisher_mock
+):
+    test_run = _create_test_run(2)
+    testset_mock.add_result.return_value = test_run.test_set
+    tasks = test_run.get_tasks(1)
+    scheduling._register_test_run(test_run)
+    for task in tasks:
+        schedule_task(task)
+    straggler = get_next_task(_create_task_worker(scope=False))
+    other_task = get_next_task(_create_task_worker(scope=False))
+    assert straggler is not None and other_task is not None
+    straggler.test_unit = mock.MagicMock()
+    straggler._TestCaseTask__test_case = _create_test_case(straggler)
+    duplicate = scheduling.speculate(straggler)
+    assert duplicate == get_next_task(_create_task_worker(scope=False))
+
+    # The duplicate finishes first, then the original fails
+    test_run.task_finished(_create_test_case(duplicate))
+    test_run.test_failed(straggler, Exception("Connection lost"))
+
+    assert 0 == queue_size()
+    assert 1 == testset_mock.add_result.call_count
+    assert not test_run.completed
+    test_run.task_finished(_create_test_case(other_task))
+    assert test_run.completed
+    assert 2 == testset_mock.add_result.call_count
+
+
+@mock.patch("testsystem.scheduling.publisher")
+@mock.patch("testsystem.scheduling.fs")
+@mock.patch("testsystem.scheduling.testset")
+@mock.patch("testsystem.scheduling.cnf")
+def test_failed_task_gives_up_after_max_attempts(
+    cnf_mock, testset_mock, fs_mock, publisher_mock
+):
+    cnf_mock.get_config.return_value.priority_band_width = 1.0
+    cnf_mock.get_config.return_value.tu_scope_preference = False
+    cnf_mock.get_config.return_value.tu_scope_reserved = 0
+    cnf_mock.get_config.return_value.task_max_attempts = 2
+    test_run = _create_test_run(1)
+    testset_mock.add_result.return_value = test_run.test_set
+    scheduling._register_test_run(test_run)
+    schedule_task(test_run.get_tasks(1)[0])
+    task = get_next_task(_create_task_worker(scope=False))
+    assert task is not None
+    task.test_unit = mock.MagicMock()
+    test_case = _create_test_case(task)
+    task._TestCaseTask__test_case = test_case
+
+    task.attempts = 1
+    test_run.test_failed(task, Exception("Connection lost"))
+    assert 1 == queue_size()
+    assert task == get_next_task(_create_task_worker(scope=False))
+
+    task.attempts = 2
+    test_run.test_failed(task, Exception("Connection lost"))
+
+    assert 0 == queue_size()
+    assert test_run.completed
+    assert not test_case.successful
+    assert test_case.result.output.startswith("Infrastructure error after 2 attempts.")
+    testset_mock.add_result.assert_called_once_with(test_run.test_set, test_case.result)
+    assert 0 == len(scheduling.get_active_test_runs())
+
+
+def _create_test_case(task):
+    test_case = mock.MagicMock()
+    test_case.definition = task.test_case_def
+    return test_case
+
+
+def test_scope_worker_prefers_timing_tasks():
+    scope_worker = _create_task_worker(scope=True)
+    task1 = Task(priority=1)
+    task2 = Task(priority=2, tag=TUTAG_SCOPE)
+    schedule_task(task1)
+    schedule_task(task2)
+
+    first_task = get_next_task(scope_worker)
+    second_task = get_next_task(scope_worker)
+
+    assert task2 == first_task
+    assert task1 == second_task
+
+
+@mock.patch("testsystem.scheduling.cnf")
+def test_scope_worker_reserved_for_timing_tasks(cnf_mock):
+    cnf_mock.get_config.return_value.priority_band_width = 1.0
+    cnf_mock.get_config.return_value.tu_scope_preference = True
+    cnf_mock.get_config.return_value.tu_scope_reserved = 1
+    scheduling._scope_workers.clear()
+    scope_worker1 = _create_task_worker(scope=True)
+    scope_worker2 = _create_task_worker(scope=True)
+    tasks = [Task(priority=1), Task(priority=1), Task(priority=2, tag=TUTAG_SCOPE)]
+    for task in tasks[0:2]:
+        schedule_task(task)
+
+    get_next_task(scope_worker2)
+    first_task = get_next_task(scope_worker1)
+    second_task = get_next_task(scope_worker2)
+    schedule_task(tasks[2])
+    third_task = get_next_task(scope_worker1)
+    fourth_task = get_next_task(scope_worker1)
+    scheduling._scope_workers.clear()
+
+    assert tasks[0] == first_task
+    assert None == second_task
+    assert tasks[2] == third_task
+    assert tasks[1] == fourth_task
+
+
+def _create_unfinished_test_set(finished_tc_ids: list[int]):
+    test_set = mock.MagicMock()
+    test_set.id = 2
+    test_set.group_id = 1
+    test_set.commit_hash = "0123456789"
+    test_set.test_results = []
+    for tc_id in finished_tc_ids:
+        test_result = mock.MagicMock()
+        test_result.test_case_id = tc_id
+        test_set.test_results.append(test_result)
+    return test_set
+
+
+@mock.patch("testsystem.scheduling.fs")
+@mock.patch("testsystem.scheduling.TestSet")
+@mock.patch("testsystem.scheduling.TestCaseDef")
+@pytest.mark.parametrize("tagged", [False, True])
+def test_resume_unfinished_test_runs(tc_def_mock, test_set_mock, fs_mock, tagged):
+    tc_defs = []
+    for tc_id in [1, 2, 3]:
+        tc_def = mock.MagicMock()
+        tc_def.id = tc_id
+        tc_def.timing = False
+        tc_defs.append(tc_def)
+    tc_def_mock.get.return_value = tc_defs
+    test_set = _create_unfinished_test_set([1, 3])
+    test_set.group.get_priority.return_value = 12
+    test_set_mock.get_unfinished_test_sets.return_value = [test_set]
+    fs_mock.setup_test_env.return_value.commit_hash = test_set.commit_hash
+    fs_mock.get_tagged_group_commit.return_value = (
+        [test_set.commit_hash] if tagged else []
+    )
+
+    task_cnt = scheduling.resume_unfinished_test_runs()
+    test_run = scheduling._get_active_test_run(test_set.id)
+    tasks = [get_next_task(mock.MagicMock()) for _ in range(2)]
+    scheduling._unregister_test_run(test_run)
+
+    assert 1 == task_cnt
+    assert [tc_defs[1]] == test_run.tc_defs
+    assert test_run.tagged == tagged
+    assert (25 if tagged else 12) == tasks[0].priority
+    assert None == tasks[1]
+
+
+@mock.patch("testsystem.scheduling.fs")
+@mock.patch("testsystem.scheduling.TestSet")
+@mock.patch("testsystem.scheduling.TestCaseDef")
+def test_delete_test_set_if_resume_fails(tc_def_mock, test_set_mock, fs_mock):
+    tc_def_mock.get.return_value = []
+    test_set = _create_unfinished_test_set([])
+    test_set_mock.get_unfinished_test_sets.return_value = [test_set]
+    fs_mock.setup_test_env.side_effect = GitError("Checkout failed.")
+
+    task_cnt = scheduling.resume_unfinished_test_runs()
+
+    assert 0 == task_cnt
+    test_set.delete.assert_called_once()
+
+
+@mock.patch("testsystem.scheduling.QueuedTask")
+@mock.patch("testsystem.scheduling.shared_queue")
+def test_supersede_removes_shared_tasks(shared_queue_mock, queued_task_mock):
+    shared_queue_mock.enabled.return_value = True
+    test_run = _create_test_run(2)
+    test_run.in_flight = 1
+
+    test_run.supersede()
+    test_run.test_set.delete.assert_not_called()
+    test_run.task_finished(mock.MagicMock(), queue_id=3)
+
+    queued_task_mock.remove_test_set.assert_called_once_with(test_run.test_set.id)
+    queued_task_mock.complete.assert_not_called()
+    test_run.test_set.delete.assert_called_once()
+    test_run.test_env.cleanup.assert_called_once()
+
+
+@mock.patch("testsystem.scheduling.publisher")
+@mock.patch("testsystem.scheduling.testset")
+@mock.patch("testsystem.scheduling.fs")
+@mock.patch("testsystem.scheduling.TestSet")
+@mock.patch("testsystem.scheduling.QueuedTask")
+@mock.patch("testsystem.scheduling.shared_queue")
+@pytest.mark.parametrize("remaining_cnt", [0, 1])
+def test_shared_task_finishes_test_run_if_queue_is_empty(
+    shared_queue_mock,
+    queued_task_mock,
+    test_set_mock,
+    fs_mock,
+    testset_mock,
+    publisher_mock,
+    remaining_cnt,
+):
+    shared_queue_mock.enabled.return_value = True
+    queued_task_mock.complete.return_value = True
+    queued_task_mock.count.return_value = remaining_cnt
+    test_run = _create_test_run(2)
+    test_run.test_set.try_set_finished.return_value = True
+    test_run.in_flight = 1
+    calls = mock.MagicMock()
+    calls.attach_mock(testset_mock.flush_results, "flush_results")
+    calls.attach_mock(test_run.test_set.try_set_finished, "try_set_finished")
+
+    test_run.task_finished(mock.MagicMock(), queue_id=3)
+
+    # Buffered results are stored before the test set is finished
+    assert "flush_results" == calls.mock_calls[0][0]
+    testset_mock.flush_results.assert_any_call(1)
+    assert 0 == test_run.in_flight
+    assert 1 == len(test_run.finished_tcs)
+    assert (remaining_cnt == 0) == test_run.completed
+    assert (remaining_cnt == 0) == publisher_mock.submit.called
+    shared_queue_mock.remove_claim.assert_called_once_with(3)
+
+
+@mock.patch("testsystem.scheduling.TestCaseDef")
+@mock.patch("testsystem.scheduling._get_shared_test_run")
+@mock.patch("testsystem.scheduling.QueuedTask")
+@mock.patch("testsystem.scheduling.shared_queue")
+def test_get_next_task_from_shared_queue(
+    shared_queue_mock, queued_task_mock, get_test_run_mock, tc_def_mock
+):
+    shared_queue_mock.enabled.return_value = True
+    queued_task1 = QueuedTask(id=1, test_case_id=1, priority=2, schedule_time=10)
+    queued_task2 = QueuedTask(id=2, test_case_id=2, priority=1, schedule_time=10)
+    queued_task1.expected_runtime = queued_task2.expected_runtime = 0
+    # The task with the highest priority is leased by another instance
+    queued_task_mock.get_available.side_effect = [
+        [queued_task1, queued_task2],
+        [queued_task1],
+    ]
+    queued_task_mock.claim.side_effect = [False, True]
+    test_run = _create_test_run(0)
+    get_test_run_mock.return_value = test_run
+
+    task = get_next_task(_create_task_worker(scope=False))
+
+    assert task is not None
+    assert 1 == task.queue_id
+    assert 10 == task.schedule_time
+    assert 1 == test_run.in_flight
+    assert [2, 1] == [c.args[0] for c in queued_task_mock.claim.call_args_list]
+    shared_queue_mock.add_claim.assert_called_once_with(1)
+    scheduling._running_tasks.clear()
+
+
+@mock.patch("testsystem.scheduling.cnf")
+@mock.patch("testsystem.scheduling.QueuedTask")
+@mock.patch("testsystem.scheduling.shared_queue")
+def test_shared_task_is_claimed_without_scheduler_lock(
+    shared_queue_mock, queued_task_mock, cnf_mock
+):
+    cnf_mock.get_config.return_value.priority_band_width = 1.0
+    cnf_mock.get_config.return_value.tu_scope_preference = True
+    cnf_mock.get_config.return_value.tu_scope_reserved = 1
+    shared_queue_mock.enabled.return_value = True
+    claiming_worker = _create_task_worker(scope=True)
+    other_worker = _create_task_worker(scope=True)
+    scheduling._scope_workers.clear()
+    scheduling._scope_workers.update([claiming_worker, other_worker])
+    states = []
+
+    def get_available(**_):
+        # Another scope worker asks for a general task during the claim
+        other_may_run = scheduling._may_run_general_task(other_worker, 1)
+        states.append((scheduling._scheduled_tasks_lock.locked(), other_may_run))
+        return []
+
+    queued_task_mock.get_available.side_effect = get_available
+
+    task = get_next_task(claiming_worker)
+
+    assert task is None
+    assert [(False, False)] == states
+    assert 0 == len(scheduling._claiming_workers)
+    assert scheduling._may_run_general_task(other_worker, 1)
+    scheduling._scope_workers.clear()
@@ -0,0 +1,184 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+from __future__ import annotations
+
+import time
+import pytest
+import multiprocessing
+import unittest.mock as mock
+import testsystem.db as db
+import testsystem.config as cnf
+import testsystem.shared_queue as shared_queue
+
+from sqlalchemy import create_engine
+from testsystem.models import QueuedTask, Lease, TestResult
+from testsystem.constants import LEADER_LEASE_NAME, TUTAG_SCOPE
+
+
+def _create_engine(db_file):
+    return create_engine(
+        f"sqlite+pysqlite:///{db_file}", future=True, connect_args={"timeout": 20}
+    )
+
+
+@pytest.fixture()
+def db_file(tmp_path):
+    db_file = tmp_path / "shared_queue.db"
+    engine = _create_engine(db_file)
+    prev_engine = db.set_engine(engine)
+    yield db_file
+    db.set_engine(prev_engine)
+    engine.dispose()
+
+
+def _enqueue(task_cnt: int, test_set_id: int = 1) -> list[int]:
+    queued_tasks = [
+        QueuedTask(
+            test_set_id=test_set_id,
+            test_case_id=i,
+            priority=10,
+            schedule_time=time.time(),
+        )
+        for i in range(task_cnt)
+    ]
+    QueuedTask.enqueue(queued_tasks)
+    return [t.id for t in QueuedTask.get_available(limit=task_cnt)]
+
+
+def test_available_tasks_are_filtered_by_test_unit_tags(db_file):
+    _enqueue(3)
+    timing_task = QueuedTask(
+        test_set_id=1,
+        test_case_id=3,
+        priority=20,
+        schedule_time=time.time(),
+        test_unit_tag=TUTAG_SCOPE,
+    )
+    QueuedTask.enqueue([timing_task])
+
+    general_ids = [t.test_case_id for t in QueuedTask.get_available(tags=[], limit=3)]
+    scope_ids = [
+        t.test_case_id
+        for t in QueuedTask.get_available(
+            tags=[TUTAG_SCOPE], prefer_tagged=True, limit=2
+        )
+    ]
+
+    # The timing task has the lowest priority, but is not cut off for scope units
+    assert [0, 1, 2] == general_ids
+    assert [3, 0] == scope_ids
+
+
+def _claim_all(db_file, owner: str, results):
+    db.set_engine(_create_engine(db_file))
+    claimed = []
+    while True:
+        queued_tasks = QueuedTask.get_available()
+        if len(queued_tasks) == 0:
+            break
+        for queued_task in queued_tasks:
+            if QueuedTask.claim(queued_task.id, owner, 60):
+                claimed.append(queued_task.id)
+                break
+    results.put(claimed)
+
+
+def test_tasks_are_claimed_once_by_concurrent_instances(db_file):
+    queue_ids = _enqueue(40)
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_claim_all, args=(db_file, f"node{i}", results))
+        for i in range(4)
+    ]
+    for p in processes:
+        p.start()
+    claimed = []
+    for _ in processes:
+        claimed.extend(results.get(timeout=60))
+    for p in processes:
+        p.join()
+
+    assert sorted(queue_ids) == sorted(claimed)
+
+
+def test_expired_lease_is_claimed_by_other_instance(db_file):
+    queue_id = _enqueue(1)[0]
+
+    claimed_a = QueuedTask.claim(queue_id, "a", -1)
+    claimed_b = QueuedTask.claim(queue_id, "b", 60)
+    claimed_c = QueuedTask.claim(queue_id, "c", 60)
+    result = TestResult(test_case_id=0, successful=True, timestamp=0)
+    completed_a = QueuedTask.complete(queue_id, "a", 1, result)
+    completed_b = QueuedTask.complete(queue_id, "b", 1, result)
+
+    assert claimed_a and claimed_b and not claimed_c
+    assert not completed_a and completed_b
+    assert 0 == QueuedTask.count(1)
+
+
+def test_released_task_is_available_again(db_file):
+    queue_id = _enqueue(1)[0]
+    QueuedTask.claim(queue_id, "a", 60)
+    assert 0 == QueuedTask.count_available()
+
+    QueuedTask.release(queue_id, "a", priority=9)
+    queued_tasks = QueuedTask.get_available()
+
+    assert 1 == len(queued_tasks)
+    assert 9 == queued_tasks[0].priority
+
+
+def test_lease_is_held_by_one_instance(db_file):
+    acquired_a = Lease.acquire("test", "a", 60)
+    acquired_b = Lease.acquire("test", "b", 60)
+    renewed_a = Lease.acquire("test", "a", 60)
+    Lease.release("test", "a")
+    acquired_b_after_release = Lease.acquire("test", "b", 60)
+
+    assert acquired_a and renewed_a
+    assert not acquired_b
+    assert acquired_b_after_release
+    assert "b" == Lease.get_owner("test")
+
+
+def test_heartbeat_renews_leases_and_elects_leader(db_file):
+    conf = cnf.Config()
+    conf.queue_backend = "database"
+    conf.queue_lease_s = 60
+    queue_id = _enqueue(1)[0]
+    QueuedTask.claim(queue_id, "a", -1)
+    shared_queue.add_claim(queue_id)
+    with mock.patch("testsystem.shared_queue.cnf") as cnf_mock:
+        cnf_mock.get_config.return_value = conf
+        conf.node_name = "a"
+        shared_queue.heartbeat()
+        leader_a = shared_queue.is_leader()
+        conf.node_name = "b"
+        shared_queue.heartbeat()
+        leader_b = shared_queue.is_leader()
+    shared_queue.remove_claim(queue_id)
+
+    assert leader_a and not leader_b
+    assert "a" == Lease.get_owner(LEADER_LEASE_NAME)
+    assert not QueuedTask.claim(queue_id, "b", 60)
@@ -0,0 +1,96 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+from __future__ import annotations
+
+import pytest
+import testsystem.config as cnf
+
+from testsystem.simulation import (
+    Simulation,
+    SimCommit,
+    SimResult,
+    SimTestCase,
+    SimTestUnit,
+    Workload,
+)
+
+
+def _create_workload(commits: list[SimCommit]) -> Workload:
+    test_cases = [SimTestCase(10), SimTestCase(10), SimTestCase(20, timing=True)]
+    workload = Workload(2, commits, test_cases)
+    workload.runtime_jitter = 0
+    return workload
+
+
+def test_simulate_single_commits():
+    workload = _create_workload([SimCommit(0, 1), SimCommit(0, 2)])
+    test_units = [SimTestUnit("TU0", scope=True), SimTestUnit("TU1")]
+
+    result = Simulation(workload, test_units, poll_interval_s=10).run()
+
+    assert 2 == result.reports
+    assert 2 == len(result.time_to_report)
+    assert 40 == result.duration
+    assert pytest.approx(1.0) == result.utilisation()
+    assert 0 == result.superseded
+
+
+@pytest.mark.parametrize("supersede", [False, True])
+def test_simulate_supersede_test_runs(supersede):
+    workload = _create_workload([SimCommit(0, 1), SimCommit(5, 1)])
+    test_units = [SimTestUnit("TU0", scope=True)]
+    config = cnf.Config()
+    config.supersede_test_runs = supersede
+
+    result = Simulation(workload, test_units, config, poll_interval_s=10).run()
+
+    assert (1 if supersede else 0) == result.superseded
+    assert (1 if supersede else 2) == result.reports
+    assert 2 == len(result.time_to_report)
+
+
+def test_simulate_tagged_test_run_is_not_superseded():
+    workload = _create_workload([SimCommit(0, 1, tagged=True), SimCommit(5, 1)])
+    test_units = [SimTestUnit("TU0", scope=True)]
+    config = cnf.Config()
+    config.supersede_test_runs = True
+
+    result = Simulation(workload, test_units, config, poll_interval_s=10).run()
+
+    assert 0 == result.superseded
+    assert 2 == result.reports
+
+
+def test_simulation_result_metrics():
+    result = SimResult()
+    result.duration = 3600
+    result.reports = 10
+    result.group_time_to_report = {1: 100, 2: 100, 3: 400}
+    result.busy_time = {"TU0": 3600, "TU1": 1800}
+    result.scope_units = ["TU0"]
+
+    assert 10 == result.throughput
+    assert pytest.approx(0.75) == result.utilisation()
+    assert pytest.approx(1.0) == result.utilisation(scope=True)
+    assert pytest.approx(0.5) == result.utilisation(scope=False)
+    assert pytest.approx(0.6667, abs=1e-4) == result.fairness
@@ -0,0 +1,127 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import pytest
+import unittest.mock as mock
+
+import testsystem.config as cnf
+import testsystem.supervision as supervision
+
+from testsystem.models import TestCaseTask
+from testsystem.constants import STRAGGLER_GRACE_S, WORKER_RECYCLE_DELAY_S
+
+
+@pytest.fixture(autouse=True)
+def conf():
+    conf = cnf.Config()
+    conf.straggler_factor = 2.0
+    conf.hung_task_factor = 3.0
+    conf.speculative_execution = True
+    with mock.patch("testsystem.supervision.cnf") as cnf_mock:
+        cnf_mock.get_config.return_value = conf
+        yield conf
+
+
+@pytest.fixture(autouse=True)
+def clear_supervision():
+    supervision.clear()
+    yield
+    supervision.clear()
+
+
+@pytest.fixture(autouse=True)
+def test_case_runtime_mock():
+    with mock.patch("testsystem.supervision.TestCaseRuntime") as runtime_mock:
+        runtime_mock.get.return_value = None
+        yield runtime_mock
+
+
+def _create_running_task(runtime: float, start_time: float = 1000) -> TestCaseTask:
+    tc_def = mock.MagicMock()
+    tc_def.runtime = runtime
+    task = TestCaseTask(mock.MagicMock(), 10, tc_def, mock.MagicMock())
+    task.test_unit = mock.MagicMock()
+    task.start_time = start_time
+    task.thread_id = 42
+    return task
+
+
+def _create_worker(idle: bool):
+    worker = mock.MagicMock()
+    worker.running = True
+    worker.idle = idle
+    return worker
+
+
+def test_straggler_limit_uses_runtime_history(conf, test_case_runtime_mock):
+    task = _create_running_task(10)
+    tc_runtime = mock.MagicMock()
+    tc_runtime.count = 5
+    tc_runtime.mean = 50
+    tc_runtime.std = 10
+    test_case_runtime_mock.get.return_value = tc_runtime
+
+    limit = supervision.get_straggler_limit(task, conf)
+
+    assert 160 + STRAGGLER_GRACE_S == limit
+
+
+@mock.patch("testsystem.supervision.time")
+@mock.patch("testsystem.supervision.scheduling")
+@pytest.mark.parametrize("idle", [False, True])
+def test_straggler_is_duplicated_on_idle_unit(scheduling_mock, time_mock, idle):
+    task = _create_running_task(10)
+    busy_worker = _create_worker(idle=False)
+    scheduling_mock.get_running_tasks.return_value = [(busy_worker, task)]
+    time_mock.time.return_value = task.start_time + 20 + STRAGGLER_GRACE_S
+
+    supervision.check([busy_worker, _create_worker(idle=idle)])
+    supervision.check([busy_worker, _create_worker(idle=idle)])
+
+    if idle:
+        scheduling_mock.speculate.assert_called_once_with(task)
+    else:
+        scheduling_mock.speculate.assert_not_called()
+
+
+@mock.patch("testsystem.supervision.utils")
+@mock.patch("testsystem.supervision.time")
+@mock.patch("testsystem.supervision.scheduling")
+def test_hung_task_is_cancelled_and_worker_recycled(
+    scheduling_mock, time_mock, utils_mock
+):
+    task = _create_running_task(10)
+    worker = _create_worker(idle=False)
+    scheduling_mock.get_running_tasks.return_value = [(worker, task)]
+    hung_time = task.start_time + (20 + STRAGGLER_GRACE_S) * 3
+
+    time_mock.time.return_value = hung_time
+    supervision.check([worker])
+    utils_mock.kill_processes.assert_called_once_with(42)
+    worker.recycle.assert_not_called()
+
+    time_mock.time.return_value = hung_time + WORKER_RECYCLE_DELAY_S
+    supervision.check([worker])
+    supervision.check([worker])
+
+    utils_mock.kill_processes.assert_called_once()
+    worker.recycle.assert_called_once()
@@ -0,0 +1,64 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import time
+import threading
+import unittest.mock as mock
+
+from testsystem.models import TaskWorker
+
+
+def _wait_until(condition, timeout: float = 5):
+    end_time = time.time() + timeout
+    while not condition() and time.time() < end_time:
+        time.sleep(0.01)
+    assert condition()
+
+
+@mock.patch("testsystem.models.task_worker.time")
+@mock.patch("testsystem.models.task_worker.scheduling")
+def test_recycled_worker_waits_for_abandoned_thread(scheduling_mock, time_mock):
+    time_mock.sleep.side_effect = lambda _: time.sleep(0.01)
+    release_event = threading.Event()
+    hung_task = mock.MagicMock()
+    hung_task.run_safe.side_effect = lambda _: release_event.wait()
+    tasks = [hung_task]
+    scheduling_mock.get_next_task.side_effect = lambda _: tasks.pop() if tasks else None
+    worker = TaskWorker(mock.MagicMock(), "TestWorker")
+    worker.start()
+    _wait_until(lambda: hung_task.run_safe.called)
+    abandoned_thread = worker.thread
+
+    try:
+        worker.recycle()
+        time.sleep(0.2)
+        assert 1 == scheduling_mock.get_next_task.call_count
+
+        release_event.set()
+        _wait_until(lambda: scheduling_mock.get_next_task.call_count > 1)
+    finally:
+        release_event.set()
+        worker.stop()
+
+    assert abandoned_thread is not None
+    assert not abandoned_thread.is_alive()
+    assert 1 == worker.generation
@@ -22,9 +22,16 @@
 import pytest
 import unittest.mock as mock
 
-from testsystem.models.test_case_def import TestCaseDef, get_all, get
+from testsystem.models.test_case_def import (
+    TestCaseDef,
+    get_all,
+    get,
+    get_ranking_tests,
+    get_max_exercise_nr,
+    get_version,
+)
 from testsystem.config import Config
-from testsystem.constants import TC_DEF_CACHE_TIME_S
+from testsystem.constants import TC_DEF_MTIME_CHECK_INTERVAL_S
 
 
 @mock.patch("testsystem.models.test_case_def.get_test_case_definitions")
@@ -63,74 +70,120 @@ def test_get_testcase_ignores_empty_line(m_warn, m_get_defs, line):
     m_warn.assert_not_called()
 
 
+def _raw_tc_def(id: int, ex: int = 1, timing: int = 0, ranking: int = 0) -> str:
+    return (
+        f"#tc{str(id).zfill(3)}: ex={str(ex).zfill(2)} timing={timing} size=0 panic=0"
+        f' ranking={ranking} runtime=1 description="Test{id}"'
+    )
+
+
 @mock.patch("testsystem.models.test_case_def.get_config")
-@mock.patch("testsystem.models.test_case_def.get_all")
-def test_get_testcases_for_active_or_previous_exercises(m_get_all, m_get_config):
+@mock.patch("testsystem.models.test_case_def.get_test_case_definitions")
+def test_get_testcases_for_active_or_previous_exercises(m_get_defs, m_get_config):
     conf = Config()
     conf.exercise_nr = 1
-    tcs = [
-        TestCaseDef(exercise_nr=0),
-        TestCaseDef(exercise_nr=1),
-        TestCaseDef(exercise_nr=2),
-    ]
+    m_get_defs.return_value = "\n".join([_raw_tc_def(i, ex=i) for i in range(3)])
     m_get_config.return_value = conf
-    m_get_all.return_value = tcs
     result = get(disable_cache=True)
     assert 2 == len(result)
-    assert tcs[0] == result[0]
-    assert tcs[1] == result[1]
+    assert 0 == result[0].id
+    assert 1 == result[1].id
 
 
 @mock.patch("testsystem.models.test_case_def.get_config")
-@mock.patch("testsystem.models.test_case_def.get_all")
-def test_do_not_include_timing_tests_if_disabled(m_get_all, m_get_config):
+@mock.patch("testsystem.models.test_case_def.get_test_case_definitions")
+def test_do_not_include_timing_tests_if_disabled(m_get_defs, m_get_config):
     conf = Config()
+    conf.exercise_nr = 1
     conf.enable_timing_tests = False
-    tcs = [TestCaseDef(timing=True), TestCaseDef(timing=False)]
+    m_get_defs.return_value = "\n".join(
+        [_raw_tc_def(0, timing=1), _raw_tc_def(1, timing=0)]
+    )
     m_get_config.return_value = conf
-    m_get_all.return_value = tcs
     result = get(disable_cache=True)
     assert 1 == len(result)
-    assert tcs[1] == result[0]
+    assert 1 == result[0].id
 
 
-@mock.patch("testsystem.models.test_case_def._tc_defs", None)
-@mock.patch("testsystem.models.test_case_def._tc_defs_timestamp", 0)
+@mock.patch("testsystem.models.test_case_def._registry", None)
+@mock.patch("testsystem.models.test_case_def.get_config")
+@mock.patch("testsystem.models.test_case_def.get_test_case_definitions")
+def test_views_follow_config_snapshot(m_get_defs, m_get_config):
+    conf = Config()
+    conf.exercise_nr = 1
+    m_get_defs.return_value = "\n".join(
+        [_raw_tc_def(0, ex=1, ranking=1), _raw_tc_def(1, ex=2, ranking=1)]
+    )
+    m_get_config.return_value = conf
+    get_all(disable_cache=True)
+    ranking1 = get_ranking_tests()
+    conf.exercise_nr = 2
+    ranking2 = get_ranking_tests()
+    assert [0] == [tc.id for tc in ranking1]
+    assert [0, 1] == [tc.id for tc in ranking2]
+    assert 2 == get_max_exercise_nr()
+    assert 2 == TestCaseDef.get_by_id(1).exercise_nr  # type: ignore
+    assert TestCaseDef.get_by_id(2) is None
+
+
+@mock.patch("testsystem.models.test_case_def._registry", None)
 @mock.patch("testsystem.models.test_case_def.time.time")
+@mock.patch("testsystem.models.test_case_def.get_test_case_definitions_mtime")
 @mock.patch("testsystem.models.test_case_def.get_test_case_definitions")
-def test_cache_timeout(m_get_tc_defs, m_time):
+def test_cache_invalidated_by_mtime(m_get_tc_defs, m_mtime, m_time):
     base_time = 10000
-    tc_def_raw = [
-        '#tc001: ex=01 timing=0 size=0 panic=0 ranking=0 runtime=1 description="Test1"',
-        '#tc002: ex=02 timing=0 size=0 panic=0 ranking=0 runtime=1 description="Test2"',
-    ]
+    tc_def_raw = [_raw_tc_def(1, ex=1), _raw_tc_def(2, ex=2)]
     m_get_tc_defs.return_value = tc_def_raw[0]
+    m_mtime.return_value = 500.0
     m_time.return_value = base_time
     tc_defs1 = get_all()
-    m_time.return_value = base_time + TC_DEF_CACHE_TIME_S - 1
-    tc_defs2 = get_all()
     m_get_tc_defs.return_value = "\n".join(tc_def_raw)
-    m_time.return_value = base_time + TC_DEF_CACHE_TIME_S
+    m_time.return_value = base_time + TC_DEF_MTIME_CHECK_INTERVAL_S
+    tc_defs2 = get_all()
+    m_mtime.return_value = 600.0
+    m_time.return_value = base_time + 2 * TC_DEF_MTIME_CHECK_INTERVAL_S
     tc_defs3 = get_all()
     assert len(tc_defs1) == 1
     assert len(tc_defs2) == 1
     assert len(tc_defs3) == 2
+    assert 2 == m_get_tc_defs.call_count
 
 
-@mock.patch("testsystem.models.test_case_def._tc_defs", None)
-@mock.patch("testsystem.models.test_case_def._tc_defs_timestamp", 0)
+@mock.patch("testsystem.models.test_case_def._registry", None)
 @mock.patch("testsystem.models.test_case_def.time.time")
+@mock.patch("testsystem.models.test_case_def.get_test_case_definitions_mtime")
 @mock.patch("testsystem.models.test_case_def.get_test_case_definitions")
-def test_renew_cache_after_timeout(m_get_tc_defs, m_time):
+def test_mtime_is_checked_after_interval(m_get_tc_defs, m_mtime, m_time):
     base_time = 10000
-    tc_def_raw = [
-        '#tc001: ex=01 timing=0 size=0 panic=0 ranking=0 runtime=1 description="Test1"',
-        '#tc002: ex=02 timing=0 size=0 panic=0 ranking=0 runtime=1 description="Test2"',
-    ]
-    m_get_tc_defs.return_value = tc_def_raw[0]
+    m_get_tc_defs.return_value = _raw_tc_def(1)
+    m_mtime.return_value = 500.0
     m_time.return_value = base_time
-    tc_defs1 = get_all()
-    m_get_tc_defs.return_value = "\n".join(tc_def_raw)
-    tc_defs2 = get_all()
-    assert len(tc_defs1) == 1
-    assert len(tc_defs2) == 1
+    get_all()
+    m_mtime.return_value = 600.0
+    m_time.return_value = base_time + TC_DEF_MTIME_CHECK_INTERVAL_S - 0.5
+    get_all()
+    assert 1 == m_get_tc_defs.call_count
+    m_time.return_value = base_time + TC_DEF_MTIME_CHECK_INTERVAL_S
+    get_all()
+    assert 2 == m_get_tc_defs.call_count
+
+
+@mock.patch("testsystem.models.test_case_def._registry", None)
+@mock.patch("testsystem.models.test_case_def.get_test_case_definitions_mtime")
+@mock.patch("testsystem.models.test_case_def.get_test_case_definitions")
+def test_version_depends_on_scoring_fields_only(m_get_tc_defs, m_mtime):
+    m_get_tc_defs.return_value = "\n".join([_raw_tc_def(1), _raw_tc_def(2)])
+    m_mtime.return_value = 500.0
+    get_all(disable_cache=True)
+    version1 = get_version()
+    m_get_tc_defs.return_value = "\n".join(
+        [_raw_tc_def(2), _raw_tc_def(1).replace("Test1", "Renamed")]
+    )
+    m_mtime.return_value = 600.0
+    get_all(disable_cache=True)
+    version2 = get_version()
+    m_get_tc_defs.return_value = "\n".join([_raw_tc_def(1), _raw_tc_def(2, ranking=1)])
+    get_all(disable_cache=True)
+    version3 = get_version()
+    assert version1 == version2
+    assert version1 != version3
@@ -0,0 +1,65 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import pytest
+import numpy as np
+import unittest.mock as mock
+import testsystem.models.test_case_runtime as tcr
+
+from concurrent.futures import Future
+from db_fixtures import *
+
+
+def test_add_runtime_samples(db_session):
+    samples = [12.0, 15.5, 9.25, 30.0]
+
+    for sample in samples:
+        tc_runtime = tcr._add_sample(db_session, 1, sample)
+
+    assert len(samples) == tc_runtime.count
+    assert pytest.approx(np.mean(samples)) == tc_runtime.mean
+    assert pytest.approx(np.std(samples, ddof=1)) == tc_runtime.std
+
+
+def test_runtime_samples_per_test_case(db_session):
+    tcr._add_sample(db_session, 1, 10.0)
+    tc_runtime = tcr._add_sample(db_session, 2, 20.0)
+
+    assert 1 == tc_runtime.count
+    assert 20.0 == tc_runtime.mean
+    assert 0.0 == tc_runtime.std
+
+
+@mock.patch("testsystem.models.test_case_runtime._runtime_cache", {})
+@mock.patch("testsystem.models.test_case_runtime.db_writer")
+def test_add_sample_updates_cache_when_written(db_writer_mock):
+    future = Future()
+    db_writer_mock.submit.return_value = future
+
+    # The write is still queued, so add_sample must not wait for it
+    tcr.TestCaseRuntime.add_sample(1, 10.0)
+    cached = tcr.TestCaseRuntime.get(1)
+    future.set_result(tcr.TestCaseRuntime(test_case_id=1, count=1, mean=10.0, m2=0))
+
+    assert cached is None
+    assert 10.0 == tcr.TestCaseRuntime.get(1).mean  # type: ignore
+    db_writer_mock.submit.assert_called_once_with(tcr._add_sample, 1, 10.0)
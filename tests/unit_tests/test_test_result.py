@@ -0,0 +1,95 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import unittest.mock as mock
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from testsystem.models import Group, TestResult, TestResultBlob, TestSet
+from testsystem.models.test_result_blob import truncate_text
+from db_fixtures import *
+
+
+def test_truncate_text_keeps_head_and_tail():
+    text = "a" * 10 + "b" * 10
+
+    truncated = truncate_text(text, 10)
+
+    assert text == truncate_text(text, 20)
+    assert truncated.startswith("aaaaa\n")
+    assert truncated.endswith("\nbbbbb")
+    assert "10 characters truncated" in truncated
+
+
+@mock.patch("testsystem.models.test_result.db")
+def test_outputs_are_compressed_and_loaded_on_access(m_db, db_engine):
+    m_db.get_engine = mock.Mock(return_value=db_engine)
+    with Session(db_engine, expire_on_commit=False) as session:
+        group = Group(group_name="test_result_blob", group_nr=996, term="SS0")
+        session.add(group)
+        session.flush()
+        test_set = TestSet(group_id=group.id, commit_hash="F00D", timestamp=0)
+        session.add(test_set)
+        session.flush()
+        results = [
+            TestResult(
+                test_set_id=test_set.id,
+                test_case_id=id,
+                successful=True,
+                timestamp=0,
+                output="Output " * 1000,
+                build_error="Error" if id == 1 else None,
+            )
+            for id in [1, 2]
+        ]
+        results.append(
+            TestResult(
+                test_set_id=test_set.id, test_case_id=3, successful=True, timestamp=0
+            )
+        )
+        session.add_all(results)
+        session.commit()
+        stored_output = session.execute(
+            text("SELECT output FROM TestResultBlobs WHERE test_result_id = :id"),
+            {"id": results[0].id},
+        ).scalar()
+        ids = [r.id for r in results]
+
+    with Session(db_engine, expire_on_commit=False) as session:
+        loaded = session.query(TestResult).filter(TestResult.id.in_(ids)).all()
+        loaded.sort(key=lambda r: r.test_case_id)
+    assert all("blob" not in r.__dict__ for r in loaded)
+
+    TestResult.load_texts(loaded[0:2])
+
+    assert "Output " * 1000 == loaded[0].output
+    assert "Error" == loaded[0].build_error
+    assert loaded[1].build_error is None
+    # Loaded on first access
+    assert "" == loaded[2].output
+    assert loaded[2].flash_output is None
+    assert len(stored_output) < 100
+
+    with Session(db_engine) as session:
+        session.delete(session.get(TestSet, test_set.id))
+        session.delete(session.get(Group, group.id))
+        session.commit()
+        assert 0 == session.query(TestResultBlob).count()
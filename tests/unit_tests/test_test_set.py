@@ -24,14 +24,17 @@ import sys
 import unittest.mock as mock
 import testsystem.models.test_set as ts
 
-from testsystem.models import Group, TestResult, TestSet
+from testsystem.models import Group, GroupScore, TestCaseDef, TestResult, TestSet
+from testsystem.models.test_case_def import is_score_tc
 from db_fixtures import *
 
 
+@mock.patch("testsystem.db_writer.db")
 @mock.patch("testsystem.models.test_set.db")
-def test_add_results(m_db, db_engine):
+def test_add_results(m_db, m_writer_db, db_engine):
     # Arrange
     m_db.get_engine = mock.Mock(return_value=db_engine)
+    m_writer_db.get_write_engine = mock.Mock(return_value=db_engine)
     connection = db_engine.connect()
     with Session(bind=connection, expire_on_commit=False) as session:
         session.begin(subtransactions=True)
@@ -43,6 +46,10 @@ def test_add_results(m_db, db_engine):
 
         # Act
         test_set = ts.add_result(test_set, test_result)
+        buffered_cnt = (
+            session.query(TestResult).filter_by(test_set_id=test_set.id).count()
+        )
+        ts.flush_results(test_set.id)
 
         # Assert
         db_test_results = (
@@ -50,6 +57,7 @@ def test_add_results(m_db, db_engine):
             .filter(TestResult.test_set_id == test_set.id)
             .all()
         )
+        assert 0 == buffered_cnt
         assert 1 == len(db_test_results)
         assert test_result.id > 0
         assert test_result in test_set.test_results
@@ -58,6 +66,28 @@ def test_add_results(m_db, db_engine):
         session.rollback()
 
 
+@mock.patch("testsystem.models.test_set._add_results")
+@mock.patch("testsystem.models.test_set.db")
+def test_flush_results_batches_and_keeps_results_on_error(m_db, m_add_results):
+    test_sets = [TestSet(id=id) for id in [1, 2]]
+    results = [TestResult(test_case_id=tc_id) for tc_id in range(3)]
+    ts.add_result(test_sets[0], results[0])
+    ts.add_result(test_sets[1], results[1])
+    m_add_results.side_effect = Exception("Database is locked")
+
+    with pytest.raises(Exception):
+        ts.flush_results()
+    ts.add_result(test_sets[0], results[2])
+    m_add_results.side_effect = None
+    ts.flush_results(test_sets[1].id)
+    ts.flush_results()
+
+    assert 3 == m_add_results.call_count
+    assert [results[1]] == m_add_results.call_args_list[1].args[1]
+    assert [results[0], results[2]] == m_add_results.call_args_list[2].args[1]
+    assert [1, 2, 1] == [r.test_set_id for r in results]
+
+
 @pytest.mark.parametrize(
     "msg",
     [
@@ -88,3 +118,92 @@ def test_commit_message_format(m_db, db_engine, msg):
         assert msg["expected"] == obj_msg
         assert msg["expected"] == db_msg
         session.rollback()
+
+
+@mock.patch("testsystem.models.group_score.tcdef")
+def test_finishing_test_sets_updates_group_score(m_tcdef, db_session):
+    tc_defs = {
+        1: TestCaseDef(id=1, exercise_nr=0),
+        2: TestCaseDef(id=2, exercise_nr=1),
+        3: TestCaseDef(id=3, exercise_nr=1, timing=True, ranking=True),
+    }
+    m_tcdef.get_by_id.side_effect = lambda id: tc_defs.get(id)
+    m_tcdef.is_score_tc.side_effect = is_score_tc
+    m_tcdef.get_version.return_value = "v1"
+    groups = [
+        Group(group_name=f"test_group_score_{i}", group_nr=990 + i, term="SS0")
+        for i in range(2)
+    ]
+    db_session.add_all(groups)
+    db_session.flush()
+
+    def add_test_set(group, commit, commit_time, results):
+        test_set = TestSet(
+            group_id=group.id, commit_hash=commit, commit_time=commit_time, timestamp=0
+        )
+        db_session.add(test_set)
+        db_session.flush()
+        for tc_id, successful, result in results:
+            db_session.add(
+                TestResult(
+                    test_set_id=test_set.id,
+                    test_case_id=tc_id,
+                    successful=successful,
+                    result=result,
+                    timestamp=0,
+                )
+            )
+        db_session.flush()
+        return test_set
+
+    a2 = add_test_set(
+        groups[0], "A2", 2, [(1, True, 1.0), (2, True, 1.0), (3, True, 0.5)]
+    )
+    a1 = add_test_set(groups[0], "A1", 1, [(1, True, 0.0), (2, False, None)])
+    b1 = add_test_set(groups[1], "B1", 1, [(2, True, 1.0)])
+    add_test_set(groups[1], "B2", 2, [(1, True, 1.0)])
+
+    ts.mark_finished(db_session, a2.id)
+    # Finishing an older test set keeps the score of the newer one
+    ts.mark_finished(db_session, a1.id)
+    ts.mark_finished(db_session, b1.id)
+    db_session.flush()
+
+    score_a = db_session.get(GroupScore, groups[0].id)
+    score_b = db_session.get(GroupScore, groups[1].id)
+    assert a2.id == score_a.test_set_id
+    assert 2 == score_a.total
+    assert [1, 1] == [score_a.get_exercise_result(ex) for ex in range(2)]
+    assert 0.5 == score_a.get_ranking_result(3)
+    assert 1 == score_b.total
+    assert [(groups[0].id, a2.id, 2), (groups[1].id, b1.id, 1)] == sorted(
+        ts._get_latest_finished_test_sets(db_session, [g.id for g in groups])
+    )
+
+
+def test_get_latest_and_existing_commits_of_groups(db_session):
+    groups = [
+        Group(group_name=f"test_existing_{i}", group_nr=980 + i, term="SS0")
+        for i in range(3)
+    ]
+    db_session.add_all(groups)
+    db_session.flush()
+    test_sets = [
+        TestSet(group_id=groups[i].id, commit_hash=commit, timestamp=0)
+        for i, commit in [(0, "AA01"), (0, "AA02"), (1, "BB01")]
+    ]
+    for test_set in test_sets:
+        db_session.add(test_set)
+        db_session.flush()
+    ids = [g.id for g in groups]
+
+    latest = ts._get_latest_test_sets(db_session, ids)
+    existing = ts._get_existing_commits(
+        db_session,
+        [(ids[0], "AA01"), (ids[0], "AA03"), (ids[1], "AA02"), (ids[1], "BB01")],
+    )
+
+    assert {ids[0]: test_sets[1].id, ids[1]: test_sets[2].id} == {
+        t.group_id: t.id for t in latest
+    }
+    assert {(ids[0], "AA01"), (ids[1], "BB01")} == existing
@@ -0,0 +1,111 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import pytest
+import unittest.mock as mock
+
+from testsystem.models import UnitHealth
+from testsystem.constants import BREAKER_CLOSED, BREAKER_OPEN, BREAKER_HALF_OPEN
+
+
+@pytest.fixture(autouse=True)
+def config_mock():
+    with mock.patch("testsystem.models.unit_health.get_config") as get_config_mock:
+        get_config_mock.return_value.tu_failure_threshold = 3
+        get_config_mock.return_value.tu_backoff_s = 60
+        get_config_mock.return_value.tu_backoff_max_s = 200
+        yield get_config_mock.return_value
+
+
+@pytest.fixture(autouse=True)
+def time_mock():
+    with mock.patch("testsystem.models.unit_health.time") as time_mock:
+        time_mock.time.return_value = 1000.0
+        yield time_mock
+
+
+def _open(health: UnitHealth):
+    for _ in range(3):
+        health.record_failure()
+
+
+def test_breaker_opens_after_consecutive_failures():
+    health = UnitHealth()
+    health.record_failure()
+    health.record_failure()
+    health.record_success()
+    health.record_failure()
+    health.record_failure()
+    assert BREAKER_CLOSED == health.state
+    assert health.accepts_tasks()
+
+    health.record_failure()
+
+    assert BREAKER_OPEN == health.state
+    assert health.degraded
+    assert not health.accepts_tasks()
+
+
+def test_successful_probe_closes_breaker(time_mock):
+    health = UnitHealth()
+    _open(health)
+    time_mock.time.return_value = 1060.0
+
+    assert health.accepts_tasks()
+    assert BREAKER_HALF_OPEN == health.state
+    health.task_started()
+    assert not health.accepts_tasks()
+    health.record_success()
+
+    assert BREAKER_CLOSED == health.state
+    assert health.accepts_tasks()
+    assert 0 == health.open_cnt
+
+
+def test_failed_probe_doubles_backoff(time_mock):
+    health = UnitHealth()
+    _open(health)
+    assert 1060.0 == health.open_until
+    time_mock.time.return_value = 1060.0
+    assert health.accepts_tasks()
+    health.task_started()
+
+    health.record_failure()
+
+    assert BREAKER_OPEN == health.state
+    assert 1180.0 == health.open_until
+    time_mock.time.return_value = 1180.0
+    assert health.accepts_tasks()
+    health.task_started()
+    health.record_failure()
+    # The backoff period is limited by tu_backoff_max_s
+    assert 1380.0 == health.open_until
+
+
+def test_disabled_breaker_never_opens(config_mock):
+    config_mock.tu_failure_threshold = 0
+    health = UnitHealth()
+    for _ in range(10):
+        health.record_failure()
+
+    assert BREAKER_CLOSED == health.state
+    assert health.accepts_tasks()
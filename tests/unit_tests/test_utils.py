@@ -19,6 +19,7 @@
 # OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 
+import threading
 import testsystem.utils as utils
 import unittest.mock as mock
 import pytest
@@ -55,6 +56,22 @@ def test_external_task_returnes_control_character(m_popen):
     assert "" == err
 
 
+def test_kill_registered_processes_of_thread():
+    process1 = mock.MagicMock()
+    process2 = mock.MagicMock()
+    utils.register_process(process1)
+    utils.register_process(process2)
+    utils.unregister_process(process2)
+
+    killed_cnt = utils.kill_processes(threading.get_ident())
+    utils.unregister_process(process1)
+
+    assert 1 == killed_cnt
+    process1.kill.assert_called_once()
+    process2.kill.assert_not_called()
+    assert 0 == utils.kill_processes(threading.get_ident())
+
+
 @pytest.mark.parametrize(
     "data",
     [
@@ -0,0 +1,88 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Write-behind accounting for group statistics. Queue times and fair share services are
+aggregated in memory and written to the database in batches by a background thread.
+At most :py:attr:`~testsystem.config.Config.accounting_flush_interval_s` seconds of
+accounting data are lost if the test system crashes. The same thread writes buffered
+test results of running test runs.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import testsystem.config as cnf
+import testsystem.models.test_set as testset
+
+from testsystem.models import Group, GroupShare
+
+_accounting_stop_event = threading.Event()
+_accounting_thread: threading.Thread | None = None
+
+
+def flush():
+    """
+    Write all pending accounting data and test results to the database.
+    """
+    Group.flush_queue_times()
+    GroupShare.checkpoint()
+    testset.flush_results()
+
+
+def _run_accounting(stop_event: threading.Event):
+    logging.info("[ACCOUNTING] Started successful.")
+    while not stop_event.is_set():
+        stop_event.wait(max(1, cnf.get_config().accounting_flush_interval_s))
+        try:
+            flush()
+        except Exception as ex:
+            logging.error(f"[ACCOUNTING] Flushing accounting data failed.", exc_info=ex)
+    logging.info("[ACCOUNTING] Stopped successful.")
+
+
+def start():
+    """
+    Starts the accounting thread.
+    """
+    global _accounting_thread, _accounting_stop_event
+    assert _accounting_thread is None
+    logging.info("[ACCOUNTING] Starting...")
+    _accounting_stop_event.clear()
+    _accounting_thread = threading.Thread(
+        target=_run_accounting, args=(_accounting_stop_event,)
+    )
+    _accounting_thread.start()
+
+
+def stop():
+    """
+    Stops the accounting thread. This call blocks until all pending accounting data is
+    written.
+    """
+    global _accounting_thread, _accounting_stop_event
+    assert _accounting_thread is not None
+    logging.info("[ACCOUNTING] Stopping...")
+    _accounting_stop_event.set()
+    _accounting_thread.join()
+    _accounting_thread = None
@@ -35,6 +35,7 @@ from testsystem.constants import CONFIG_CACHE_TIME_S
 last_config_timestamp = 0.0
 last_config: Config | None = None
 logging_enabled: bool = False
+config_override: Config | None = None
 
 
 class Config:
@@ -93,6 +94,42 @@ class Config:
     #: | Database server/host.
     db_server: str = "127.0.0.1"
 
+    #: | :guilabel:`env` :guilabel:`file`
+    #: | Flag to use the write-ahead log for SQLite databases. With the write-ahead log,
+    #:   readers don't block the writer and vice versa.
+    db_sqlite_wal: bool = True
+
+    #: | :guilabel:`env` :guilabel:`file`
+    #: | Synchronous mode of SQLite databases. Available options are: ``OFF``,
+    #:   ``NORMAL``, ``FULL``, ``EXTRA``\ . With the write-ahead log, ``NORMAL`` is
+    #:   safe against corruption and only the last transactions may be lost on a power
+    #:   failure.
+    db_sqlite_synchronous: str = "NORMAL"
+
+    #: | :guilabel:`env` :guilabel:`file`
+    #: | Maximum number of bytes of SQLite databases, which are memory-mapped for reads.
+    #:   A value of ``0`` disables memory-mapped I/O.
+    db_sqlite_mmap_size: int = 268435456
+
+    #: | :guilabel:`env` :guilabel:`file`
+    #: | Number of database connections kept open in the connection pool.
+    db_pool_size: int = 10
+
+    #: | :guilabel:`env` :guilabel:`file`
+    #: | Number of database connections, which are opened temporarily if all pooled
+    #:   connections are in use.
+    db_max_overflow: int = 20
+
+    #: | :guilabel:`env` :guilabel:`file`
+    #: | Time in seconds after which pooled MySQL connections are replaced, so they are
+    #:   not closed by the server while idle. A value of ``-1`` disables recycling.
+    db_pool_recycle_s: int = 3600
+
+    #: | :guilabel:`env` :guilabel:`file`
+    #: | Flag to test pooled MySQL connections before they are used. Connections closed
+    #:   by the server are replaced transparently.
+    db_pool_pre_ping: bool = True
+
     #: | :guilabel:`env` :guilabel:`file`
     #: | Option to define where to wirte testsystem logs.
     log_file: str = "/host/testsystem.log"
@@ -165,7 +202,8 @@ class Config:
 
     #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
     #: | Parameter to specify when to reset group priorities. The value is given in
-    #:   hours after which the priorities are reset to default.
+    #:   hours after which the priorities are reset to default. This is only used by
+    #:   the ``queue_time`` scheduling policy.
     prio_reset_h = 24
 
     #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
@@ -178,6 +216,167 @@ class Config:
     #: | System start delay in seconds. This might be used to wait for the database container.
     start_delay: int = 0
 
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Enables test impact analysis. A new commit only reruns test cases whose group
+    #:   source dependencies changed since the latest finished test run of the group.
+    #:   The results of all other test cases are taken over from this test run.
+    #:   Commits tagged with a force test tag are always tested completely.
+    enable_test_impact_analysis: bool = False
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Audit flag for test impact analysis. If set to ``True``, every commit gets a
+    #:   full test run, but dependencies are still collected.
+    impact_audit: bool = False
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Every n-th test run of a group is a full test run, even if test impact
+    #:   analysis is enabled. Only test runs with selected test cases are counted, and
+    #:   any full test run restarts the count. Values less than one disable periodic
+    #:   full test runs.
+    impact_full_run_interval: int = 10
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Optional file ownership per exercise for test impact analysis. The syntax is
+    #:   <Exercise>:<Pattern>, where the pattern is a file name or glob relative to the
+    #:   group source directory. Test cases without collected dependencies depend on all
+    #:   files owned by their exercise and previous exercises.
+    #: |
+    #: | ``2:scheduler.c`` would assign the file scheduler.c to exercise 2.
+    impact_exercise_files: list[str] = []
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | If set to ``True``, a new commit on the primary branch supersedes the running
+    #:   test run of the group's previous commit. Queued tasks of the previous commit
+    #:   are cancelled and its test set is discarded. Test runs of commits tagged with
+    #:   a force test tag are never superseded.
+    supersede_test_runs: bool = True
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Quiet period in seconds for new commits. A new commit is only scheduled once
+    #:   the primary branch of a group did not change for this time. Commits tagged
+    #:   with a force test tag are scheduled immediately. A value of ``0`` disables the
+    #:   quiet period.
+    commit_debounce_s: int = 0
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Maximum time in seconds a new commit is delayed by the quiet period
+    #:   (:py:attr:`~testsystem.config.Config.commit_debounce_s`). Values less than one
+    #:   disable the limit.
+    commit_debounce_max_s: int = 300
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Width of a priority band for task scheduling. Within a band, tasks with a
+    #:   shorter expected runtime are executed first. The expected runtime is based on
+    #:   the runtime statistics of previous test runs. A value of ``0`` disables
+    #:   runtime-aware scheduling, which is the default because the ordering delays
+    #:   the test runs of groups with long test cases.
+    priority_band_width: float = 0
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | If set to ``True``, test units with a scope prefer tasks that require a scope
+    #:   (timing tests) and only run other tasks if no timing test is queued.
+    tu_scope_preference: bool = True
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Number of test units with a scope, which are reserved for timing tests. Tasks
+    #:   that do not require a scope never occupy the reserved test units.
+    tu_scope_reserved: int = 0
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Policy used to compute group priorities. Available options are:
+    #: | ``fair_share``: Groups get an equal share of the test unit time. Priorities
+    #:   are based on the test unit time a group received compared to the other active
+    #:   groups.
+    #: | ``queue_time``: Priorities are based on the time a group spent waiting in
+    #:   the queue. The queue times are reset every
+    #:   :py:attr:`~testsystem.config.Config.prio_reset_h` hours.
+    scheduling_policy: str = "fair_share"
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Interval in seconds in which queue times, fair share services and results of
+    #:   running test runs are written to the database. Data of at most this interval
+    #:   is lost if the test system crashes.
+    accounting_flush_interval_s: int = 10
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Interval in seconds in which the publisher pushes pending reports. Reports of
+    #:   an interval are pushed with one commit per repository, and the system status
+    #:   report is regenerated at most once per interval.
+    publish_interval_s: int = 30
+
+    #: | :guilabel:`env` :guilabel:`file`
+    #: | If set to ``True``, test runs interrupted by a shutdown or crash are resumed
+    #:   on start-up. Only test cases without a stored result are executed again.
+    #:   Otherwise, unfinished test sets are deleted on start-up and tested again
+    #:   completely.
+    resume_test_runs: bool = True
+
+    #: | :guilabel:`env` :guilabel:`file`
+    #: | Backend of the task queue. Available options are:
+    #: | ``memory``: The queue is kept in memory of this test system instance.
+    #: | ``database``: The queue is stored in the database and shared by all test
+    #:   system instances using the same database. Only one instance (the leader)
+    #:   polls the group repositories. Use this option with a MySQL database to
+    #:   connect test units on several hosts.
+    queue_backend: str = "memory"
+
+    #: | :guilabel:`env` :guilabel:`file`
+    #: | Unique name of this test system instance in the shared task queue. If empty,
+    #:   the name is derived from the host name and the process id.
+    node_name: str = ""
+
+    #: | :guilabel:`env` :guilabel:`file`
+    #: | Lease duration in seconds for tasks and the leader role in the shared task
+    #:   queue. If an instance does not renew its leases within this time, its tasks
+    #:   are executed by other instances and another instance becomes leader.
+    queue_lease_s: int = 60
+
+    #: | :guilabel:`env` :guilabel:`file`
+    #: | Interval in seconds in which leases in the shared task queue are renewed. This
+    #:   must be considerably smaller than
+    #:   :py:attr:`~testsystem.config.Config.queue_lease_s`.
+    queue_heartbeat_s: int = 10
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | A running task is a straggler if it runs longer than this factor times its
+    #:   expected duration. The expected duration is the larger of the test case
+    #:   runtime and the mean plus three standard deviations of previous runs. A value
+    #:   of ``0`` disables task supervision.
+    straggler_factor: float = 2.0
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | If set to ``True``, a straggler is duplicated on an idle compatible test unit.
+    #:   The first result of the original and the duplicate is used.
+    speculative_execution: bool = True
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | A straggler is cancelled if it runs longer than this factor times the
+    #:   straggler limit. The external processes of the task are killed, and if the
+    #:   worker does not return, the worker thread is replaced. A value of ``0``
+    #:   disables cancellation.
+    hung_task_factor: float = 3.0
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Number of consecutive task failures after which the circuit breaker of a test
+    #:   unit opens. A test unit with an open breaker gets no tasks for a backoff
+    #:   period. A value of ``0`` disables the circuit breaker.
+    tu_failure_threshold: int = 3
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Backoff period in seconds after the circuit breaker of a test unit opened for
+    #:   the first time. The period doubles each time a probe task fails.
+    tu_backoff_s: int = 60
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Maximum backoff period in seconds for test units with an open circuit breaker.
+    tu_backoff_max_s: int = 3600
+
+    #: | :guilabel:`env` :guilabel:`file` :guilabel:`dyn`
+    #: | Maximum number of attempts for a test case task failing because of a test unit
+    #:   or infrastructure error. After the last attempt, the test case gets a failed
+    #:   result marked as infrastructure error. A value of ``0`` retries forever.
+    task_max_attempts: int = 3
+
     def get_group_commit_link(self, group_name: str, commit_hash: str) -> str:
         sub_path = f"{self.git_student_path}/{group_name}/-/tree/{commit_hash}"
         url = utils.url_builder(self.git_server, sub_path)
@@ -205,7 +404,7 @@ def get_config_from_env() -> dict:
                     raise TypeError(
                         f"Config argument '{prop}' does not accept list values."
                     )
-                ltyp = type(attr[0])
+                ltyp = type(attr[0]) if len(attr) > 0 else str
                 val = [ltyp(e) for e in v.split(";")]
             else:
                 val = typ(v)
@@ -229,12 +428,27 @@ def clear_cache():
     last_config_timestamp = 0.0
 
 
+def set_config_override(config: Config | None):
+    """
+    Use a fixed configuration instead of the environment and the config file. This is
+    used for simulations.
+
+    :param config: The configuration to use, or ``None`` to remove the override.
+    """
+    global config_override
+    config_override = config
+    clear_cache()
+
+
 def get_config() -> Config:
     """
     Function to request current configuration.
     """
     global last_config
     global last_config_timestamp
+    global config_override
+    if config_override is not None:
+        return config_override
     if (
         last_config is not None
         and time.time() - last_config_timestamp <= CONFIG_CACHE_TIME_S
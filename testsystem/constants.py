@@ -50,13 +50,31 @@ SCHEDULER_PAUSE_S = 10
 GIT_RETRIES = 10
 LEGACY_TASK_PRIO = 5
 FORCE_TEST_TAG_PRIO = 25
+FAIR_SHARE_WINDOW_S = 3600
+LEADER_LEASE_NAME = "scheduler"
+SHARED_QUEUE_CLAIM_RETRIES = 3
+SHARED_QUEUE_CANDIDATE_LIMIT = 100  # Eligible tasks ordered by priority per claim
+SUPERVISION_INTERVAL_S = 10
+STRAGGLER_GRACE_S = 60
+WORKER_RECYCLE_DELAY_S = 30
+PUBLISH_BATCH_SIZE = 200
+PUBLISH_RETRY_DELAY_S = 60
+PUBLISH_RETRY_MAX_DELAY_S = 3600
 MSP430_FLASHER_TIMEOUT_S = 20
 DB_CONN_TIMEOUT_S = 20
+DB_MIGRATION_BATCH_SIZE = 1000  # Rows copied per statement by data migrations
+DB_WRITER_POLL_INTERVAL_S = 0.5
 TU_UNAVAILABLE_RETRY_INTERVAL_S = 600
+BREAKER_CLOSED = "Closed"
+BREAKER_OPEN = "Open"
+BREAKER_HALF_OPEN = "Half-Open"
+UNIT_HEALTH_SMOOTHING = 0.2
+UNIT_HEALTH_DEGRADED_SCORE = 0.6
+DEGRADED_UNIT_POLL_INTERVAL_S = 5
 
 CONFIG_CACHE_TIME_S = 10
 GIT_PUBLIC_CACHE_TIME_S = 600
-TC_DEF_CACHE_TIME_S = 600
+TC_DEF_MTIME_CHECK_INTERVAL_S = 1
 
 EE_BAD_COMMIT_MESSAGE_ENABLED = True
 EE_BAD_COMMIT_MESSAGE_TEXT = "Definitely you."
@@ -94,6 +112,9 @@ TEST_HEADER_FILES = [
     "queueCheck.h",
 ]
 TEST_GROUP_SRC_FILES = ["*.c", "*.h", "*.s", "*.S"]
+TEST_GROUP_SRC_DIR = "middleware/src/kernel/smartos/msp430f5529/"
+TEST_DEPENDENCY_FILES = ["*.d"]
+TEST_LINKER_MAP_FILES = ["*.map"]
 TEST_ENVIRONMENT_DIRECTORY = "/testenv/"
 TEST_MSP430_UART_BAUDRATE = 9600
 TEST_TIMING_CLK_DEVIDER = 32
@@ -109,6 +130,9 @@ GIT_RESULT_BRANCH_NAME = "testresults"
 REPORT_DISABLE_BUILD_OUTPUT = True
 REPORT_DISABLE_FLASH_OUTPUT = True
 
+RESULT_TEXT_MAX_LENGTH = 100000  # Characters, longer outputs keep their head and tail
+RESULT_TEXT_COMPRESSION_LEVEL = 6  # zlib compression level
+
 DEBUG_COLLECT_FAILED_BUILD_ARTEFACTS = False
 DEBUG_FAILED_BUILD_ARTEFACTS_DIR = "/host/build_artefacts"
 
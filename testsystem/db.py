@@ -19,49 +19,181 @@
 # OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 
+from __future__ import annotations
+
+import time
+import threading
 import testsystem.config as cnf
+import testsystem.utils as utils
 import sqlalchemy as sa
 import sqlalchemy.orm as sao
 
+from sqlalchemy.pool import QueuePool
 from testsystem.config import get_config
 from testsystem.constants import DB_CONN_TIMEOUT_S
+from testsystem.migrations import run_migrations
 
 engine = None
+write_engine = None
 mapper_registry = sao.registry()
 Base = mapper_registry.generate_base()
 
+_SQLITE_SYNCHRONOUS_MODES = ["OFF", "NORMAL", "FULL", "EXTRA"]
+
+# Per thread time in seconds spent waiting on the database
+_wait_time = threading.local()
+
+
+def get_wait_time() -> float:
+    """
+    Get the total time the calling thread spent waiting on the database. This includes
+    the execution of statements and waiting for writes submitted to the database writer
+    (:py:mod:`testsystem.db_writer`).
+
+    :returns: The time in seconds since the thread started.
+    """
+    return getattr(_wait_time, "value", 0.0)
+
+
+def add_wait_time(seconds: float):
+    """
+    Add time the calling thread spent waiting on the database.
+
+    :param seconds: The time in seconds.
+    """
+    _wait_time.value = get_wait_time() + seconds
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    add_wait_time(time.perf_counter() - conn.info["query_start_time"].pop())
+
+
+def _instrument(db_engine: sa.engine.Engine):
+    if sa.event.contains(db_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    sa.event.listen(db_engine, "before_cursor_execute", _before_cursor_execute)
+    sa.event.listen(db_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _get_sqlite_pragmas(config: cnf.Config) -> list[str]:
+    synchronous = config.db_sqlite_synchronous.upper()
+    if synchronous not in _SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(f"Unknown SQLite synchronous mode '{synchronous}'.")
+    journal_mode = "WAL" if utils.to_bool(config.db_sqlite_wal) else "DELETE"
+    return [
+        f"PRAGMA journal_mode={journal_mode}",
+        f"PRAGMA busy_timeout={int(DB_CONN_TIMEOUT_S * 1000)}",
+        f"PRAGMA synchronous={synchronous}",
+        f"PRAGMA mmap_size={int(config.db_sqlite_mmap_size)}",
+    ]
+
+
+def _create_sqlite_engine(
+    config: cnf.Config, pool_size: int, max_overflow: int
+) -> sa.engine.Engine:
+    pragmas = _get_sqlite_pragmas(config)
+    sqlite_engine = sa.create_engine(
+        f"sqlite+pysqlite:///{config.db_file}",
+        echo=False,
+        future=True,
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        connect_args={"timeout": DB_CONN_TIMEOUT_S, "check_same_thread": False},
+    )
+
+    @sa.event.listens_for(sqlite_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return sqlite_engine
+
+
+def _create_mysql_engine(
+    config: cnf.Config, pool_size: int, max_overflow: int
+) -> sa.engine.Engine:
+    return sa.create_engine(
+        "mysql+pymysql://{}:{}@{}/{}?charset=utf8mb4".format(
+            config.db_user,
+            config.db_password,
+            config.db_server,
+            config.db_database,
+        ),
+        echo=False,
+        future=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=config.db_pool_recycle_s,
+        pool_pre_ping=utils.to_bool(config.db_pool_pre_ping),
+    )
+
+
+def create_engine(config: cnf.Config, writer: bool = False) -> sa.engine.Engine:
+    """
+    Create a database engine with the engine profile of a configuration. SQLite
+    connections use the write-ahead log, a busy timeout, the configured synchronous
+    mode and memory-mapped I/O. MySQL connections are pooled, recycled and checked
+    before use.
+
+    :param config: The configuration with the database settings.
+    :param writer: If ``True``, the engine has a single connection for the database
+        writer thread.
+
+    :returns: The new engine. Tables are not created.
+    """
+    pool_size = 1 if writer else config.db_pool_size
+    max_overflow = 0 if writer else config.db_max_overflow
+    if config.db_type == "sqlite":
+        db_engine = _create_sqlite_engine(config, pool_size, max_overflow)
+    elif config.db_type == "mysql":
+        db_engine = _create_mysql_engine(config, pool_size, max_overflow)
+    else:
+        raise NotImplementedError(
+            "Database type '{0}' is not supported.".format(config.db_type)
+        )
+    _instrument(db_engine)
+    return db_engine
+
+
+def _init_schema(db_engine: sa.engine.Engine):
+    Base.metadata.create_all(db_engine)
+    run_migrations(db_engine, Base.metadata)
+
 
 def init_database():
-    global engine
+    global engine, write_engine
     if engine is None:
         config = get_config()
-        if config.db_type == "sqlite":
-            # In memory db
-            # engine = sa.create_engine(
-            #    "sqlite+pysqlite:///:memory:", echo=False, future=True
-            # )
-            engine = sa.create_engine(
-                f"sqlite+pysqlite:///{config.db_file}",
-                echo=False,
-                future=True,
-                connect_args={"timeout": DB_CONN_TIMEOUT_S},
-            )
-        elif config.db_type == "mysql":
-            engine = sa.create_engine(
-                "mysql+pymysql://{}:{}@{}/{}?charset=utf8mb4".format(
-                    config.db_user,
-                    config.db_password,
-                    config.db_server,
-                    config.db_database,
-                ),
-                echo=False,
-                future=True,
-            )
-        else:
-            raise NotImplementedError(
-                "Database type '{0}' is not supported.".format(config.db_type)
-            )
-        Base.metadata.create_all(engine)
+        engine = create_engine(config)
+        _init_schema(engine)
+        write_engine = create_engine(config, writer=True)
+
+
+def set_engine(new_engine: sa.engine.Engine | None) -> sa.engine.Engine | None:
+    """
+    Replace the database engine, e.g. with an in-memory database for simulations. The
+    tables are created and migrated if necessary.
+
+    :param new_engine: The new engine. If ``None``, the engine is initialized from the
+        configuration on the next access.
+
+    :returns: The previous engine.
+    """
+    global engine, write_engine
+    prev_engine = engine
+    engine = new_engine
+    write_engine = new_engine
+    if engine is not None:
+        _instrument(engine)
+        _init_schema(engine)
+    return prev_engine
 
 
 def get_engine():
@@ -71,3 +203,14 @@ def get_engine():
     init_database()
     global engine
     return engine
+
+
+def get_write_engine():
+    """
+    Returns the engine of the database writer thread. Its connection pool is separate
+    from the pool of :py:func:`get_engine`, which is used for reads. Engines replaced
+    with :py:func:`set_engine` are used for both.
+    """
+    init_database()
+    global write_engine
+    return write_engine
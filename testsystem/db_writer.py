@@ -0,0 +1,153 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Single writer for database writes of task workers. Writes are submitted as functions
+and executed in submission order by one thread with its own connection
+(:py:func:`testsystem.db.get_write_engine`). Task workers don't wait for locks held by
+other writers, e.g. SQLite busy timeouts, and callers which don't need the result
+continue immediately. Callers which need the result wait for the returned future.
+Reads use the connection pool of :py:func:`testsystem.db.get_engine`.
+
+If the writer thread is not running, e.g. in tools and tests, writes are executed
+directly in the calling thread.
+"""
+
+from __future__ import annotations
+
+import time
+import queue
+import logging
+import threading
+import testsystem.db as db
+
+from typing import Any, Callable, TypeVar
+from concurrent.futures import Future
+from sqlalchemy.orm import Session
+from testsystem.constants import DB_WRITER_POLL_INTERVAL_S
+
+T = TypeVar("T")
+
+_write_queue: queue.Queue[tuple[Callable, tuple, Future]] = queue.Queue()
+_writer_stop_event = threading.Event()
+_writer_thread: threading.Thread | None = None
+# Serializes writes executed without the writer thread
+_direct_write_lock = threading.Lock()
+
+
+def _execute(func: Callable[..., T], args: tuple, future: Future):
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        with Session(db.get_write_engine(), expire_on_commit=False) as session:
+            future.set_result(func(session, *args))
+    except Exception as ex:
+        logging.error(f"[DB WRITER] Write {func.__name__} failed.", exc_info=ex)
+        future.set_exception(ex)
+
+
+def submit(func: Callable[..., T], *args: Any) -> Future[T]:
+    """
+    Submit a write to the database writer. Writes are executed in submission order.
+
+    :param func: Function executing the write. It is called with an open session as
+        first argument, followed by ``args``, and must commit the session.
+    :param args: Additional arguments of the function.
+
+    :returns: A future for the return value of the function.
+    """
+    future: Future[T] = Future()
+    if _writer_thread is None:
+        with _direct_write_lock:
+            _execute(func, args, future)
+    else:
+        _write_queue.put((func, args, future))
+    return future
+
+
+def wait(future: Future[T]) -> T:
+    """
+    Wait for a submitted write. The waiting time is added to the database wait time of
+    the calling thread (:py:func:`testsystem.db.get_wait_time`).
+
+    :param future: The future returned by :py:func:`submit`.
+
+    :returns: The return value of the write.
+    """
+    start = time.perf_counter()
+    try:
+        return future.result()
+    finally:
+        db.add_wait_time(time.perf_counter() - start)
+
+
+def execute(func: Callable[..., T], *args: Any) -> T:
+    """
+    Submit a write to the database writer and wait for its result.
+
+    :param func: Function executing the write, see :py:func:`submit`.
+    :param args: Additional arguments of the function.
+
+    :returns: The return value of the function.
+    """
+    return wait(submit(func, *args))
+
+
+def _run_writer(stop_event: threading.Event):
+    logging.info("[DB WRITER] Started successful.")
+    # Pending writes are executed before the writer stops
+    while not stop_event.is_set() or not _write_queue.empty():
+        try:
+            func, args, future = _write_queue.get(timeout=DB_WRITER_POLL_INTERVAL_S)
+        except queue.Empty:
+            continue
+        _execute(func, args, future)
+    logging.info("[DB WRITER] Stopped successful.")
+
+
+def start():
+    """
+    Starts the database writer thread.
+    """
+    global _writer_thread, _writer_stop_event
+    assert _writer_thread is None
+    logging.info("[DB WRITER] Starting...")
+    _writer_stop_event.clear()
+    _writer_thread = threading.Thread(target=_run_writer, args=(_writer_stop_event,))
+    _writer_thread.start()
+
+
+def stop():
+    """
+    Stops the database writer thread. This call blocks until all submitted writes are
+    executed.
+    """
+    global _writer_thread, _writer_stop_event
+    assert _writer_thread is not None
+    logging.info("[DB WRITER] Stopping...")
+    _writer_stop_event.set()
+    _writer_thread.join()
+    _writer_thread = None
+    # Writes submitted while the thread was stopping
+    while not _write_queue.empty():
+        func, args, future = _write_queue.get()
+        _execute(func, args, future)
@@ -21,6 +21,7 @@
 
 from __future__ import annotations
 
+import io
 import os
 import logging
 
@@ -29,12 +30,16 @@ import git
 import sys
 import glob
 import time
+import fnmatch
 import shutil
+import hashlib
 import random
+import tempfile
 import threading
 import numpy as np
 import testsystem.utils as utils
 
+from gitdb import IStream
 from testsystem.config import get_config
 from testsystem.exceptions import GitError, TestCaseError
 
@@ -47,6 +52,7 @@ from testsystem.constants import (
     GIT_LOCAL_ROOT_DIR,
     TEST_ENVIRONMENT_DIRECTORY,
     TEST_GROUP_SRC_FILES,
+    TEST_GROUP_SRC_DIR,
     GIT_PUBLIC_NAME_TEMPLATE,
     GIT_RETRIES,
     GIT_PUBLIC_CACHE_TIME_S,
@@ -56,6 +62,11 @@ from testsystem.constants import (
 )
 
 _git_lock = threading.Lock()
+# Reports are committed without working trees. The system repository is only used for
+# publishing, so publishing system reports only excludes itself. Group reports are
+# committed to the group repositories, which are shared with the scheduler, and hold
+# the git lock.
+_publish_lock = threading.Lock()
 _public_repo_timestamp = 0
 _public_repo_commit = ""
 
@@ -82,6 +93,8 @@ class TestEnv:
         repo = git.Repo(group_src_dir)  # type: ignore
         repo.git.checkout(commit)
         self.__commit = commit
+        self.__public_commit = git.Repo(public_src_dir).head.commit.hexsha  # type: ignore
+        self.__tc_version = get_test_case_files_version()
         self.__commit_time = repo.head.commit.committed_date * 1000
         msg = repo.head.commit.message
         if isinstance(msg, bytes):
@@ -117,7 +130,7 @@ class TestEnv:
             shutil.copytree(tc_setup_src_dir, tc_setup_dest_dir)
 
         # Copy group files
-        rel_path = "middleware/src/kernel/smartos/msp430f5529/"
+        rel_path = TEST_GROUP_SRC_DIR
         for src in TEST_GROUP_SRC_FILES:
             for file in glob.glob(os.path.join(group_src_dir, rel_path, src)):
                 dest_dir = os.path.join(self.__env_group_dir, rel_path)
@@ -187,6 +200,21 @@ class TestEnv:
         """
         return self.__commit_time
 
+    @property
+    def public_commit_hash(self) -> str:
+        """
+        Returns the hash of the public repository commit used in this environment.
+        """
+        return self.__public_commit
+
+    @property
+    def tc_version(self) -> str:
+        """
+        Returns the version of the test case files at the setup of this environment,
+        see :py:func:`get_test_case_files_version`.
+        """
+        return self.__tc_version
+
     def export(self, dest: str):
         """
         Copies the test environment to a given destination.
@@ -233,6 +261,44 @@ def get_test_case_definitions() -> str:
         return f.read()
 
 
+def get_test_case_definitions_mtime() -> float:
+    """
+    Get the modification time of the test case definition file.
+
+    :returns: The modification time in seconds or ``0`` if the file does not exist.
+    """
+    conf = get_config()
+    path = os.path.join(conf.tc_root_path, TEST_DEFINITION_FILE)
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+def get_test_case_files_version() -> str:
+    """
+    Get the version of the test case files (definitions, testbenches and expected
+    outputs). The version is a hash over the name, size and modification time of each
+    file, so it changes whenever a file is changed.
+
+    :returns: The version as hex string.
+    """
+    conf = get_config()
+    paths = [os.path.join(conf.tc_root_path, TEST_DEFINITION_FILE)]
+    for dir_name in [TEST_TESTBENCHE_DIR_NAME, TEST_OUTPUT_DIR_NAME]:
+        for root, _, file_names in os.walk(os.path.join(conf.tc_root_path, dir_name)):
+            paths.extend(os.path.join(root, file_name) for file_name in file_names)
+    sha = hashlib.sha1()
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        rel_path = os.path.relpath(path, conf.tc_root_path)
+        sha.update(f"{rel_path} {stat.st_size} {stat.st_mtime_ns}\n".encode())
+    return sha.hexdigest()
+
+
 def _create_msp_identifier_program(template, device_id) -> str:
     template = f"#define {MSP_ID_GENERATOR_DEFINE}\n" + template
     program = template.replace(MSP_ID_DEVICE_ID_TEMPLATE, hex(device_id))
@@ -315,14 +381,6 @@ def _get_test_env_public_dir(env_id: str) -> str:
     return os.path.join(_get_test_env_dir(env_id), get_public_repo_name())
 
 
-def _git_changed(repo: git.Repo) -> bool:  # type: ignore
-    git_status = repo.git.status("-u")
-    return (
-        "Untracked files:" in git_status
-        or "Changes not staged for commit:" in git_status
-    )
-
-
 def _load_repo(local_path: str, rel_remote_path) -> str:
     conf = get_config()
 
@@ -354,12 +412,12 @@ def _load_repo(local_path: str, rel_remote_path) -> str:
     return repo.heads[conf.git_primary_branch_name].commit.hexsha
 
 
-def _git_handler(func, *args):
+def _git_handler(func, *args, lock: threading.Lock | None = None):
     global _git_lock
     last_error = ""
     for i in range(0, GIT_RETRIES):
         try:
-            with _git_lock:
+            with _git_lock if lock is None else lock:
                 return func(*args)
         except git.GitCommandError as ex:
             ex_type, ex_value, ex_traceback = sys.exc_info()
@@ -533,6 +591,55 @@ def get_commit_timestamp(group_name: str, commit: str) -> int:
     return _git_handler(_get_commit_timestamp, group_name, commit)
 
 
+def is_group_src_file(file_name: str) -> bool:
+    """
+    Checks if a file is a group source file which is copied into test environments.
+
+    :param file_name: File path relative to the group source directory.
+
+    :returns: ``True`` if the file is a group source file, ``False`` otherwise.
+    """
+    if len(file_name) == 0 or "/" in file_name:
+        return False
+    for pattern in TEST_GROUP_SRC_FILES:
+        if fnmatch.fnmatchcase(file_name, pattern):
+            return True
+    return False
+
+
+def _get_changed_group_files(
+    group_name: str, base_commit: str, commit: str
+) -> list[str] | None:
+    git_dir = _get_local_group_git_directory(group_name)
+    repo = git.Repo(git_dir)  # type: ignore
+    if not repo.is_ancestor(base_commit, commit):
+        return None
+    diff = repo.git.diff("--name-only", base_commit, commit, "--", TEST_GROUP_SRC_DIR)
+    changed_files = []
+    for line in diff.splitlines():
+        file_name = line.strip()[len(TEST_GROUP_SRC_DIR) :]
+        if is_group_src_file(file_name):
+            changed_files.append(file_name)
+    return changed_files
+
+
+def get_changed_group_files(
+    group_name: str, base_commit: str, commit: str
+) -> list[str] | None:
+    """
+    Get the group source files which changed between two commits. Only files that are
+    copied into a test environment are considered.
+
+    :param group_name: Group name for repository.
+    :param base_commit: The older commit hash.
+    :param commit: The newer commit hash.
+
+    :returns: A list of file names relative to the group source directory or ``None``
+        if the base commit is not an ancestor of the newer commit.
+    """
+    return _git_handler(_get_changed_group_files, group_name, base_commit, commit)
+
+
 def _setup_test_env(group_name: str, git_state: str) -> TestEnv:
     return TestEnv(group_name, git_state)
 
@@ -596,26 +703,109 @@ def load_test_case(test_env: TestEnv, test_case_name: str) -> str:
     return tc_dest_dir
 
 
-def _publish_test_run_report(
-    group_name: str, commit: str, content: str, file_type: str = "md"
+def _get_remote_commit(repo: git.Repo, branch_name: str) -> str | None:  # type: ignore
+    try:
+        return repo.git.rev_parse("--verify", "--quiet", f"origin/{branch_name}")
+    except git.GitCommandError:
+        return None
+
+
+def _commit_files(
+    repo: git.Repo,  # type: ignore
+    branch_name: str,
+    base_branch_name: str,
+    files: dict[str, str],
+    message: str,
+) -> bool:
+    # Commits are built with plumbing commands in a temporary index, so neither the
+    # working tree nor the index of the local clone is touched.
+    parent = _get_remote_commit(repo, branch_name)
+    if parent is None:
+        parent = _get_remote_commit(repo, base_branch_name)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = {"GIT_INDEX_FILE": os.path.join(tmp_dir, "index")}
+        if parent is None:
+            repo.git.read_tree("--empty", env=env)
+        else:
+            repo.git.read_tree(parent, env=env)
+        for path, content in files.items():
+            data = content.encode("utf-8")
+            blob = repo.odb.store(IStream("blob", len(data), io.BytesIO(data)))
+            repo.git.update_index(
+                "--add", "--cacheinfo", f"100644,{blob.hexsha.decode()},{path}", env=env
+            )
+        tree = repo.git.write_tree(env=env)
+    if parent is not None and tree == repo.git.rev_parse(f"{parent}^{{tree}}"):
+        return False
+    parent_args = [] if parent is None else ["-p", parent]
+    commit = repo.git.commit_tree(tree, *parent_args, "-m", message)
+    repo.git.push("origin", f"{commit}:refs/heads/{branch_name}")
+    repo.git.update_ref(f"refs/remotes/origin/{branch_name}", commit)
+    return True
+
+
+def _fetch_repo(local_path: str, rel_remote_path: str) -> git.Repo:  # type: ignore
+    if not os.path.exists(local_path):
+        _load_repo(local_path, rel_remote_path)
+    repo = git.Repo(local_path)  # type: ignore
+    repo.git.fetch("origin")
+    return repo
+
+
+def _publish_system_reports(
+    test_run_reports: dict[str, str],
+    sys_report: str | None,
+    message: str,
+    file_type: str = "md",
 ):
-    logging.info(f"Publish test run report for {group_name}.")
+    logging.info(
+        f"Publish {len(test_run_reports)} test run reports"
+        f"{' and system status report' if sys_report is not None else ''}."
+    )
     conf = get_config()
-    local_sys_dir = _get_local_sys_git_directory()
-    _load_repo(local_sys_dir, conf.git_system_path)
-    repo = git.Repo(local_sys_dir)  # type: ignore
-    repo.git.checkout(conf.git_primary_branch_name)
-    report_file_dir = os.path.join(local_sys_dir, "reports", group_name)
-    if not os.path.exists(report_file_dir):
-        os.makedirs(report_file_dir)
-    report_file = os.path.join(report_file_dir, f"README.{file_type}")
-    with open(report_file, "w") as f:
-        f.write(content)
+    repo = _fetch_repo(_get_local_sys_git_directory(), conf.git_system_path)
+    files = {
+        f"reports/{group_name}/README.{file_type}": content
+        for group_name, content in test_run_reports.items()
+    }
+    if sys_report is not None:
+        files["README.md"] = sys_report
+    branch_name = conf.git_primary_branch_name
+    _commit_files(repo, branch_name, branch_name, files, message)
+
+
+def publish_system_reports(
+    test_run_reports: dict[str, str],
+    sys_report: str | None,
+    message: str,
+    file_type: str = "md",
+):
+    """
+    Publish several test run reports and the system status report with a single commit
+    and push to the system repository.
+
+    :param test_run_reports: Dictionary with group names as keys and the content of the
+        test run reports as values.
+    :param sys_report: The content of the system status report or ``None`` to keep the
+        current one.
+    :param message: The commit message.
+    :param file_type: The file type of the test run reports.
+    """
+    _git_handler(
+        _publish_system_reports,
+        test_run_reports,
+        sys_report,
+        message,
+        file_type,
+        lock=_publish_lock,
+    )
 
-    if _git_changed(repo):
-        repo.git.add("*")
-        repo.git.commit(m=f"Test Report {group_name} {commit[0:8]}")
-        repo.git.push()
+
+def _publish_test_run_report(
+    group_name: str, commit: str, content: str, file_type: str = "md"
+):
+    message = f"Test Report {group_name} {commit[0:8]}"
+    _publish_system_reports({group_name: content}, None, message, file_type)
 
 
 def publish_test_run_report(
@@ -628,42 +818,31 @@ def publish_test_run_report(
     :param content: The content of the report.
     :param file_type: The file type of the content.
     """
-    _git_handler(_publish_test_run_report, group_name, commit, content, file_type)
-
-
-def _guarantee_remote_branch(repo: git.Repo, branch_name: str):  # type: ignore
-    found = False
-    for ref in repo.references:
-        if branch_name == ref.name.replace("origin/", ""):
-            found = True
-            break
-    if not found:
-        repo.git.checkout(b=branch_name)
-        repo.git.push("--set-upstream", "origin", branch_name)
+    _git_handler(
+        _publish_test_run_report,
+        group_name,
+        commit,
+        content,
+        file_type,
+        lock=_publish_lock,
+    )
 
 
 def _publish_group_report(
     group_name: str, commit: str, content: str, file_type: str = "md"
 ):
     logging.info(f"Publish group report for {group_name}.")
+    conf = get_config()
     local_group_dir = _get_local_group_git_directory(group_name)
     rel_remote_path = _get_rel_remote_group_directory(group_name)
-    _load_repo(local_group_dir, rel_remote_path)
-    repo = git.Repo(local_group_dir)  # type: ignore
-    _guarantee_remote_branch(repo, GIT_RESULT_BRANCH_NAME)
-    repo.git.checkout(GIT_RESULT_BRANCH_NAME)
-    repo.git.pull("origin", GIT_RESULT_BRANCH_NAME)
-    report_file_dir = os.path.join(local_group_dir, "reports")
-    if not os.path.exists(report_file_dir):
-        os.makedirs(report_file_dir)
-    report_file = os.path.join(report_file_dir, f"README.{file_type}")
-    with open(report_file, "w") as f:
-        f.write(content)
-
-    if _git_changed(repo):
-        repo.git.add("*")
-        repo.git.commit(m=f"Test Report {commit[0:8]}")
-        repo.git.push()
+    repo = _fetch_repo(local_group_dir, rel_remote_path)
+    _commit_files(
+        repo,
+        GIT_RESULT_BRANCH_NAME,
+        conf.git_primary_branch_name,
+        {f"reports/README.{file_type}": content},
+        f"Test Report {commit[0:8]}",
+    )
 
 
 def publish_group_report(
@@ -680,20 +859,7 @@ def publish_group_report(
 
 
 def _publish_system_status_report(sys_report: str):
-    logging.info(f"Publish system status report.")
-    conf = get_config()
-    local_sys_dir = _get_local_sys_git_directory()
-    _load_repo(local_sys_dir, conf.git_system_path)
-    repo = git.Repo(local_sys_dir)  # type: ignore
-    repo.git.checkout(conf.git_primary_branch_name)
-    sys_report_file = os.path.join(local_sys_dir, f"README.md")
-    with open(sys_report_file, "w") as f:
-        f.write(sys_report)
-
-    if _git_changed(repo):
-        repo.git.add("*")
-        repo.git.commit(m=f"Update system report")
-        repo.git.push()
+    _publish_system_reports({}, sys_report, "Update system report")
 
 
 def publish_system_status_report(sys_report: str):
@@ -702,7 +868,7 @@ def publish_system_status_report(sys_report: str):
 
     :param sys_report: The content of the report.
     """
-    _git_handler(_publish_system_status_report, sys_report)
+    _git_handler(_publish_system_status_report, sys_report, lock=_publish_lock)
 
 
 def _get_tagged_group_commit(group_name: str, tags: list[str]) -> list[str]:
@@ -0,0 +1,326 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+from __future__ import annotations
+
+import os
+import re
+import time
+import fnmatch
+import logging
+import testsystem.config as cnf
+import testsystem.filesystem as fs
+
+from testsystem.models import (
+    Group,
+    TestCase,
+    TestCaseDef,
+    TestCaseDependency,
+    TestResult,
+)
+from testsystem.exceptions import GitError
+from testsystem.constants import (
+    TEST_GROUP_SRC_DIR,
+    TEST_DEPENDENCY_FILES,
+    TEST_LINKER_MAP_FILES,
+)
+
+_map_archive_member_regex = re.compile(
+    r"(?P<archive>[^\s()]+\.a)\((?P<member>[^)]+\.o)\)"
+)
+_map_object_regex = re.compile(r"(?P<object>[^\s()]+\.o)(?![^\s(])")
+
+
+def _normalize_path(path: str) -> str:
+    return path.replace("\\", "/").replace("//", "/")
+
+
+def get_group_src_file(path: str, group_name: str) -> str | None:
+    """
+    Converts a path from a build artefact into a file name relative to the group source
+    directory.
+
+    :param path: A path found in a dependency file or linker map.
+    :param group_name: The name of the group whose sources are considered.
+
+    :returns: The file name relative to the group source directory or ``None`` if the
+        path does not point into the group source directory.
+    """
+    marker = _normalize_path(f"{group_name}/{TEST_GROUP_SRC_DIR}")
+    path = _normalize_path(path)
+    idx = path.find(marker)
+    if idx == -1:
+        return None
+    file_name = path[idx + len(marker) :].strip("/")
+    if len(file_name) == 0 or "/" in file_name:
+        return None
+    return file_name
+
+
+def parse_make_dependencies(content: str) -> list[str]:
+    """
+    Parses a make dependency file as generated by the compiler option ``-MD``.
+
+    :param content: The content of the dependency file.
+
+    :returns: A list of all prerequisites.
+    """
+    prerequisites = []
+    for line in content.replace("\\\n", " ").splitlines():
+        if ":" not in line:
+            continue
+        _, deps = line.split(":", 1)
+        prerequisites.extend(deps.split())
+    return prerequisites
+
+
+def parse_linker_map(content: str) -> list[str]:
+    """
+    Parses a linker map file and returns all linked object files. Archive members are
+    returned with the archive path as prefix (``<archive>/<member>``).
+
+    :param content: The content of the linker map file.
+
+    :returns: A list of linked object files.
+    """
+    objects = []
+    for line in content.splitlines():
+        for match in _map_archive_member_regex.finditer(line):
+            archive_dir = os.path.dirname(match.group("archive"))
+            objects.append(f"{archive_dir}/{match.group('member')}")
+        line = _map_archive_member_regex.sub("", line)
+        for match in _map_object_regex.finditer(line):
+            objects.append(match.group("object"))
+    return objects
+
+
+def _find_files(directory: str, patterns: list[str]) -> list[str]:
+    files = []
+    for root, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            for pattern in patterns:
+                if fnmatch.fnmatchcase(file_name, pattern):
+                    files.append(os.path.join(root, file_name))
+                    break
+    return files
+
+
+def collect_dependencies(directory: str, group_name: str) -> list[str]:
+    """
+    Collects the group source files used by a build from make dependency files and
+    linker maps. Object files from the linker map are added as pattern
+    (``<name>.*``) because the source file extension is unknown.
+
+    :param directory: The directory where to look for build artefacts.
+    :param group_name: The name of the group whose sources are considered.
+
+    :returns: A sorted list of file names or patterns relative to the group source
+        directory.
+    """
+    dependencies: set[str] = set()
+    for file in _find_files(directory, TEST_DEPENDENCY_FILES):
+        with open(file, "r", errors="ignore") as f:
+            for path in parse_make_dependencies(f.read()):
+                src_file = get_group_src_file(path, group_name)
+                if src_file is not None and fs.is_group_src_file(src_file):
+                    dependencies.add(src_file)
+    for file in _find_files(directory, TEST_LINKER_MAP_FILES):
+        with open(file, "r", errors="ignore") as f:
+            for path in parse_linker_map(f.read()):
+                src_file = get_group_src_file(path, group_name)
+                if src_file is not None:
+                    dependencies.add(f"{os.path.splitext(src_file)[0]}.*")
+    return sorted(dependencies)
+
+
+def record_dependencies(tc: TestCase, test_env: fs.TestEnv):
+    """
+    Collects and stores the group source dependencies of a built test case. This
+    function never raises an exception because dependency tracking must not affect
+    the test result.
+
+    :param tc: A test case which was built successfully.
+    :param test_env: The test environment of the test case.
+    """
+    if not cnf.get_config().enable_test_impact_analysis:
+        return
+    try:
+        tc_env_dir = os.path.join(test_env.path, tc.name)
+        dependencies = collect_dependencies(tc_env_dir, tc.group_name)
+        if len(dependencies) == 0:
+            logging.debug(
+                f"Found no group source dependencies for test case {tc.name} of group"
+                f" {tc.group_name}."
+            )
+            return
+        TestCaseDependency.set(tc.group.id, tc.id, dependencies)
+    except Exception as ex:
+        logging.warning(
+            f"Failed to record dependencies of test case {tc.name} for group"
+            f" {tc.group_name}. {ex}"
+        )
+
+
+def get_exercise_files(exercise_nr: int, config: cnf.Config) -> list[str]:
+    """
+    Get the files owned by an exercise and all previous exercises. See
+    :py:attr:`~testsystem.config.Config.impact_exercise_files`.
+
+    :param exercise_nr: The exercise number.
+    :param config: The configuration to use.
+
+    :returns: A list of file names or patterns.
+    """
+    files = []
+    for entry in config.impact_exercise_files:
+        tokens = entry.split(":", 1)
+        if len(tokens) != 2 or not tokens[0].strip().isdigit():
+            logging.warning(f"Invalid exercise file configuration '{entry}'.")
+            continue
+        if int(tokens[0]) <= exercise_nr:
+            files.append(tokens[1].strip())
+    return files
+
+
+def is_affected(dependencies: list[str], changed_files: list[str]) -> bool:
+    """
+    Checks if a test case is affected by changed files.
+
+    :param dependencies: File names or patterns the test case depends on.
+    :param changed_files: Changed file names.
+
+    :returns: ``True`` if at least one dependency changed.
+    """
+    for changed_file in changed_files:
+        for dependency in dependencies:
+            if fnmatch.fnmatchcase(changed_file, dependency):
+                return True
+    return False
+
+
+def _is_full_run_due(run_cnt: int, config: cnf.Config) -> bool:
+    if config.impact_audit:
+        return True
+    interval = config.impact_full_run_interval
+    return interval > 0 and run_cnt >= interval - 1
+
+
+def _full_run(
+    group: Group, run_cnt: int, tc_defs: list[TestCaseDef]
+) -> tuple[list[TestCaseDef], list[TestResult]]:
+    if run_cnt != 0:
+        group.set_impact_run_cnt(0)
+    return tc_defs, []
+
+
+def _inherit_result(result: TestResult) -> TestResult:
+    return TestResult(
+        test_case_id=result.test_case_id,
+        result=result.result,
+        successful=result.successful,
+        output=result.output,
+        build_output=result.build_output,
+        build_error=result.build_error,
+        flash_output=result.flash_output,
+        flash_error=result.flash_error,
+        timestamp=int(time.time() * 1000),
+    )
+
+
+def select_test_cases(
+    group: Group,
+    test_env: fs.TestEnv,
+    tc_defs: list[TestCaseDef],
+    full_run: bool = False,
+) -> tuple[list[TestCaseDef], list[TestResult]]:
+    """
+    Selects the test cases affected by a new commit. Results for unaffected test cases
+    are inherited from the latest finished test set of the group. Test cases without
+    known dependencies are always selected. If the public repository or the test case
+    files changed since this test set, all test cases are selected.
+
+    :param group: The group of the commit.
+    :param test_env: The test environment of the commit that should be tested.
+    :param tc_defs: All active test case definitions.
+    :param full_run: Force a full test run, e.g. for a tagged commit.
+
+    :returns: The first parameter is a list of test cases that must be run. The second
+        parameter is a list of inherited results for all other test cases.
+    """
+    commit = test_env.commit_hash
+    config = cnf.get_config()
+    if not config.enable_test_impact_analysis:
+        return tc_defs, []
+    # Only test runs with selected test cases count towards the periodic full test run
+    run_cnt = group.get_impact_run_cnt()
+    if full_run or _is_full_run_due(run_cnt, config):
+        logging.info(f"Full test run for group {group.group_name} ({commit[0:8]}).")
+        return _full_run(group, run_cnt, tc_defs)
+
+    parent_test_set = group.get_latest_finished_test_set()
+    if parent_test_set is None or parent_test_set.commit_hash == commit:
+        return _full_run(group, run_cnt, tc_defs)
+    if (
+        parent_test_set.public_commit_hash != test_env.public_commit_hash
+        or parent_test_set.tc_version != test_env.tc_version
+    ):
+        logging.info(
+            f"Full test run for group {group.group_name} ({commit[0:8]}), the public"
+            " repository or the test cases changed since"
+            f" {parent_test_set.commit_hash[0:8]}."
+        )
+        return _full_run(group, run_cnt, tc_defs)
+
+    try:
+        changed_files = fs.get_changed_group_files(
+            group.group_name, parent_test_set.commit_hash, commit
+        )
+    except GitError as ex:
+        logging.warning(f"Test impact analysis failed. {ex.msg}")
+        return _full_run(group, run_cnt, tc_defs)
+    if changed_files is None:
+        return _full_run(group, run_cnt, tc_defs)
+
+    parent_results = {r.test_case_id: r for r in parent_test_set.test_results}
+    dependencies = TestCaseDependency.get_by_group(group.id)
+    selected_tc_defs = []
+    inherited_parent_results = []
+    for tc_def in tc_defs:
+        deps = dependencies.get(tc_def.id)
+        if deps is None:
+            deps = get_exercise_files(tc_def.exercise_nr, config)
+        parent_result = parent_results.get(tc_def.id)
+        if len(deps) == 0 or parent_result is None or is_affected(deps, changed_files):
+            selected_tc_defs.append(tc_def)
+        else:
+            inherited_parent_results.append(parent_result)
+    TestResult.load_texts(inherited_parent_results)
+    inherited_results = [_inherit_result(r) for r in inherited_parent_results]
+    group.set_impact_run_cnt(run_cnt + 1)
+
+    logging.info(
+        f"Test impact analysis for group {group.group_name} ({commit[0:8]}):"
+        f" {len(changed_files)} changed files, run {len(selected_tc_defs)} of"
+        f" {len(tc_defs)} test cases and inherit {len(inherited_results)} results from"
+        f" {parent_test_set.commit_hash[0:8]}."
+    )
+    return selected_tc_defs, inherited_results
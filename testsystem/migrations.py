@@ -0,0 +1,285 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Versioned schema migrations. New tables are created from the models on start-up, but
+existing tables are never changed by that. Changes to existing tables, like new indexes
+or moved columns, are migrations. The applied migrations are recorded in the
+``SchemaVersions`` table, and pending migrations are applied in order by
+:py:func:`run_migrations` when the database is initialized.
+
+Migrations must be idempotent. A fresh database already has the current schema, and
+several test system instances sharing a database may start at the same time. To add a
+migration, append it to :py:data:`MIGRATIONS` with the next version number. Never
+change or reorder migrations that are already released.
+"""
+
+from __future__ import annotations
+
+import time
+import logging
+import sqlalchemy as sa
+
+from typing import Callable
+from testsystem.constants import DB_MIGRATION_BATCH_SIZE
+
+_schema_versions = sa.Table(
+    "SchemaVersions",
+    sa.MetaData(),
+    sa.Column("version", sa.Integer, primary_key=True),
+    sa.Column("name", sa.String(100), nullable=False),
+    sa.Column("applied_at", sa.BigInteger, nullable=False),
+)
+
+# Table name -> names of indexes declared on the model
+_INDEXES = {
+    "TestSets": ["ix_TestSets_group_id_finished_commit_time", "ix_TestSets_finished"],
+    "TestResults": ["ix_TestResults_test_set_id"],
+    "Groups": ["ix_Groups_term_active"],
+    "MSPs": ["ix_MSPs_serial_number"],
+}
+
+_RESULT_TEXT_COLUMNS = [
+    "output",
+    "build_output",
+    "build_error",
+    "flash_output",
+    "flash_error",
+]
+
+
+class Migration:
+    """
+    A versioned change of the database schema.
+
+    :param version: The version number. Migrations are applied in ascending order.
+    :param name: A short description of the migration.
+    :param apply: Function applying the migration on a connection within a
+        transaction. It receives the connection and the metadata of the models.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        name: str,
+        apply: Callable[[sa.engine.Connection, sa.MetaData], None],
+    ):
+        self.version = version
+        self.name = name
+        self.apply = apply
+
+    def __str__(self) -> str:
+        return f"{self.version} ({self.name})"
+
+
+def _create_indexes(conn: sa.engine.Connection, metadata: sa.MetaData):
+    for table_name, index_names in _INDEXES.items():
+        table = metadata.tables[table_name]
+        for index in table.indexes:
+            if index.name in index_names:
+                index.create(conn, checkfirst=True)
+
+
+def _move_test_result_outputs(conn: sa.engine.Connection, metadata: sa.MetaData):
+    columns = {c["name"] for c in sa.inspect(conn).get_columns("TestResults")}
+    moved = [c for c in _RESULT_TEXT_COLUMNS if c in columns]
+    if len(moved) == 0:
+        return
+    blobs = metadata.tables["TestResultBlobs"]
+    select_stmt = sa.text(
+        f"SELECT id, {', '.join(moved)} FROM TestResults WHERE id > :last_id"
+        " AND id NOT IN (SELECT test_result_id FROM TestResultBlobs)"
+        " ORDER BY id LIMIT :limit"
+    )
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select_stmt, {"last_id": last_id, "limit": DB_MIGRATION_BATCH_SIZE}
+        ).all()
+        if len(rows) == 0:
+            break
+        values = []
+        for row in rows:
+            value = {"test_result_id": row.id, "output": ""}
+            value.update({c: getattr(row, c) for c in moved})
+            value["output"] = value["output"] or ""
+            values.append(value)
+        conn.execute(blobs.insert(), values)
+        last_id = rows[-1].id
+    if conn.dialect.name == "sqlite":
+        _rebuild_sqlite_table(conn, metadata, "TestResults")
+        return
+    for column in moved:
+        conn.execute(sa.text(f"ALTER TABLE TestResults DROP COLUMN {column}"))
+
+
+def _rebuild_sqlite_table(
+    conn: sa.engine.Connection, metadata: sa.MetaData, table_name: str
+):
+    # SQLite before 3.35 can't drop columns, so the table is copied to a new table with
+    # the schema of the model (https://www.sqlite.org/lang_altertable.html). References
+    # of other tables refer to the name and apply to the new table after the rename.
+    table = metadata.tables[table_name]
+    columns = {c["name"] for c in sa.inspect(conn).get_columns(table_name)}
+    scratch = sa.MetaData()
+    for other in metadata.sorted_tables:
+        other.to_metadata(scratch)
+    new_table = table.to_metadata(scratch, name=f"{table_name}_new")
+    # The indexes of the model are created after the rename
+    new_table.indexes.clear()
+    # A new table left by an interrupted run is incomplete
+    new_table.drop(conn, checkfirst=True)
+    new_table.create(conn)
+    names = ", ".join(c.name for c in table.columns if c.name in columns)
+    conn.execute(
+        sa.text(
+            f"INSERT INTO {new_table.name} ({names}) SELECT {names} FROM {table_name}"
+        )
+    )
+    conn.execute(sa.text(f"DROP TABLE {table_name}"))
+    conn.execute(sa.text(f"ALTER TABLE {new_table.name} RENAME TO {table_name}"))
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _recreate_group_scores(conn: sa.engine.Connection, metadata: sa.MetaData):
+    # Scores are derived from the test results and recomputed by the next report
+    table = metadata.tables["GroupScores"]
+    table.drop(conn, checkfirst=True)
+    table.create(conn)
+
+
+def _add_columns(conn: sa.engine.Connection, table: sa.Table, column_names: list[str]):
+    # The DDL is compiled for the dialect, which quotes reserved names like Groups
+    columns = {c["name"] for c in sa.inspect(conn).get_columns(table.name)}
+    table_name = conn.dialect.identifier_preparer.format_table(table)
+    for column_name in column_names:
+        if column_name in columns:
+            continue
+        column = sa.schema.CreateColumn(table.c[column_name]).compile(
+            dialect=conn.dialect
+        )
+        conn.execute(sa.text(f"ALTER TABLE {table_name} ADD COLUMN {column}"))
+
+
+def _add_group_impact_run_cnt(conn: sa.engine.Connection, metadata: sa.MetaData):
+    _add_columns(conn, metadata.tables["Groups"], ["impact_run_cnt"])
+
+
+def _add_test_set_versions(conn: sa.engine.Connection, metadata: sa.MetaData):
+    _add_columns(
+        conn, metadata.tables["TestSets"], ["public_commit_hash", "tc_version"]
+    )
+
+
+#: All migrations in the order they are applied.
+MIGRATIONS = [
+    Migration(1, "Add indexes for frequent queries", _create_indexes),
+    Migration(
+        2, "Move test result outputs to TestResultBlobs", _move_test_result_outputs
+    ),
+    Migration(
+        3, "Version group scores by test case definition hash", _recreate_group_scores
+    ),
+    Migration(4, "Add impact run counter to groups", _add_group_impact_run_cnt),
+    Migration(
+        5,
+        "Add public commit and test case version to test sets",
+        _add_test_set_versions,
+    ),
+]
+
+
+def get_applied_versions(engine: sa.engine.Engine) -> list[int]:
+    """
+    Get the versions of all migrations applied to a database.
+
+    :param engine: The database engine.
+
+    :returns: The applied versions in ascending order.
+    """
+    _schema_versions.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        stmt = sa.select(_schema_versions.c.version).order_by(
+            _schema_versions.c.version
+        )
+        return list(conn.execute(stmt).scalars())
+
+
+def _is_applied(conn: sa.engine.Connection, version: int) -> bool:
+    stmt = sa.select(_schema_versions.c.version).where(
+        _schema_versions.c.version == version
+    )
+    return conn.execute(stmt).first() is not None
+
+
+def _apply(
+    engine: sa.engine.Engine, migration: Migration, metadata: sa.MetaData
+) -> bool:
+    with engine.begin() as conn:
+        # Another instance may have applied the migration in the meantime
+        if _is_applied(conn, migration.version):
+            return False
+        logging.info(f"Apply database migration {migration}.")
+        migration.apply(conn, metadata)
+        conn.execute(
+            _schema_versions.insert().values(
+                version=migration.version,
+                name=migration.name,
+                applied_at=int(time.time() * 1000),
+            )
+        )
+    return True
+
+
+def run_migrations(
+    engine: sa.engine.Engine,
+    metadata: sa.MetaData,
+    migrations: list[Migration] | None = None,
+) -> int:
+    """
+    Apply all pending migrations in order. Each migration is applied and recorded in
+    one transaction. A migration recorded concurrently by another test system instance
+    counts as applied. The tables of the models must exist already.
+
+    :param engine: The database engine.
+    :param metadata: The metadata of the models.
+    :param migrations: The migrations to apply. Defaults to :py:data:`MIGRATIONS`.
+
+    :returns: The number of migrations applied by this call.
+    """
+    if migrations is None:
+        migrations = MIGRATIONS
+    applied = set(get_applied_versions(engine))
+    cnt = 0
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+        try:
+            if _apply(engine, migration, metadata):
+                cnt += 1
+        except sa.exc.IntegrityError:
+            with engine.connect() as conn:
+                if not _is_applied(conn, migration.version):
+                    raise
+            logging.info(f"Database migration {migration} applied by another instance.")
+    return cnt
@@ -24,15 +24,24 @@ from .msp430 import MSP430
 from .pico_scope import PicoScope
 from .test_case_def import TestCaseDef
 from .uart_capture import UARTCapture
+from .group_share import GroupShare
+from .lease import Lease
+from .unit_health import UnitHealth
+from .test_result_blob import TestResultBlob
 
 # Model dependencies
 from .channel_reader import ChannelReader  # -> uart_capture
-from .test_result import TestResult  # -> test_case_def
-from .test_set import TestSet  # -> test_result
-from .group import Group  # -> test_set
+from .test_result import TestResult  # -> test_case_def | test_result_blob
+from .test_case_runtime import TestCaseRuntime  # -> test_case_def
+from .group_score import GroupScore  # -> test_result | test_case_def
+from .test_set import TestSet  # -> test_result | group_score
+from .queued_task import QueuedTask  # -> test_result | test_set
+from .publish_job import PublishJob  # -> test_set
+from .group import Group  # -> test_set | group_share
+from .test_case_dependency import TestCaseDependency  # -> group
 from .pico_reader import PicoReader  # -> pico_scope | channel_reader
 from .connection_info import ConnectionInfo  # -> msp430 | pico_scope
-from .test_unit import TestUnit  # -> msp430 | pico_scope | connection_info
+from .test_unit import TestUnit  # -> connection_info | unit_health
 from .pico_measure import PicoMeasure  # -> pico_scope | test_unit
 from .task_worker import TaskWorker  # -> test_unit
 from .task import Task  # -> test_unit
@@ -21,7 +21,9 @@
 
 from __future__ import annotations
 
+import threading
 import testsystem.db as db
+import testsystem.db_writer as db_writer
 
 from sqlalchemy import (
     select,
@@ -31,13 +33,52 @@ from sqlalchemy import (
     Boolean,
     String,
     Float,
+    Index,
     desc,
 )
 from sqlalchemy.sql import func
 from sqlalchemy.orm import Session, relationship, joinedload
 
 from testsystem.config import get_config
+from testsystem.constants import FAIR_SHARE_WINDOW_S
 from .test_set import TestSet
+from .group_share import GroupShare
+
+
+# Group id -> queue time not yet written to the database
+_pending_queue_times: dict[int, float] = {}
+_pending_queue_times_lock = threading.Lock()
+# Serializes database writes of queue times
+_queue_time_write_lock = threading.Lock()
+
+# (engine, term, configured group numbers) the group activation was last reconciled for
+_activation_snapshot: tuple | None = None
+# (term, active) -> groups, cleared by invalidate_cache
+_groups_cache: dict[tuple[str, bool], list[Group]] = {}
+_groups_cache_lock = threading.Lock()
+
+
+def _add_queue_times(session: Session, queue_times: dict[int, float]):
+    for group_id, queue_time in queue_times.items():
+        group = session.get(Group, group_id)
+        if group is None:
+            continue
+        group.queue_time += queue_time
+        group.abs_queue_time += queue_time
+    session.commit()
+
+
+def _set_impact_run_cnt(session: Session, group_id: int, run_cnt: int):
+    group = session.get(Group, group_id)
+    if group is None:
+        return
+    group.impact_run_cnt = run_cnt
+    session.commit()
+
+
+def _get_pending_queue_time(group_id: int) -> float:
+    with _pending_queue_times_lock:
+        return _pending_queue_times.get(group_id, 0.0)
 
 
 class Group(db.Base):
@@ -46,6 +87,7 @@ class Group(db.Base):
     """
 
     __tablename__ = "Groups"
+    __table_args__ = (Index("ix_Groups_term_active", "term", "active"),)
 
     id: int = Column(Integer, primary_key=True)  # type: ignore
     group_nr: int = Column(Integer, nullable=False)  # type: ignore
@@ -55,6 +97,9 @@ class Group(db.Base):
     creation_time = Column(TIMESTAMP, server_default=func.now())
     abs_queue_time: float = Column(Float, nullable=False, default=0)  # type: ignore
     queue_time: float = Column(Float, nullable=False, default=0)  # type: ignore
+    impact_run_cnt: int = Column(
+        Integer, nullable=False, default=0, server_default="0"
+    )  # type: ignore
 
     test_set_results = relationship(
         "TestSet",
@@ -72,15 +117,11 @@ class Group(db.Base):
 
         :returns: The group if it exists, ``None`` otherwise.
         """
-        _init_and_update_groups(term)
-        with Session(db.get_engine(), expire_on_commit=False) as session:
-            group = (
-                session.query(cls)
-                .filter(cls.group_nr == group_nr)
-                .filter(cls.term == term)
-                .first()
-            )
-            return group
+        for active in [True, False]:
+            for group in cls.get_by_term(term, active):
+                if group.group_nr == group_nr:
+                    return group
+        return None
 
     @classmethod
     def get_by_id(cls, id: int) -> Group | None:
@@ -97,17 +138,37 @@ class Group(db.Base):
     @classmethod
     def get_by_term(cls, term: str, active=True) -> list[Group]:
         """
-        Get all groups from a specific term.
+        Get all groups from a specific term. The groups are cached until the configured
+        groups change or :py:meth:`invalidate_cache` is called.
 
         :param term: The term. E.g: SS22
 
         :returns: Returns a list of groups.
         """
-        _init_and_update_groups(term)
-        with Session(db.get_engine(), expire_on_commit=False) as session:
-            return list(
-                session.query(cls).where(cls.term == term).where(cls.active == active)
-            )
+        _update_groups(term)
+        with _groups_cache_lock:
+            groups = _groups_cache.get((term, active), None)
+            if groups is None:
+                with Session(db.get_engine(), expire_on_commit=False) as session:
+                    groups = list(
+                        session.query(cls)
+                        .where(cls.term == term)
+                        .where(cls.active == active)
+                    )
+                _groups_cache[(term, active)] = groups
+            return list(groups)
+
+    @staticmethod
+    def invalidate_cache():
+        """
+        Clear the cached groups and reconcile the group activation with the
+        configuration on the next access. Call this method after modifying groups in
+        the database outside of this class.
+        """
+        global _activation_snapshot
+        with _groups_cache_lock:
+            _activation_snapshot = None
+            _groups_cache.clear()
 
     @classmethod
     def get_name(cls, group_nr, term) -> str:
@@ -175,95 +236,173 @@ class Group(db.Base):
     @staticmethod
     def get_max_queue_time() -> float:
         """
-        Get the max queue time of all groups.
+        Get the max queue time of all groups, including queue time not yet written to
+        the database.
 
         :returns: The max queue time in seconds.
         """
         with Session(db.get_engine()) as session:
-            return session.query(func.max(Group.queue_time)).one()[0]  # type: ignore
+            queue_times = session.query(Group.id, Group.queue_time).all()
+        with _pending_queue_times_lock:
+            return max(
+                [qt + _pending_queue_times.get(id, 0.0) for id, qt in queue_times],
+                default=0.0,
+            )
 
     def get_queue_time(self) -> float:
         """
-        Get the queue time of the group.
+        Get the queue time of the group, including queue time not yet written to the
+        database.
 
         :returns: The queue time in seconds.
         """
         with Session(db.get_engine()) as session:
             group = session.get(Group, self.id)
-            self.queue_time = group.queue_time
-            return group.queue_time
+            self.queue_time = group.queue_time + _get_pending_queue_time(self.id)
+            return self.queue_time
 
     def add_queue_time(self, waiting_time: float):
         """
-        Add time to this groups queue time.
+        Add time to this groups queue time. The time is aggregated in memory and written
+        to the database by :py:meth:`flush_queue_times`.
 
         :param waiting_time: The time to add in seconds.
         """
-        with Session(db.get_engine()) as session:
-            group = session.get(Group, self.id)
-            group.queue_time += waiting_time
-            group.abs_queue_time += waiting_time
-            self.queue_time = group.queue_time
-            self.abs_queue_time = group.abs_queue_time
-            session.commit()
+        with _pending_queue_times_lock:
+            pending = _pending_queue_times.get(self.id, 0.0) + waiting_time
+            _pending_queue_times[self.id] = pending
+
+    @staticmethod
+    def flush_queue_times():
+        """
+        Write all pending queue times to the database.
+        """
+        global _pending_queue_times
+        with _queue_time_write_lock:
+            with _pending_queue_times_lock:
+                queue_times = _pending_queue_times
+                _pending_queue_times = {}
+            if len(queue_times) == 0:
+                return
+            try:
+                db_writer.execute(_add_queue_times, queue_times)
+            except Exception:
+                # Keep the queue times for the next flush
+                with _pending_queue_times_lock:
+                    for group_id, queue_time in queue_times.items():
+                        pending = _pending_queue_times.get(group_id, 0.0) + queue_time
+                        _pending_queue_times[group_id] = pending
+                raise
+
+    def add_service_time(self, service_time: float):
+        """
+        Add test unit time used by this group for fair share scheduling.
+
+        :param service_time: The time to add in seconds.
+        """
+        GroupShare.add_service(self.id, service_time)
 
     def get_priority(self) -> float:
         """
         Get the priority of this group.
         Change this method if you want to modify the group priority calculation.
         The priority is between 10 and 20 to leave some levels for higher priority
-        tasks that may come in the future.
+        tasks that may come in the future. The calculation depends on
+        :py:attr:`~testsystem.config.Config.scheduling_policy`.
 
         :returns: The priority of this group.
         """
+        if get_config().scheduling_policy == "queue_time":
+            priority = self.__get_queue_time_priority()
+        else:
+            lag = GroupShare.get_lag(self.id)
+            priority = 10 + lag / FAIR_SHARE_WINDOW_S * 10
+        if priority < 10:
+            priority = 10
+        if priority > 20:
+            priority = 20
+        return priority
+
+    def __get_queue_time_priority(self) -> float:
         max_queue_time = Group.get_max_queue_time()
         priority = 10
         if max_queue_time > 0:
             prio_factor = self.get_queue_time() / max_queue_time
             priority = 10 + prio_factor * 10  # Use priority between 10 and 20
-        if priority < 10:
-            priority = 10
-        if priority > 20:
-            priority = 20
         return priority
 
     def reset_queue_time(self):
         """
         Reset this groups queue time to zero.
         """
+        with _queue_time_write_lock:
+            with _pending_queue_times_lock:
+                pending = _pending_queue_times.pop(self.id, 0.0)
+            with Session(db.get_engine()) as session:
+                group = session.get(Group, self.id)
+                group.queue_time = 0
+                group.abs_queue_time += pending
+                self.queue_time = 0
+                session.commit()
+
+    def get_impact_run_cnt(self) -> int:
+        """
+        Get the number of test runs of this group with test cases selected by test
+        impact analysis since the last full test run.
+
+        :returns: The number of test runs.
+        """
         with Session(db.get_engine()) as session:
             group = session.get(Group, self.id)
-            group.queue_time = 0
-            self.queue_time = 0
-            session.commit()
+            self.impact_run_cnt = group.impact_run_cnt
+            return self.impact_run_cnt
 
+    def set_impact_run_cnt(self, run_cnt: int):
+        """
+        Set the number of test runs of this group with test cases selected by test
+        impact analysis since the last full test run.
 
-def _init_and_update_groups(term: str):
-    with Session(db.get_engine()) as session:
-        # Deactivate all
-        sel_stmt = select(Group).where(Group.active == True)
-        for group in session.scalars(sel_stmt):
+        :param run_cnt: The number of test runs.
+        """
+        db_writer.execute(_set_impact_run_cnt, self.id, run_cnt)
+        self.impact_run_cnt = run_cnt
+
+
+def _reconcile_groups(session: Session, term: str, group_nrs: set[int]):
+    # Deactivate groups which are no longer configured
+    sel_stmt = select(Group).where(Group.active == True)
+    for group in session.scalars(sel_stmt):
+        if group.term != term or group.group_nr not in group_nrs:
             group.active = False
-        session.flush()
-
-        # Activate configured groups
-        conf = get_config()
-        for nr in conf.group_ids:
-            group = (
-                session.query(Group)
-                .where(Group.group_nr == nr)
-                .where(Group.term == term)
-                .first()
+
+    # Activate configured groups, create them if they do not exist
+    sel_stmt = select(Group).where(Group.term == term)
+    existing = {group.group_nr: group for group in session.scalars(sel_stmt)}
+    for nr in sorted(group_nrs):
+        group = existing.get(nr, None)
+        if group is None:
+            group_name = Group.get_name(nr, term)
+            session.add(
+                Group(group_nr=nr, group_name=group_name, term=term, active=True)
             )
-            # If group does not exist, create it
-            if group is None:
-                group_name = Group.get_name(nr, term)
-                group = Group(
-                    group_nr=nr, group_name=group_name, term=term, active=True
-                )
-                session.add(group)
-            # If group does exist, activate it
-            else:
-                group.active = True
-            session.flush()
-        session.commit()
+        elif not group.active:
+            group.active = True
+    session.commit()
+
+
+def _update_groups(term: str):
+    global _activation_snapshot
+    engine = db.get_engine()
+    group_nrs = frozenset(get_config().group_ids)
+    with _groups_cache_lock:
+        snapshot = _activation_snapshot
+        if (
+            snapshot is not None
+            and snapshot[0] is engine
+            and snapshot[1:] == (term, group_nrs)
+        ):
+            return
+        with Session(engine) as session:
+            _reconcile_groups(session, term, set(group_nrs))
+        _activation_snapshot = (engine, term, group_nrs)
+        _groups_cache.clear()
@@ -0,0 +1,194 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+from __future__ import annotations
+
+import testsystem.db as db
+import testsystem.models.test_case_def as tcdef
+
+from sqlalchemy import Column, Integer, ForeignKey, BigInteger, String, JSON
+from sqlalchemy.orm import Session
+
+from .test_result import TestResult
+
+
+def compute_scores(
+    results: list[tuple[int, bool, float | None]]
+) -> tuple[int, dict[int, int], dict[int, float | None]]:
+    """
+    Score the results of a test set.
+
+    :param results: List of ``(test_case_id, successful, result)`` tuples.
+
+    :returns: The total score, the scores per exercise number and the results of
+        ranking test cases by test case id.
+    """
+    total = 0
+    exercise_results: dict[int, int] = {}
+    ranking_results: dict[int, float | None] = {}
+    for test_case_id, successful, result in results:
+        tc_def = tcdef.get_by_id(test_case_id)
+        if tc_def is None:
+            continue
+        if tc_def.ranking:
+            ranking_results[test_case_id] = result
+        if not tcdef.is_score_tc(tc_def):
+            continue
+        score = 1 if successful and result is not None and result >= 1 else 0
+        exercise_results[tc_def.exercise_nr] = (
+            exercise_results.get(tc_def.exercise_nr, 0) + score
+        )
+        total += score
+    return total, exercise_results, ranking_results
+
+
+def _is_newer(score: GroupScore, commit_time: int | None, test_set_id: int) -> bool:
+    if score.test_set_id == test_set_id:
+        return True
+    return (commit_time or 0, test_set_id) > (score.commit_time or 0, score.test_set_id)
+
+
+def update_score(
+    session: Session,
+    group_id: int,
+    test_set_id: int,
+    commit_time: int | None,
+    force: bool = False,
+):
+    """
+    Update the score of a group in an open session, if the finished test set is newer
+    than the one the score is based on. The caller commits the session.
+
+    :param session: The open session.
+    :param group_id: The id of the group.
+    :param test_set_id: The id of the finished test set.
+    :param commit_time: The commit time of the finished test set.
+    :param force: Recompute the score even if the test set is older.
+    """
+    score = session.get(GroupScore, group_id)
+    if (
+        score is not None
+        and not force
+        and not _is_newer(score, commit_time, test_set_id)
+    ):
+        return
+    rows = (
+        session.query(TestResult.test_case_id, TestResult.successful, TestResult.result)
+        .filter(TestResult.test_set_id == test_set_id)
+        .all()
+    )
+    total, exercise_results, ranking_results = compute_scores(
+        [tuple(row) for row in rows]  # type: ignore
+    )
+    if score is None:
+        score = GroupScore(group_id=group_id)
+        session.add(score)
+    score.test_set_id = test_set_id
+    score.commit_time = commit_time
+    score.total = total
+    # JSON object keys are strings
+    score.exercise_results = {str(k): v for k, v in exercise_results.items()}
+    score.ranking_results = {str(k): v for k, v in ranking_results.items()}
+    score.tc_def_version = tcdef.get_version()
+
+
+class GroupScore(db.Base):
+    """
+    Materialized score of the latest finished test set of a group. The score is updated
+    in the same transaction, in which a test set is marked finished, so reports can read
+    scores without scanning test results. This is also a database object.
+    """
+
+    __tablename__ = "GroupScores"
+
+    group_id: int = Column(
+        Integer, ForeignKey("Groups.id", ondelete="CASCADE"), primary_key=True
+    )  # type: ignore
+    test_set_id: int = Column(
+        Integer, ForeignKey("TestSets.id", ondelete="CASCADE"), nullable=False
+    )  # type: ignore
+    commit_time: int | None = Column(BigInteger, nullable=True)  # type: ignore
+    total: int = Column(Integer, nullable=False, default=0)  # type: ignore
+    exercise_results: dict = Column(JSON, nullable=False)  # type: ignore
+    ranking_results: dict = Column(JSON, nullable=False)  # type: ignore
+    #: Hash of the scoring relevant fields of the test case definitions used.
+    tc_def_version: str = Column(String(40), nullable=False)  # type: ignore
+
+    @property
+    def is_stale(self) -> bool:
+        """
+        Flag if the test case definitions changed since the score was computed.
+        """
+        return self.tc_def_version != tcdef.get_version()
+
+    def get_exercise_result(self, exercise_nr: int) -> int:
+        """
+        Get the score of an exercise.
+
+        :param exercise_nr: The exercise number.
+
+        :returns: The score of the exercise.
+        """
+        return int(self.exercise_results.get(str(exercise_nr), 0))
+
+    def get_ranking_result(self, test_case_id: int) -> float | None:
+        """
+        Get the result of a ranking test case.
+
+        :param test_case_id: The id of the ranking test case.
+
+        :returns: The result or ``None`` if there is no result.
+        """
+        return self.ranking_results.get(str(test_case_id))
+
+    @classmethod
+    def get_by_groups(cls, group_ids: list[int]) -> dict[int, GroupScore]:
+        """
+        Get the scores of several groups.
+
+        :param group_ids: The ids of the groups.
+
+        :returns: Dictionary with group ids as keys. Groups without a finished test set
+            have no entry.
+        """
+        if len(group_ids) == 0:
+            return {}
+        with Session(db.get_engine(), expire_on_commit=False) as session:
+            scores = (
+                session.query(GroupScore)
+                .filter(GroupScore.group_id.in_(group_ids))
+                .all()
+            )
+            return {score.group_id: score for score in scores}
+
+    @classmethod
+    def rebuild(cls, test_sets: list[tuple[int, int, int | None]]):
+        """
+        Recompute the scores of groups, e.g. after the test case definitions changed.
+
+        :param test_sets: List of ``(group_id, test_set_id, commit_time)`` tuples of the
+            latest finished test set of each group.
+        """
+        with Session(db.get_engine()) as session:
+            for group_id, test_set_id, commit_time in test_sets:
+                update_score(session, group_id, test_set_id, commit_time, force=True)
+            session.commit()
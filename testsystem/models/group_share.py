@@ -0,0 +1,204 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+from __future__ import annotations
+
+import time
+import threading
+import testsystem.db as db
+
+from sqlalchemy import Column, Integer, ForeignKey, BigInteger, Float
+from sqlalchemy.orm import Session
+
+# Group id -> service received in hardware seconds
+_services: dict[int, float] | None = None
+# Group id -> service added since the last checkpoint
+_service_deltas: dict[int, float] = {}
+# Group id -> number of test runs in progress
+_backlog: dict[int, int] = {}
+_virtual_time = 0.0
+_lock = threading.Lock()
+
+
+def _load_services(session: Session) -> dict[int, float]:
+    return {s.group_id: s.service for s in session.query(GroupShare).all()}
+
+
+def _save_services(
+    session: Session, services: dict[int, float], deltas: dict[int, float]
+):
+    # Services are added, so several test system instances can share the accounting
+    timestamp = int(time.time() * 1000)
+    for group_id, delta in deltas.items():
+        share = session.get(GroupShare, group_id)
+        if share is None:
+            share = GroupShare(group_id=group_id, service=services[group_id])
+            session.add(share)
+        else:
+            share.service = share.service + delta
+        share.timestamp = timestamp
+    session.commit()
+
+
+def _get_services() -> dict[int, float]:
+    global _services, _virtual_time
+    if _services is None:
+        with Session(db.get_engine()) as session:
+            _services = _load_services(session)
+        if len(_services) > 0:
+            _virtual_time = min(_services.values())
+    return _services
+
+
+def _update_virtual_time():
+    global _virtual_time, _backlog
+    services = _get_services()
+    backlogged = [services.get(g, _virtual_time) for g, c in _backlog.items() if c > 0]
+    if len(backlogged) > 0:
+        _virtual_time = max(_virtual_time, min(backlogged))
+
+
+class GroupShare(db.Base):
+    """
+    Fair share accounting for groups. Each group accumulates the test unit time it
+    received (service). The system virtual time is the smallest service of all groups
+    with test runs in progress. A group that becomes active again starts at the virtual
+    time, so idle groups can't build up credit. Services are kept in memory and
+    checkpointed to the database periodically. This is also a database object.
+    """
+
+    __tablename__ = "GroupShares"
+
+    group_id: int = Column(Integer, ForeignKey("Groups.id"), primary_key=True)  # type: ignore
+    service: float = Column(Float, nullable=False, default=0)  # type: ignore
+    timestamp: int = Column(BigInteger, nullable=False)  # type: ignore
+
+    @classmethod
+    def get_service(cls, group_id: int) -> float:
+        """
+        Get the service a group received.
+
+        :param group_id: The group id.
+
+        :returns: The service in seconds.
+        """
+        with _lock:
+            return _get_services().get(group_id, _virtual_time)
+
+    @classmethod
+    def get_virtual_time(cls) -> float:
+        """
+        Get the system virtual time.
+
+        :returns: The virtual time in seconds of service.
+        """
+        with _lock:
+            _update_virtual_time()
+            return _virtual_time
+
+    @classmethod
+    def get_lag(cls, group_id: int) -> float:
+        """
+        Get the service a group received in excess of the system virtual time.
+
+        :param group_id: The group id.
+
+        :returns: The lag in seconds. The value is never negative.
+        """
+        with _lock:
+            _update_virtual_time()
+            service = _get_services().get(group_id, _virtual_time)
+            return max(0.0, service - _virtual_time)
+
+    @classmethod
+    def add_service(cls, group_id: int, service_time: float):
+        """
+        Add service to a group.
+
+        :param group_id: The group id.
+        :param service_time: The test unit time in seconds.
+        """
+        with _lock:
+            services = _get_services()
+            services[group_id] = services.get(group_id, _virtual_time) + service_time
+            delta = _service_deltas.get(group_id, 0.0) + service_time
+            _service_deltas[group_id] = delta
+            _update_virtual_time()
+
+    @classmethod
+    def activate(cls, group_id: int):
+        """
+        Mark a test run of a group as in progress. If the group was idle, its service
+        is raised to the system virtual time.
+
+        :param group_id: The group id.
+        """
+        with _lock:
+            services = _get_services()
+            _update_virtual_time()
+            if _backlog.get(group_id, 0) == 0:
+                service = services.get(group_id, 0.0)
+                services[group_id] = max(service, _virtual_time)
+                delta = services[group_id] - service
+                _service_deltas[group_id] = _service_deltas.get(group_id, 0.0) + delta
+            _backlog[group_id] = _backlog.get(group_id, 0) + 1
+
+    @classmethod
+    def deactivate(cls, group_id: int):
+        """
+        Mark a test run of a group as completed.
+
+        :param group_id: The group id.
+        """
+        with _lock:
+            _backlog[group_id] = max(0, _backlog.get(group_id, 0) - 1)
+            _update_virtual_time()
+
+    @classmethod
+    def checkpoint(cls):
+        """
+        Add the services received since the last checkpoint to the database and reload
+        the services of all groups. With a shared task queue, this includes the services
+        accounted by other test system instances, so the services are reloaded even
+        without local changes.
+        """
+        with _lock:
+            if _services is None:
+                return
+            with Session(db.get_engine()) as session:
+                if len(_service_deltas) > 0:
+                    _save_services(session, _services, _service_deltas)
+                    _service_deltas.clear()
+                _services.update(_load_services(session))
+            _update_virtual_time()
+
+    @classmethod
+    def clear_cache(cls):
+        """
+        Drop all in-memory state. Unsaved changes are lost.
+        """
+        global _services, _virtual_time
+        with _lock:
+            _services = None
+            _service_deltas.clear()
+            _backlog.clear()
+            _virtual_time = 0.0
@@ -0,0 +1,111 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+from __future__ import annotations
+
+import time
+import testsystem.db as db
+
+from sqlalchemy import Column, String, BigInteger
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+
+def _acquire(session: Session, name: str, owner: str, duration_s: float) -> bool:
+    timestamp = int(time.time() * 1000)
+    expiry = timestamp + int(duration_s * 1000)
+    cnt = (
+        session.query(Lease)
+        .filter(Lease.name == name, (Lease.owner == owner) | (Lease.expiry < timestamp))
+        .update({Lease.owner: owner, Lease.expiry: expiry}, synchronize_session=False)
+    )
+    session.commit()
+    if cnt == 1:
+        return True
+    if session.get(Lease, name) is not None:
+        return False
+    try:
+        session.add(Lease(name=name, owner=owner, expiry=expiry))
+        session.commit()
+    except IntegrityError:
+        # Another instance created the lease in the meantime
+        session.rollback()
+        return False
+    return True
+
+
+class Lease(db.Base):
+    """
+    Named lease, which is held by at most one test system instance at a time. A lease
+    must be renewed before it expires, otherwise another instance can acquire it. This
+    is used for leader election. This is also a database object.
+    """
+
+    __tablename__ = "Leases"
+
+    name: str = Column(String(32), primary_key=True)  # type: ignore
+    owner: str = Column(String(64), nullable=False)  # type: ignore
+    expiry: int = Column(BigInteger, nullable=False)  # type: ignore
+
+    @classmethod
+    def acquire(cls, name: str, owner: str, duration_s: float) -> bool:
+        """
+        Acquire or renew a lease.
+
+        :param name: The lease name.
+        :param owner: The name of the test system instance.
+        :param duration_s: The lease duration in seconds, starting now.
+
+        :returns: Returns ``True`` if the instance holds the lease.
+        """
+        with Session(db.get_engine()) as session:
+            return _acquire(session, name, owner, duration_s)
+
+    @classmethod
+    def release(cls, name: str, owner: str):
+        """
+        Release a lease, so other instances can acquire it immediately.
+
+        :param name: The lease name.
+        :param owner: The name of the test system instance.
+        """
+        with Session(db.get_engine()) as session:
+            session.query(Lease).filter(
+                Lease.name == name, Lease.owner == owner
+            ).update({Lease.expiry: 0}, synchronize_session=False)
+            session.commit()
+
+    @classmethod
+    def get_owner(cls, name: str) -> str | None:
+        """
+        Get the current holder of a lease.
+
+        :param name: The lease name.
+
+        :returns: The name of the test system instance or ``None`` if the lease is not
+            held by any instance.
+        """
+        with Session(db.get_engine()) as session:
+            lease = session.get(Lease, name)
+            if lease is None or lease.expiry < int(time.time() * 1000):
+                return None
+            return lease.owner
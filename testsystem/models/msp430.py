@@ -26,6 +26,7 @@ import logging
 import serial
 
 import testsystem.db as db
+import testsystem.db_writer as db_writer
 import testsystem.utils as utils
 
 from serial.tools.list_ports import comports
@@ -114,6 +115,12 @@ def is_connected(session: Session, serial_number: str) -> bool:
     return connected
 
 
+def _set_defective(session: Session, serial_number: str):
+    msp, _ = get_or_create(session, serial_number)
+    msp.defective = True
+    session.commit()
+
+
 def increment_flash_counter(session: Session, serial_number: str) -> int:
     msp, _ = get_or_create(session, serial_number)
     msp.flash_counter += 1
@@ -137,7 +144,7 @@ class MSP430(db.Base):
     manufacturer: str = Column(String(50), nullable=True)  # type: ignore
     pid: int = Column(Integer, nullable=True)  # type: ignore
     product: str = Column(String(50), nullable=True)  # type: ignore
-    serial_number: str = Column(String(50), nullable=False)  # type: ignore
+    serial_number: str = Column(String(50), nullable=False, index=True)  # type: ignore
     vid: int = Column(Integer, nullable=True)  # type: ignore
 
     uart_port: str | None = Column(String(30), nullable=True)  # type: ignore
@@ -207,18 +214,16 @@ class MSP430(db.Base):
         Mark this device as defective. Defective devices are checked if they can be
         recovered.
         """
-        with Session(db.get_engine()) as session:
-            msp, _ = get_or_create(session, self.serial_number)
-            msp.defective = True
-            self.defective = True
-            session.commit()
+        db_writer.execute(_set_defective, self.serial_number)
+        self.defective = True
 
     def increment_flash_counter(self):
         """
-        Increment the flash counter of this MSP.
+        Increment the flash counter of this MSP. The counter is written by the
+        database writer in the background.
         """
-        with Session(db.get_engine()) as session:
-            self.flash_counter = increment_flash_counter(session, self.serial_number)  # type: ignore
+        self.flash_counter = (self.flash_counter or 0) + 1
+        db_writer.submit(increment_flash_counter, self.serial_number)
 
     def get_identifier(self) -> str:
         """
@@ -0,0 +1,135 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+from __future__ import annotations
+
+import time
+import testsystem.db as db
+import testsystem.db_writer as db_writer
+
+from sqlalchemy import Column, Integer, ForeignKey, BigInteger, Text
+from sqlalchemy.orm import Session
+
+from .test_set import mark_finished
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _enqueue(session: Session, test_set_id: int) -> int:
+    mark_finished(session, test_set_id)
+    job = PublishJob(test_set_id=test_set_id, attempts=0, next_try=_now_ms())
+    session.add(job)
+    session.commit()
+    return job.id
+
+
+class PublishJob(db.Base):
+    """
+    Pending publication of the reports of a finished test set. Jobs are stored in the
+    database, so reports are still published if the test system restarts before the
+    publisher processed them. This is also a database object.
+    """
+
+    __tablename__ = "PublishJobs"
+
+    id: int = Column(Integer, primary_key=True)  # type: ignore
+    test_set_id: int = Column(
+        Integer, ForeignKey("TestSets.id", ondelete="CASCADE"), nullable=False
+    )  # type: ignore
+    attempts: int = Column(Integer, nullable=False, default=0)  # type: ignore
+    next_try: int = Column(BigInteger, nullable=False)  # type: ignore
+    last_error: str | None = Column(Text, nullable=True)  # type: ignore
+
+    @classmethod
+    def enqueue(cls, test_set_id: int) -> int:
+        """
+        Mark a test set finished and add a job to publish its reports. Both happen in
+        one transaction, so a finished test set always has its reports published.
+
+        :param test_set_id: The id of the finished test set.
+
+        :returns: The id of the new job.
+        """
+        return db_writer.execute(_enqueue, test_set_id)
+
+    @classmethod
+    def get_due(cls, limit: int = 20) -> list[PublishJob]:
+        """
+        Get jobs, which are ready for a (new) publishing attempt.
+
+        :param limit: Maximum number of jobs.
+
+        :returns: List of due jobs, oldest first.
+        """
+        with Session(db.get_engine(), expire_on_commit=False) as session:
+            return (
+                session.query(PublishJob)
+                .filter(PublishJob.next_try <= _now_ms())
+                .order_by(PublishJob.id)
+                .limit(limit)
+                .all()
+            )
+
+    @classmethod
+    def retry(cls, job_id: int, delay_s: float, error: str):
+        """
+        Postpone a job after a failed publishing attempt.
+
+        :param job_id: The id of the job.
+        :param delay_s: Delay in seconds until the next attempt.
+        :param error: Error message of the failed attempt.
+        """
+        with Session(db.get_engine()) as session:
+            session.query(PublishJob).filter(PublishJob.id == job_id).update(
+                {
+                    PublishJob.attempts: PublishJob.attempts + 1,
+                    PublishJob.next_try: _now_ms() + int(delay_s * 1000),
+                    PublishJob.last_error: error,
+                },
+                synchronize_session=False,
+            )
+            session.commit()
+
+    @classmethod
+    def remove(cls, job_id: int):
+        """
+        Remove a job after the reports were published.
+
+        :param job_id: The id of the job.
+        """
+        with Session(db.get_engine()) as session:
+            session.query(PublishJob).filter(PublishJob.id == job_id).delete(
+                synchronize_session=False
+            )
+            session.commit()
+
+    @classmethod
+    def count(cls) -> int:
+        """
+        Count pending jobs.
+
+        :returns: Number of jobs.
+        """
+        with Session(db.get_engine()) as session:
+            return session.query(PublishJob).count()
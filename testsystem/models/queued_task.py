@@ -0,0 +1,315 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+from __future__ import annotations
+
+import time
+import testsystem.db as db
+
+from sqlalchemy import Column, Integer, String, ForeignKey, BigInteger, Float, or_
+from sqlalchemy.orm import Session
+
+from testsystem.constants import SHARED_QUEUE_CANDIDATE_LIMIT
+from .test_result import TestResult
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _is_free(timestamp: int):
+    return or_(QueuedTask.lease_owner == None, QueuedTask.lease_expiry < timestamp)
+
+
+def _claim(session: Session, queue_id: int, owner: str, lease_s: float) -> bool:
+    timestamp = _now_ms()
+    cnt = (
+        session.query(QueuedTask)
+        .filter(QueuedTask.id == queue_id, _is_free(timestamp))
+        .update(
+            {
+                QueuedTask.lease_owner: owner,
+                QueuedTask.lease_expiry: timestamp + int(lease_s * 1000),
+                QueuedTask.attempts: QueuedTask.attempts + 1,
+            },
+            synchronize_session=False,
+        )
+    )
+    session.commit()
+    return cnt == 1
+
+
+def _complete(
+    session: Session,
+    queue_id: int,
+    owner: str,
+    test_set_id: int,
+    test_result: TestResult,
+) -> bool:
+    cnt = (
+        session.query(QueuedTask)
+        .filter(QueuedTask.id == queue_id, QueuedTask.lease_owner == owner)
+        .delete(synchronize_session=False)
+    )
+    if cnt != 1:
+        session.rollback()
+        return False
+    test_result.test_set_id = test_set_id
+    session.add(test_result)
+    session.commit()
+    return True
+
+
+class QueuedTask(db.Base):
+    """
+    Test case task in the shared task queue. Test system instances lease queued tasks
+    before executing them. A lease is renewed periodically while the task is running.
+    If an instance stops renewing its leases, e.g. because it crashed, the tasks are
+    available to other instances again after the lease expired. This is also a
+    database object.
+    """
+
+    __tablename__ = "QueuedTasks"
+
+    id: int = Column(Integer, primary_key=True)  # type: ignore
+    test_set_id: int = Column(Integer, ForeignKey("TestSets.id", ondelete="CASCADE"), nullable=False)  # type: ignore
+    test_case_id: int = Column(Integer, nullable=False)  # type: ignore
+    priority: float = Column(Float, nullable=False)  # type: ignore
+    expected_runtime: float = Column(Float, nullable=False, default=0)  # type: ignore
+    test_unit_tag: str | None = Column(String(32), nullable=True)  # type: ignore
+    schedule_time: float = Column(Float, nullable=False)  # type: ignore
+    lease_owner: str | None = Column(String(64), nullable=True)  # type: ignore
+    lease_expiry: int = Column(BigInteger, nullable=False, default=0)  # type: ignore
+    attempts: int = Column(Integer, nullable=False, default=0)  # type: ignore
+
+    #: Queued tasks can run on any test unit with the required tag.
+    use_specific_test_unit = False
+    specific_test_unit = None
+    excluded_test_units: list = []
+
+    @property
+    def use_tagged_test_unit(self) -> bool:
+        """
+        Flag if this task must use a test unit with a specific tag.
+        """
+        return self.test_unit_tag is not None
+
+    def __repr__(self) -> str:
+        return (
+            f"Queued Task (Id={self.id} TestSet={self.test_set_id}"
+            f" TestCase={self.test_case_id} Priority={self.priority})"
+        )
+
+    @classmethod
+    def enqueue(cls, queued_tasks: list[QueuedTask]) -> int:
+        """
+        Add tasks to the shared queue in a single transaction.
+
+        :param queued_tasks: The tasks to add.
+
+        :returns: The number of tasks, which are available in the queue.
+        """
+        with Session(db.get_engine()) as session:
+            session.add_all(queued_tasks)
+            session.commit()
+        return cls.count_available()
+
+    @classmethod
+    def get_available(
+        cls,
+        tags: list[str] | None = None,
+        prefer_tagged: bool = False,
+        limit: int = SHARED_QUEUE_CANDIDATE_LIMIT,
+    ) -> list[QueuedTask]:
+        """
+        Get tasks which are not leased by any test system instance. The tasks are
+        filtered and ordered in the database, so tasks a worker can run are not pushed
+        out of the result by tasks for other test units.
+
+        :param tags: If set, only tasks without a tag or with one of these tags are
+            returned.
+        :param prefer_tagged: If set, tasks with a tag are returned first.
+        :param limit: The maximum number of tasks to return.
+
+        :returns: The tasks ordered by priority and insertion order.
+        """
+        with Session(db.get_engine(), expire_on_commit=False) as session:
+            query = session.query(QueuedTask).filter(_is_free(_now_ms()))
+            if tags is not None:
+                query = query.filter(
+                    or_(
+                        QueuedTask.test_unit_tag == None,
+                        QueuedTask.test_unit_tag.in_(tags),
+                    )
+                )
+            order = [QueuedTask.priority, QueuedTask.id]
+            if prefer_tagged:
+                order.insert(0, QueuedTask.test_unit_tag == None)
+            return query.order_by(*order).limit(limit).all()
+
+    @classmethod
+    def claim(cls, queue_id: int, owner: str, lease_s: float) -> bool:
+        """
+        Lease a task. This fails if another instance holds a valid lease for the task
+        or if the task was removed from the queue.
+
+        :param queue_id: The id of the queued task.
+        :param owner: The name of the leasing test system instance.
+        :param lease_s: The lease duration in seconds.
+
+        :returns: Returns ``True`` if the task was leased successfully.
+        """
+        with Session(db.get_engine()) as session:
+            return _claim(session, queue_id, owner, lease_s)
+
+    @classmethod
+    def renew(cls, queue_ids: list[int], owner: str, lease_s: float) -> int:
+        """
+        Extend the leases of tasks held by a test system instance.
+
+        :param queue_ids: The ids of the leased tasks.
+        :param owner: The name of the leasing test system instance.
+        :param lease_s: The new lease duration in seconds, starting now.
+
+        :returns: The number of renewed leases.
+        """
+        if len(queue_ids) == 0:
+            return 0
+        with Session(db.get_engine()) as session:
+            cnt = (
+                session.query(QueuedTask)
+                .filter(QueuedTask.id.in_(queue_ids), QueuedTask.lease_owner == owner)
+                .update(
+                    {QueuedTask.lease_expiry: _now_ms() + int(lease_s * 1000)},
+                    synchronize_session=False,
+                )
+            )
+            session.commit()
+            return cnt
+
+    @classmethod
+    def release(cls, queue_id: int, owner: str, priority: float | None = None):
+        """
+        Return a leased task to the queue, e.g. after the execution failed.
+
+        :param queue_id: The id of the queued task.
+        :param owner: The name of the leasing test system instance.
+        :param priority: If specified, the new priority of the task.
+        """
+        values: dict = {QueuedTask.lease_owner: None, QueuedTask.lease_expiry: 0}
+        if priority is not None:
+            values[QueuedTask.priority] = priority
+        with Session(db.get_engine()) as session:
+            session.query(QueuedTask).filter(
+                QueuedTask.id == queue_id, QueuedTask.lease_owner == owner
+            ).update(values, synchronize_session=False)
+            session.commit()
+
+    @classmethod
+    def complete(
+        cls, queue_id: int, owner: str, test_set_id: int, test_result: TestResult
+    ) -> bool:
+        """
+        Remove a leased task from the queue and store its result in the same
+        transaction. The result is only stored if the instance still holds the lease.
+
+        :param queue_id: The id of the queued task.
+        :param owner: The name of the leasing test system instance.
+        :param test_set_id: The test set of the result.
+        :param test_result: The test result of the task.
+
+        :returns: Returns ``True`` if the result was stored.
+        """
+        with Session(db.get_engine()) as session:
+            return _complete(session, queue_id, owner, test_set_id, test_result)
+
+    @classmethod
+    def remove(cls, queue_id: int, owner: str):
+        """
+        Remove a leased task from the queue without storing a result.
+
+        :param queue_id: The id of the queued task.
+        :param owner: The name of the leasing test system instance.
+        """
+        with Session(db.get_engine()) as session:
+            session.query(QueuedTask).filter(
+                QueuedTask.id == queue_id, QueuedTask.lease_owner == owner
+            ).delete(synchronize_session=False)
+            session.commit()
+
+    @classmethod
+    def remove_test_set(cls, test_set_id: int) -> int:
+        """
+        Remove all tasks of a test set from the queue, including leased tasks. Results
+        of leased tasks are dropped on completion.
+
+        :param test_set_id: The test set id.
+
+        :returns: The number of removed tasks.
+        """
+        with Session(db.get_engine()) as session:
+            cnt = (
+                session.query(QueuedTask)
+                .filter(QueuedTask.test_set_id == test_set_id)
+                .delete(synchronize_session=False)
+            )
+            session.commit()
+            return cnt
+
+    @classmethod
+    def set_priority(cls, priority: float):
+        """
+        Set the priority of all tasks in the queue.
+
+        :param priority: The new priority.
+        """
+        with Session(db.get_engine()) as session:
+            session.query(QueuedTask).update(
+                {QueuedTask.priority: priority}, synchronize_session=False
+            )
+            session.commit()
+
+    @classmethod
+    def count(cls, test_set_id: int) -> int:
+        """
+        Count the tasks of a test set, which are queued or running.
+
+        :param test_set_id: The test set id.
+
+        :returns: The number of tasks.
+        """
+        with Session(db.get_engine()) as session:
+            return (
+                session.query(QueuedTask)
+                .filter(QueuedTask.test_set_id == test_set_id)
+                .count()
+            )
+
+    @classmethod
+    def count_available(cls) -> int:
+        """
+        Count the tasks, which are not leased by any test system instance.
+
+        :returns: The number of tasks.
+        """
+        with Session(db.get_engine()) as session:
+            return session.query(QueuedTask).filter(_is_free(_now_ms())).count()
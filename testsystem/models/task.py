@@ -24,6 +24,8 @@ from __future__ import annotations
 import traceback
 import time
 import logging
+import threading
+import testsystem.db as db
 
 from .test_unit import TestUnit
 
@@ -44,6 +46,19 @@ class Task:
     schedule_time = 0.0
     start_time = 0.0
     finish_time = 0.0
+    #: Expected runtime in seconds. This is used to order tasks within a priority band.
+    expected_runtime = 0.0
+    #: Id of the task in the shared task queue or ``None`` if the task is queued in
+    #: memory.
+    queue_id: int | None = None
+    #: Number of times the task was started.
+    attempts = 0
+    #: Time in seconds the last run of the task, including its callbacks, spent waiting
+    #: on the database.
+    db_wait_time = 0.0
+    #: Identifier of the thread executing the task. This is only valid while the task
+    #: is running.
+    thread_id = 0
 
     def __init__(
         self,
@@ -57,6 +72,9 @@ class Task:
         self.test_unit: TestUnit | None = None
         self.specific_test_unit = test_unit
         self.test_unit_tag = tag
+        #: Test units this task must not run on, e.g. the test unit of a straggling
+        #: original for a speculative duplicate.
+        self.excluded_test_units: list[TestUnit] = []
         self.callback = callback
         self.error_callback = error_callback
         self.__active = False
@@ -103,21 +121,30 @@ class Task:
         if self.test_unit_tag is not None:
             assert test_unit.has_tag(self.test_unit_tag)
 
+        assert test_unit not in self.excluded_test_units
+
         self.test_unit = test_unit
+        self.thread_id = threading.get_ident()
+        self.attempts += 1
         self.__active = True
 
         self.start_time = time.time()
         self.finish_time = 0.0
+        db_wait_start = db.get_wait_time()
         try:
             self.run()
             self.finish_time = time.time()
+            test_unit.health.record_success()
             self.__callback()
             self.__finished = True
         except Exception as err:
             self.finish_time = time.time()
+            test_unit.health.record_failure()
             self.__err_callback(err)
         finally:
             self.__active = False
+            self.db_wait_time = db.get_wait_time() - db_wait_start
+            logging.debug(f"{self} waited {self.db_wait_time:.3f}s on the database.")
 
     def run(self):
         """
@@ -25,7 +25,10 @@ import time
 import logging
 import threading
 import testsystem.scheduling as scheduling
-from testsystem.constants import TU_UNAVAILABLE_RETRY_INTERVAL_S
+from testsystem.constants import (
+    TU_UNAVAILABLE_RETRY_INTERVAL_S,
+    DEGRADED_UNIT_POLL_INTERVAL_S,
+)
 from .test_unit import TestUnit
 
 
@@ -44,6 +47,8 @@ class TaskWorker:
         self.thread: threading.Thread | None = None
         self.idle = True
         self.name = name
+        # Incremented when the worker thread is replaced
+        self.generation = 0
 
     def __repr__(self) -> str:
         return self.name
@@ -58,7 +63,26 @@ class TaskWorker:
             f" {self.test_unit.picoscope})"
         )
         self.running = True
-        self.thread = threading.Thread(target=self.__run)
+        self.thread = threading.Thread(target=self.__run, args=(self.generation,))
+        self.thread.start()
+
+    def recycle(self):
+        """
+        Replace the worker thread, e.g. because its task hangs. The previous thread is
+        abandoned and exits as soon as its task returns. The result of the abandoned
+        task is still processed. The new thread doesn't request tasks before the
+        previous thread exited, so the test unit never runs two tasks at once.
+        """
+        assert self.thread is not None
+        logging.warning(
+            f"[{self.name}] Recycle worker ({self.test_unit.msp430},"
+            f" {self.test_unit.picoscope})."
+        )
+        previous_thread = self.thread
+        self.generation += 1
+        self.thread = threading.Thread(
+            target=self.__run, args=(self.generation, previous_thread)
+        )
         self.thread.start()
 
     def stop(self):
@@ -74,9 +98,15 @@ class TaskWorker:
         self.running = False
         self.thread.join()
 
-    def __run(self):
+    def __run(self, generation: int, previous_thread: threading.Thread | None = None):
         logging.info(f"[{self.name}] Started successful.")
-        while self.running:
+        if previous_thread is not None:
+            # The task of the abandoned thread stays assigned to this worker until it
+            # returns.
+            while self.running and previous_thread.is_alive():
+                previous_thread.join(1)
+            logging.info(f"[{self.name}] Abandoned thread returned.")
+        while self.running and generation == self.generation:
             if not self.test_unit.is_available():
                 logging.warning(
                     f"[{self.name}] Test unit ({self.test_unit.msp430},"
@@ -85,13 +115,26 @@ class TaskWorker:
                 time.sleep(TU_UNAVAILABLE_RETRY_INTERVAL_S)
                 continue
 
+            if not self.test_unit.health.accepts_tasks():
+                self.idle = True
+                time.sleep(1)
+                continue
+
+            if self.test_unit.health.degraded:
+                # Let healthy test units take queued tasks first
+                time.sleep(DEGRADED_UNIT_POLL_INTERVAL_S)
+
             task = scheduling.get_next_task(self)
             if task is None:
                 self.idle = True
                 time.sleep(1)
             else:
                 self.idle = False
+                self.test_unit.health.task_started()
                 logging.debug(f"[{self.name}] Start {task}.")
                 task.run_safe(self.test_unit)
                 logging.debug(f"[{self.name}] Finished {task}.")
+        if generation != self.generation:
+            logging.info(f"[{self.name}] Abandoned thread stopped.")
+            return
         logging.info(f"[{self.name}] Stopped successful.")
@@ -22,25 +22,78 @@
 from __future__ import annotations
 
 import re
+import hashlib
 import logging
 import time
+import threading
 
 from testsystem.exceptions import ParsingError
 from testsystem.config import get_config
 from testsystem.filesystem import (
     get_test_case_definitions,
+    get_test_case_definitions_mtime,
     get_expected_test_case_output,
 )
 from testsystem.constants import (
     TEST_ID_LENGTH,
     TEST_BEGIN_MARKER,
     TEST_NEVER_IN_OUTPUT,
-    TC_DEF_CACHE_TIME_S,
+    TC_DEF_MTIME_CHECK_INTERVAL_S,
 )
 
+_TC_DEF_REGEX = re.compile(
+    r"#tc(?P<id>\d{3}): ex=(?P<ex>\d{2}) timing=(?P<timing>\d{1})"
+    r" size=(?P<size>\d{1}) panic=(?P<panic>\d{1}) ranking=(?P<ranking>\d{1})"
+    r' runtime=(?P<runtime>\d*) description="(?P<description>.*?)"'
+)
+
+
+class _Registry:
+    """
+    Parsed test case definitions with precomputed lookups. A registry is immutable and
+    replaced as a whole if the definition file changes.
+    """
+
+    def __init__(self, tc_defs: list[TestCaseDef], mtime: float):
+        self.tc_defs = tc_defs
+        self.mtime = mtime
+        self.version = _get_scoring_hash(tc_defs)
+        self.checked = time.time()
+        self.by_id = {tc_def.id: tc_def for tc_def in tc_defs}
+        self.max_exercise_nr = max([tc.exercise_nr for tc in tc_defs], default=0)
+        self.__views: dict[tuple[int, bool], tuple[list, list]] = {}
+        self.__lock = threading.Lock()
+
+    def get_views(
+        self, exercise_nr: int, enable_timing_tests: bool
+    ) -> tuple[list[TestCaseDef], list[TestCaseDef]]:
+        # Active and ranking test cases for a configuration snapshot
+        key = (exercise_nr, enable_timing_tests)
+        with self.__lock:
+            views = self.__views.get(key)
+            if views is None:
+                active = [
+                    tc
+                    for tc in self.tc_defs
+                    if tc.exercise_nr <= exercise_nr
+                    and (enable_timing_tests or not tc.timing)
+                ]
+                views = (active, [tc for tc in active if tc.ranking])
+                self.__views[key] = views
+            return views
+
+
+def _get_scoring_hash(tc_defs: list[TestCaseDef]) -> str:
+    # Only the fields used for scoring, so the version doesn't depend on the local file
+    content = "\n".join(
+        f"{tc.id} {tc.exercise_nr} {tc.timing} {tc.size} {tc.ranking}"
+        for tc in sorted(tc_defs, key=lambda tc: tc.id)
+    )
+    return hashlib.sha1(content.encode()).hexdigest()
 
-_tc_defs = None
-_tc_defs_timestamp = 0
+
+_registry: _Registry | None = None
+_registry_lock = threading.Lock()
 
 
 def is_score_tc(test_case_def: TestCaseDef) -> bool:
@@ -54,12 +107,7 @@ def is_score_tc(test_case_def: TestCaseDef) -> bool:
 
 def parse(line: str) -> TestCaseDef:
     line = line.rstrip()
-    regex = re.compile(
-        r"#tc(?P<id>\d{3}): ex=(?P<ex>\d{2}) timing=(?P<timing>\d{1})"
-        r" size=(?P<size>\d{1}) panic=(?P<panic>\d{1}) ranking=(?P<ranking>\d{1})"
-        r' runtime=(?P<runtime>\d*) description="(?P<description>.*?)"'
-    )
-    match = regex.match(line)
+    match = _TC_DEF_REGEX.match(line)
     if not match:
         raise ParsingError(f"Invalid test case configuration.")
 
@@ -77,15 +125,7 @@ def parse(line: str) -> TestCaseDef:
     )
 
 
-def get_all(disable_cache: bool = False) -> list[TestCaseDef]:
-    global _tc_defs, _tc_defs_timestamp
-    if (
-        not disable_cache
-        and _tc_defs is not None
-        and time.time() - _tc_defs_timestamp < TC_DEF_CACHE_TIME_S
-    ):
-        return _tc_defs
-
+def _load(mtime: float) -> _Registry:
     tcs = []
     lines = get_test_case_definitions().split("\n")
     for i in range(len(lines)):
@@ -95,39 +135,55 @@ def get_all(disable_cache: bool = False) -> list[TestCaseDef]:
                 tcs.append(tc)
             except ParsingError as ex:
                 logging.warning(f"Test case parsing error in line {i + 1}. {ex}")
+    return _Registry(tcs, mtime)
 
-    _tc_defs = tcs
-    _tc_defs_timestamp = time.time()
-    return _tc_defs
+
+def _get_registry(disable_cache: bool = False) -> _Registry:
+    global _registry, _registry_lock
+    registry = _registry
+    if (
+        not disable_cache
+        and registry is not None
+        and time.time() - registry.checked < TC_DEF_MTIME_CHECK_INTERVAL_S
+    ):
+        return registry
+    with _registry_lock:
+        mtime = get_test_case_definitions_mtime()
+        registry = _registry
+        if disable_cache or registry is None or registry.mtime != mtime:
+            registry = _load(mtime)
+            _registry = registry
+        else:
+            registry.checked = time.time()
+        return registry
+
+
+def get_all(disable_cache: bool = False) -> list[TestCaseDef]:
+    return _get_registry(disable_cache).tc_defs
 
 
 def get(disable_cache: bool = False) -> list[TestCaseDef]:
     conf = get_config()
-    all_tests = get_all(disable_cache)
-    active_tests = []
-    for tc in all_tests:
-        if tc.exercise_nr > conf.exercise_nr:
-            continue
-        if not conf.enable_timing_tests and tc.timing:
-            continue
-        active_tests.append(tc)
-    return active_tests
+    registry = _get_registry(disable_cache)
+    return list(registry.get_views(conf.exercise_nr, conf.enable_timing_tests)[0])
 
 
 def get_ranking_tests() -> list[TestCaseDef]:
-    ranking_tests = []
-    for tc_def in get():
-        if tc_def.ranking:
-            ranking_tests.append(tc_def)
-    return ranking_tests
+    conf = get_config()
+    registry = _get_registry()
+    return list(registry.get_views(conf.exercise_nr, conf.enable_timing_tests)[1])
 
 
 def get_max_exercise_nr() -> int:
-    max = 0
-    for tc_def in get_all():
-        if tc_def.exercise_nr > max:
-            max = tc_def.exercise_nr
-    return max
+    return _get_registry().max_exercise_nr
+
+
+def get_by_id(id: int) -> TestCaseDef | None:
+    return _get_registry().by_id.get(id)
+
+
+def get_version() -> str:
+    return _get_registry().version
 
 
 class TestCaseDef:
@@ -242,7 +298,4 @@ class TestCaseDef:
 
         :returns: Returns the test case definition or None if it does not exist.
         """
-        for tc in get_all():
-            if tc.id == id:
-                return tc
-        return None
+        return get_by_id(id)
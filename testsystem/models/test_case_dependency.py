@@ -0,0 +1,106 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+from __future__ import annotations
+
+import time
+import testsystem.db as db
+
+from sqlalchemy import Column, Integer, ForeignKey, BigInteger, UniqueConstraint
+from sqlalchemy.types import Text
+from sqlalchemy.orm import Session
+
+
+def _set_dependencies(
+    session: Session, group_id: int, test_case_id: int, files: list[str]
+):
+    dependency = (
+        session.query(TestCaseDependency)
+        .filter(TestCaseDependency.group_id == group_id)
+        .filter(TestCaseDependency.test_case_id == test_case_id)
+        .first()
+    )
+    if dependency is None:
+        dependency = TestCaseDependency(group_id=group_id, test_case_id=test_case_id)
+        session.add(dependency)
+    dependency.files = ";".join(sorted(set(files)))
+    dependency.timestamp = int(time.time() * 1000)
+    session.commit()
+
+
+class TestCaseDependency(db.Base):
+    """
+    Group source files a test case depends on. The dependencies are collected from the
+    build artefacts of a group's test case and are used for test impact analysis.
+    This is also a database object.
+    """
+
+    __test__ = False
+
+    __tablename__ = "TestCaseDependencies"
+    __table_args__ = (UniqueConstraint("group_id", "test_case_id"),)
+
+    id: int = Column(Integer, primary_key=True)  # type: ignore
+    group_id: int = Column(Integer, ForeignKey("Groups.id"), nullable=False)  # type: ignore
+    test_case_id: int = Column(Integer, nullable=False)  # type: ignore
+    files: str = Column(Text, nullable=False, default="")  # type: ignore
+    timestamp: int = Column(BigInteger, nullable=False)  # type: ignore
+
+    @property
+    def file_list(self) -> list[str]:
+        """
+        List of file names (or patterns) relative to the group source directory.
+        """
+        if self.files is None or len(self.files) == 0:
+            return []
+        return self.files.split(";")
+
+    @classmethod
+    def get_by_group(cls, group_id: int) -> dict[int, list[str]]:
+        """
+        Get the dependencies of all test cases for a specific group.
+
+        :param group_id: The group id.
+
+        :returns: A dictionary with test case ids as keys and a list of dependencies as
+            values. Test cases without recorded dependencies are not included.
+        """
+        with Session(db.get_engine()) as session:
+            dependencies = (
+                session.query(TestCaseDependency)
+                .filter(TestCaseDependency.group_id == group_id)
+                .all()
+            )
+            return {d.test_case_id: d.file_list for d in dependencies}
+
+    @classmethod
+    def set(cls, group_id: int, test_case_id: int, files: list[str]):
+        """
+        Set the dependencies of a test case for a specific group. Previously recorded
+        dependencies are replaced.
+
+        :param group_id: The group id.
+        :param test_case_id: The test case id.
+        :param files: File names (or patterns) relative to the group source directory.
+        """
+        with Session(db.get_engine()) as session:
+            _set_dependencies(session, group_id, test_case_id, files)
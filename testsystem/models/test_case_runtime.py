@@ -0,0 +1,154 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+from __future__ import annotations
+
+import time
+import threading
+import testsystem.db as db
+import testsystem.db_writer as db_writer
+
+from concurrent.futures import Future
+from sqlalchemy import Column, Integer, BigInteger, Float
+from sqlalchemy.orm import Session
+
+from .test_case_def import TestCaseDef
+
+_runtime_cache: dict[int, TestCaseRuntime] | None = None
+_runtime_cache_lock = threading.Lock()
+
+
+def _load_cache() -> dict[int, TestCaseRuntime]:
+    global _runtime_cache
+    if _runtime_cache is None:
+        with Session(db.get_engine(), expire_on_commit=False) as session:
+            runtimes = session.query(TestCaseRuntime).all()
+            _runtime_cache = {r.test_case_id: r for r in runtimes}
+    return _runtime_cache
+
+
+def _add_sample(session: Session, test_case_id: int, runtime: float) -> TestCaseRuntime:
+    tc_runtime = session.get(TestCaseRuntime, test_case_id)
+    if tc_runtime is None:
+        tc_runtime = TestCaseRuntime(test_case_id=test_case_id, count=0, mean=0, m2=0)
+        session.add(tc_runtime)
+    # Welford's online algorithm
+    count = tc_runtime.count + 1
+    delta = runtime - tc_runtime.mean
+    mean = tc_runtime.mean + delta / count
+    tc_runtime.m2 = tc_runtime.m2 + delta * (runtime - mean)
+    tc_runtime.mean = mean
+    tc_runtime.count = count
+    tc_runtime.timestamp = int(time.time() * 1000)
+    session.commit()
+    return tc_runtime
+
+
+def _update_cache(future: Future[TestCaseRuntime]):
+    global _runtime_cache
+    if future.exception() is not None:
+        return
+    tc_runtime = future.result()
+    with _runtime_cache_lock:
+        if _runtime_cache is None:
+            return
+        cached = _runtime_cache.get(tc_runtime.test_case_id, None)
+        # Writes executed without the writer thread may complete out of order
+        if cached is None or cached.count <= tc_runtime.count:
+            _runtime_cache[tc_runtime.test_case_id] = tc_runtime
+
+
+class TestCaseRuntime(db.Base):
+    """
+    Runtime statistics of a test case. The statistics are based on the runtime of all
+    test case tasks executed for this test case, including build and flash time. This
+    is also a database object.
+    """
+
+    __test__ = False
+
+    __tablename__ = "TestCaseRuntimes"
+
+    test_case_id: int = Column(Integer, primary_key=True, autoincrement=False)  # type: ignore
+    count: int = Column(Integer, nullable=False, default=0)  # type: ignore
+    mean: float = Column(Float, nullable=False, default=0)  # type: ignore
+    m2: float = Column(Float, nullable=False, default=0)  # type: ignore
+    timestamp: int = Column(BigInteger, nullable=False)  # type: ignore
+
+    @property
+    def std(self) -> float:
+        """
+        Sample standard deviation of the runtime in seconds.
+        """
+        if self.count < 2:
+            return 0.0
+        return (self.m2 / (self.count - 1)) ** 0.5
+
+    @classmethod
+    def get(cls, test_case_id: int) -> TestCaseRuntime | None:
+        """
+        Get the runtime statistics of a test case.
+
+        :param test_case_id: The test case id.
+
+        :returns: The statistics or ``None`` if the test case never ran.
+        """
+        with _runtime_cache_lock:
+            return _load_cache().get(test_case_id, None)
+
+    @classmethod
+    def get_expected_runtime(cls, tc_def: TestCaseDef) -> float:
+        """
+        Get the expected runtime of a test case task. If there are no statistics for
+        the test case yet, the runtime from the test case definition is used.
+
+        :param tc_def: The test case definition.
+
+        :returns: The expected runtime in seconds.
+        """
+        tc_runtime = cls.get(tc_def.id)
+        if tc_runtime is None or tc_runtime.count == 0:
+            return float(tc_def.runtime)
+        return tc_runtime.mean
+
+    @classmethod
+    def add_sample(cls, test_case_id: int, runtime: float):
+        """
+        Update the runtime statistics of a test case with a new measurement. The
+        statistics are written by the database writer without waiting for it, and the
+        cache is updated as soon as the write completed.
+
+        :param test_case_id: The test case id.
+        :param runtime: The measured runtime in seconds.
+        """
+        future = db_writer.submit(_add_sample, test_case_id, runtime)
+        future.add_done_callback(_update_cache)
+
+    @classmethod
+    def clear_cache(cls):
+        """
+        Clear the in-memory cache. Statistics are reloaded from the database on the next
+        access.
+        """
+        global _runtime_cache
+        with _runtime_cache_lock:
+            _runtime_cache = None
@@ -81,4 +81,8 @@ class TestCaseTask(Task):
             " in queue."
         )
         self.__test_case = TestCase(self.test_case_def, self.group, self.test_unit)
-        testing.run_test(self.__test_case, self.test_env)
+        start_time = time.time()
+        try:
+            testing.run_test(self.__test_case, self.test_env)
+        finally:
+            self.group.add_service_time(time.time() - start_time)
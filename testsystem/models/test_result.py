@@ -22,11 +22,13 @@
 from __future__ import annotations
 
 from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Float, BigInteger
-from sqlalchemy.types import Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, relationship
+from sqlalchemy.orm.attributes import set_committed_value
 
 import testsystem.db as db
 from .test_case_def import TestCaseDef, is_score_tc
+from .test_result_blob import TestResultBlob
 
 
 def get_score(test_result: TestResult) -> int:
@@ -45,6 +47,33 @@ def get_score(test_result: TestResult) -> int:
         return 0
 
 
+def _load_blobs(session: Session, test_results: list[TestResult]):
+    ids = [r.id for r in test_results]
+    blobs = {
+        blob.test_result_id: blob
+        for blob in session.query(TestResultBlob).filter(
+            TestResultBlob.test_result_id.in_(ids)
+        )
+    }
+    for test_result in test_results:
+        set_committed_value(test_result, "blob", blobs.get(test_result.id, None))
+
+
+def _text_attribute(name: str, default: str | None = None) -> property:
+    def get_text(self: TestResult) -> str | None:
+        blob = self._get_blob()
+        if blob is None:
+            return default
+        return getattr(blob, name)
+
+    def set_text(self: TestResult, value: str | None):
+        if self._get_blob() is None:
+            self.blob = TestResultBlob()
+        setattr(self.blob, name, value)
+
+    return property(get_text, set_text)
+
+
 class TestResult(db.Base):
     """
     Class for a specific test result produced by a test case.
@@ -56,18 +85,45 @@ class TestResult(db.Base):
     __tablename__ = "TestResults"
 
     id: int = Column(Integer, primary_key=True)  # type: ignore
-    test_set_id: int = Column(Integer, ForeignKey("TestSets.id"), nullable=False)  # type: ignore
+    test_set_id: int = Column(Integer, ForeignKey("TestSets.id"), nullable=False, index=True)  # type: ignore
     result: float | None = Column(Float, nullable=True)  # type: ignore
     test_case_id: int = Column(Integer, nullable=False)  # type: ignore
     successful: bool = Column(Boolean, nullable=False)  # type: ignore
-    output: str = Column(Text, nullable=False, default="")  # type: ignore
-    build_output: str | None = Column(Text, nullable=True)  # type: ignore
-    build_error: str | None = Column(Text, nullable=True)  # type: ignore
-    flash_output: str | None = Column(Text, nullable=True)  # type: ignore
-    flash_error: str | None = Column(Text, nullable=True)  # type: ignore
     timestamp: int = Column(BigInteger, nullable=False)  # type: ignore
 
     test_set_result = relationship("TestSet", back_populates="test_results")
+    blob: TestResultBlob | None = relationship(
+        TestResultBlob, uselist=False, cascade="all, delete-orphan"
+    )
+
+    # Large outputs are stored in a separate table and loaded on first access
+    output: str = _text_attribute("output", default="")  # type: ignore
+    build_output: str | None = _text_attribute("build_output")  # type: ignore
+    build_error: str | None = _text_attribute("build_error")  # type: ignore
+    flash_output: str | None = _text_attribute("flash_output")  # type: ignore
+    flash_error: str | None = _text_attribute("flash_error")  # type: ignore
+
+    @staticmethod
+    def load_texts(test_results: list[TestResult]):
+        """
+        Load the outputs of detached test results with one query. Outputs of test
+        results which are not loaded yet are otherwise loaded one by one on first
+        access.
+
+        :param test_results: The test results to load the outputs for.
+        """
+        detached = [
+            r for r in test_results if "blob" not in r.__dict__ and inspect(r).detached
+        ]
+        if len(detached) == 0:
+            return
+        with Session(db.get_engine(), expire_on_commit=False) as session:
+            _load_blobs(session, detached)
+
+    def _get_blob(self) -> TestResultBlob | None:
+        if "blob" not in self.__dict__ and inspect(self).detached:
+            TestResult.load_texts([self])
+        return self.blob
 
     @property
     def tc_def(self) -> TestCaseDef | None:
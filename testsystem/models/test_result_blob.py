@@ -0,0 +1,89 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+from __future__ import annotations
+
+import zlib
+import testsystem.db as db
+
+from sqlalchemy import Column, Integer, ForeignKey, LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+from testsystem.constants import RESULT_TEXT_MAX_LENGTH, RESULT_TEXT_COMPRESSION_LEVEL
+
+
+def truncate_text(text: str, max_length: int = RESULT_TEXT_MAX_LENGTH) -> str:
+    """
+    Shorten a text to at most ``max_length`` characters, plus a short notice. The head
+    and the tail of the text are kept, because errors usually show up at the end.
+
+    :param text: The text to shorten.
+    :param max_length: The maximum number of characters to keep.
+
+    :returns: The text itself if it is short enough, the shortened text otherwise.
+    """
+    if len(text) <= max_length:
+        return text
+    head = max_length // 2
+    tail = max_length - head
+    skipped = len(text) - max_length
+    return f"{text[:head]}\n[... {skipped} characters truncated ...]\n{text[-tail:]}"
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text column type which stores zlib compressed and size capped text.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: str | None, dialect) -> bytes | None:
+        if value is None:
+            return None
+        data = truncate_text(value).encode("utf-8")
+        return zlib.compress(data, RESULT_TEXT_COMPRESSION_LEVEL)
+
+    def process_result_value(self, value: bytes | None, dialect) -> str | None:
+        if value is None:
+            return None
+        return zlib.decompress(value).decode("utf-8", errors="replace")
+
+
+class TestResultBlob(db.Base):
+    """
+    Large text outputs of a test result. They are stored compressed in a separate table,
+    so queries for test results don't load them. Use the attributes of
+    :py:class:`~testsystem.models.TestResult` to access them.
+    """
+
+    __test__ = False
+
+    __tablename__ = "TestResultBlobs"
+
+    test_result_id: int = Column(
+        Integer, ForeignKey("TestResults.id", ondelete="CASCADE"), primary_key=True
+    )  # type: ignore
+    output: str = Column(CompressedText, nullable=False, default="")  # type: ignore
+    build_output: str | None = Column(CompressedText, nullable=True)  # type: ignore
+    build_error: str | None = Column(CompressedText, nullable=True)  # type: ignore
+    flash_output: str | None = Column(CompressedText, nullable=True)  # type: ignore
+    flash_error: str | None = Column(CompressedText, nullable=True)  # type: ignore
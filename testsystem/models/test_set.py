@@ -22,18 +22,44 @@
 from __future__ import annotations
 
 import logging
+import threading
 import time
 import string
 import testsystem.db as db
-
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, BigInteger
+import testsystem.db_writer as db_writer
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    ForeignKey,
+    Boolean,
+    BigInteger,
+    Index,
+    desc,
+)
+from sqlalchemy.sql import func
 from sqlalchemy.orm import Session, relationship, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from .test_result import TestResult
+from .group_score import update_score
+
+
+# Test set id -> test results not yet written to the database
+_pending_results: dict[int, list[TestResult]] = {}
+_pending_results_lock = threading.Lock()
+# Serializes database writes of test results and deletions of test sets
+_result_write_lock = threading.Lock()
 
 
 def _update(
-    session: Session, test_set_id: int, commit_time: int, commit_msg: str | None = None
+    session: Session,
+    test_set_id: int,
+    commit_time: int,
+    commit_msg: str | None = None,
+    public_commit_hash: str | None = None,
+    tc_version: str | None = None,
 ):
     ascii = string.ascii_letters
     digits = string.digits
@@ -49,6 +75,10 @@ def _update(
             [c if c in char_white_list else "?" for c in commit_msg]
         )
         result.commit_message = formatted_msg[0:50]
+    if public_commit_hash is not None:
+        result.public_commit_hash = public_commit_hash
+    if tc_version is not None:
+        result.tc_version = tc_version
 
 
 def _delete_unfinished_test_sets(session: Session):
@@ -65,6 +95,17 @@ def _delete_test_set(session: Session, test_set: TestSet):
     session.commit()
 
 
+def _get_unfinished_test_sets(session: Session) -> list[TestSet]:
+    return (
+        session.query(TestSet)
+        .filter(TestSet.finished == False)
+        .options(joinedload(TestSet.test_results))
+        .options(joinedload(TestSet.group))
+        .order_by(TestSet.commit_time)
+        .all()
+    )
+
+
 def _get_or_create(session: Session, group_id: int, commit_hash: str) -> TestSet:
     qry = (
         session.query(TestSet)
@@ -85,29 +126,148 @@ def _get_or_create(session: Session, group_id: int, commit_hash: str) -> TestSet
     return set_result  # type: ignore
 
 
-def _add_result(session: Session, test_set_id: int, test_result: TestResult):
-    _ts: TestSet = session.get(TestSet, test_set_id)
-    _ts.test_results.append(test_result)
+def _rank_finished_test_sets(session: Session, group_ids: list[int]):
+    return (
+        session.query(
+            TestSet.id.label("test_set_id"),
+            TestSet.group_id.label("group_id"),
+            TestSet.commit_time.label("commit_time"),
+            func.row_number()
+            .over(
+                partition_by=TestSet.group_id,
+                order_by=(desc(TestSet.commit_time), desc(TestSet.id)),
+            )
+            .label("rank"),
+        )
+        .filter(TestSet.finished == True, TestSet.group_id.in_(group_ids))
+        .subquery()
+    )
+
+
+def _get_latest_test_sets(session: Session, group_ids: list[int]) -> list[TestSet]:
+    latest_ids = (
+        session.query(func.max(TestSet.id))
+        .filter(TestSet.group_id.in_(group_ids))
+        .group_by(TestSet.group_id)
+    )
+    return session.query(TestSet).filter(TestSet.id.in_(latest_ids)).all()
+
+
+def _get_existing_commits(
+    session: Session, candidates: list[tuple[int, str]]
+) -> set[tuple[int, str]]:
+    commit_hashes = set(commit for _, commit in candidates)
+    rows = (
+        session.query(TestSet.group_id, TestSet.commit_hash)
+        .filter(TestSet.commit_hash.in_(commit_hashes))
+        .all()
+    )
+    return set(tuple(row) for row in rows) & set(candidates)  # type: ignore
+
+
+def _get_latest_finished_test_sets(
+    session: Session, group_ids: list[int]
+) -> list[tuple[int, int, int | None]]:
+    ranked = _rank_finished_test_sets(session, group_ids)
+    rows = (
+        session.query(ranked.c.group_id, ranked.c.test_set_id, ranked.c.commit_time)
+        .filter(ranked.c.rank == 1)
+        .all()
+    )
+    return [tuple(row) for row in rows]  # type: ignore
+
+
+def mark_finished(session: Session, test_set_id: int, state: bool = True):
+    """
+    Set the finished state of a test set in an open session and update the score of
+    its group in the same transaction. The caller commits the session.
+
+    :param session: The open session.
+    :param test_set_id: The id of the test set.
+    :param state: If True, the test set is marked finished.
+    """
+    test_set: TestSet = session.get(TestSet, test_set_id)
+    test_set.finished = state
+    if state:
+        update_score(session, test_set.group_id, test_set.id, test_set.commit_time)
+
+
+def _set_finished(session: Session, test_set_id: int, state: bool):
+    mark_finished(session, test_set_id, state)
+    session.commit()
+
+
+def _try_set_finished(session: Session, test_set_id: int) -> bool:
+    cnt = (
+        session.query(TestSet)
+        .filter(TestSet.id == test_set_id, TestSet.finished == False)
+        .update({TestSet.finished: True}, synchronize_session=False)
+    )
+    if cnt == 1:
+        mark_finished(session, test_set_id)
+    session.commit()
+    return cnt == 1
+
+
+def _add_results(session: Session, test_results: list[TestResult]):
+    session.add_all(test_results)
     session.commit()
 
 
+def _discard_results(test_set_id: int):
+    with _pending_results_lock:
+        _pending_results.pop(test_set_id, None)
+
+
 def add_result(test_set: TestSet, test_result: TestResult) -> TestSet:
     """
-    Add a new test result to this test set.
+    Add a new test result to this test set. The result is buffered in memory and
+    written to the database by :py:func:`flush_results`. Loaded results of the test
+    set are updated without reloading it.
 
     :param test_set: The test set where to add the new result.
     :param test_result: The test result which should be added.
 
     :returns: Returns the updated test set.
     """
-    with Session(db.get_engine(), expire_on_commit=False) as session:
-        _add_result(session, test_set.id, test_result)
-        qry = (
-            session.query(TestSet)
-            .filter(TestSet.id == test_set.id)
-            .options(joinedload("group"))
+    test_result.test_set_id = test_set.id
+    with _pending_results_lock:
+        _pending_results.setdefault(test_set.id, []).append(test_result)
+    if "test_results" in test_set.__dict__:
+        test_results = sorted(
+            test_set.test_results + [test_result], key=lambda r: r.test_case_id
         )
-        return qry.first()  # type: ignore
+        set_committed_value(test_set, "test_results", test_results)
+    return test_set
+
+
+def flush_results(test_set_id: int | None = None):
+    """
+    Write buffered test results to the database in one transaction.
+
+    :param test_set_id: If set, only the results of this test set are written.
+    """
+    global _pending_results
+    with _result_write_lock:
+        with _pending_results_lock:
+            if test_set_id is None:
+                pending = _pending_results
+                _pending_results = {}
+            elif test_set_id in _pending_results:
+                pending = {test_set_id: _pending_results.pop(test_set_id)}
+            else:
+                pending = {}
+        test_results = [r for results in pending.values() for r in results]
+        if len(test_results) == 0:
+            return
+        try:
+            db_writer.execute(_add_results, test_results)
+        except Exception:
+            # Keep the results for the next flush
+            with _pending_results_lock:
+                for id, results in pending.items():
+                    _pending_results[id] = results + _pending_results.get(id, [])
+            raise
 
 
 def delete_unfinished_test_sets():
@@ -129,6 +289,15 @@ class TestSet(db.Base):
     __test__ = False
 
     __tablename__ = "TestSets"
+    __table_args__ = (
+        Index(
+            "ix_TestSets_group_id_finished_commit_time",
+            "group_id",
+            "finished",
+            "commit_time",
+        ),
+        Index("ix_TestSets_finished", "finished"),
+    )
 
     id: int = Column(Integer, primary_key=True)  # type: ignore
     group_id: int = Column(Integer, ForeignKey("Groups.id"), nullable=False)  # type: ignore
@@ -137,6 +306,8 @@ class TestSet(db.Base):
     commit_time: int = Column(BigInteger, nullable=True)  # type: ignore
     finished: bool = Column(Boolean, nullable=False, default=False)  # type: ignore
     timestamp: int = Column(BigInteger, nullable=False)  # type: ignore
+    public_commit_hash: str = Column(String(40), nullable=True)  # type: ignore
+    tc_version: str = Column(String(40), nullable=True)  # type: ignore
 
     test_results: list[TestResult] = relationship(
         "TestResult",
@@ -181,6 +352,84 @@ class TestSet(db.Base):
             )
             return test_set is not None
 
+    @classmethod
+    def get_by_id(cls, test_set_id: int) -> TestSet | None:
+        """
+        Get a test set including its results and group.
+
+        :param test_set_id: The test set id.
+
+        :returns: The test set or ``None`` if it does not exist.
+        """
+        with Session(db.get_engine(), expire_on_commit=False) as session:
+            return (
+                session.query(TestSet)
+                .filter(TestSet.id == test_set_id)
+                .options(joinedload(TestSet.test_results))
+                .options(joinedload(TestSet.group))
+                .first()
+            )
+
+    @classmethod
+    def get_latest_finished_test_sets(
+        cls, group_ids: list[int]
+    ) -> list[tuple[int, int, int | None]]:
+        """
+        Get the latest finished test set of several groups with a single query.
+
+        :param group_ids: The ids of the groups.
+
+        :returns: List of ``(group_id, test_set_id, commit_time)`` tuples. Groups
+            without a finished test set have no entry.
+        """
+        if len(group_ids) == 0:
+            return []
+        with Session(db.get_engine()) as session:
+            return _get_latest_finished_test_sets(session, group_ids)
+
+    @classmethod
+    def get_latest_test_sets(cls, group_ids: list[int]) -> dict[int, TestSet]:
+        """
+        Get the latest test set of several groups with a single query. Results are not
+        loaded.
+
+        :param group_ids: The ids of the groups.
+
+        :returns: Dictionary from group id to the latest test set of the group. Groups
+            without a test set have no entry.
+        """
+        if len(group_ids) == 0:
+            return {}
+        with Session(db.get_engine(), expire_on_commit=False) as session:
+            test_sets = _get_latest_test_sets(session, group_ids)
+            return {test_set.group_id: test_set for test_set in test_sets}
+
+    @classmethod
+    def get_existing_commits(
+        cls, candidates: list[tuple[int, str]]
+    ) -> set[tuple[int, str]]:
+        """
+        Check for several commits at once if a test set exists.
+
+        :param candidates: List of ``(group_id, commit_hash)`` tuples to check.
+
+        :returns: The set of candidates with an existing test set.
+        """
+        if len(candidates) == 0:
+            return set()
+        with Session(db.get_engine()) as session:
+            return _get_existing_commits(session, candidates)
+
+    @classmethod
+    def get_unfinished_test_sets(cls) -> list[TestSet]:
+        """
+        Get all unfinished test sets, including their results and groups.
+
+        :returns: The unfinished test sets ordered by commit time.
+        """
+        with Session(db.get_engine(), expire_on_commit=False) as session:
+            return list(_get_unfinished_test_sets(session))
+
     @classmethod
     def delete_unfinished_test_sets(cls):
         """
@@ -191,23 +440,41 @@ class TestSet(db.Base):
         logging.info("Cleanup old test sets.")
         delete_unfinished_test_sets()
 
-    def update(self, commit_time: int, commit_msg: str | None = None):
+    def update(
+        self,
+        commit_time: int,
+        commit_msg: str | None = None,
+        public_commit_hash: str | None = None,
+        tc_version: str | None = None,
+    ):
         """
         Update this test set with additional information.
 
         :param commit_time: The timestamp of the commit in unix millis.
         :param commit_msg: The message of the commit used in this set.
+        :param public_commit_hash: The public repository commit used in this set.
+        :param tc_version: The version of the test case files used in this set, see
+            :py:func:`~testsystem.filesystem.get_test_case_files_version`.
         """
         with Session(db.get_engine(), expire_on_commit=False) as session:
-            _update(session, self.id, commit_time, commit_msg)
+            _update(
+                session,
+                self.id,
+                commit_time,
+                commit_msg,
+                public_commit_hash,
+                tc_version,
+            )
             session.commit()
 
     def delete(self):
         """
-        Delete this test set.
+        Delete this test set. Buffered results of this test set are dropped.
         """
-        with Session(db.get_engine()) as session:
-            _delete_test_set(session, self)
+        with _result_write_lock:
+            _discard_results(self.id)
+            with Session(db.get_engine()) as session:
+                _delete_test_set(session, self)
 
     def get_results(self) -> list[TestResult]:
         """
@@ -228,8 +495,18 @@ class TestSet(db.Base):
 
         :param state: If True, this set is marked finished.
         """
-        with Session(db.get_engine(), expire_on_commit=False) as session:
-            set_result: TestSet = session.get(TestSet, self.id)
-            set_result.finished = state
-            session.commit()
-            self.finished = state
+        db_writer.execute(_set_finished, self.id, state)
+        self.finished = state
+
+    def try_set_finished(self) -> bool:
+        """
+        Mark this test set finished, unless it is already finished. If several test
+        system instances try to finish the same test set concurrently, exactly one of
+        them succeeds.
+
+        :returns: Returns ``True`` if this call marked the test set finished.
+        """
+        finished = db_writer.execute(_try_set_finished, self.id)
+        if finished:
+            self.finished = True
+        return finished
@@ -27,6 +27,7 @@ import logging
 from .msp430 import MSP430
 from .pico_scope import PicoScope
 from .connection_info import ConnectionInfo
+from .unit_health import UnitHealth
 from testsystem.config import get_config
 from testsystem.exceptions import ConfigError
 from testsystem.constants import TUTAG_SCOPE
@@ -58,6 +59,7 @@ class TestUnit:
     ):
         self.msp430 = msp
         self.picoscope = pico
+        self.health = UnitHealth(str(msp))
         self.__tags: list[str] = []
 
         for c in connections:
@@ -235,6 +237,10 @@ class TestUnit:
     def has_scope(self) -> bool:
         return self.picoscope != None
 
+    @property
+    def tags(self) -> list[str]:
+        return list(self.__tags)
+
     def has_tag(self, tag: str | None) -> bool:
         if tag is None:
             return False
@@ -0,0 +1,139 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+from __future__ import annotations
+
+import time
+import logging
+import threading
+
+from testsystem.config import get_config
+from testsystem.constants import (
+    BREAKER_CLOSED,
+    BREAKER_OPEN,
+    BREAKER_HALF_OPEN,
+    UNIT_HEALTH_SMOOTHING,
+    UNIT_HEALTH_DEGRADED_SCORE,
+)
+
+
+class UnitHealth:
+    """
+    Health state and circuit breaker of a test unit. The health score is a moving
+    average of task outcomes, where ``1`` means all recent tasks succeeded. After
+    :py:attr:`~testsystem.config.Config.tu_failure_threshold` consecutive task failures,
+    the breaker opens and the test unit gets no tasks for a backoff period. Afterwards,
+    the breaker is half-open and the test unit may run a single probe task. If the probe
+    succeeds, the breaker closes. Otherwise, it opens again with twice the backoff
+    period.
+
+    :param name: A name for log messages.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.score = 1.0
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.open_cnt = 0
+        self.open_until = 0.0
+        self.__probing = False
+        self.__lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.state} (Score={round(self.score, 2)})"
+
+    @property
+    def degraded(self) -> bool:
+        """
+        Flag if the test unit failed recently and should only be used if healthy test
+        units are busy.
+        """
+        return self.score < UNIT_HEALTH_DEGRADED_SCORE
+
+    @property
+    def backoff_s(self) -> float:
+        """
+        The backoff period in seconds for the next time the breaker opens.
+        """
+        conf = get_config()
+        backoff = conf.tu_backoff_s * 2**self.open_cnt
+        return float(min(backoff, max(conf.tu_backoff_s, conf.tu_backoff_max_s)))
+
+    def accepts_tasks(self) -> bool:
+        """
+        Check if the test unit may run a task. An open breaker becomes half-open after
+        the backoff period.
+
+        :returns: Returns ``True`` if the test unit may run a task.
+        """
+        with self.__lock:
+            if self.state == BREAKER_OPEN and time.time() >= self.open_until:
+                self.state = BREAKER_HALF_OPEN
+                logging.info(f"Circuit breaker of {self.name} is half-open.")
+            if self.state == BREAKER_HALF_OPEN:
+                return not self.__probing
+            return self.state == BREAKER_CLOSED
+
+    def task_started(self):
+        """
+        Record that the test unit started a task. In half-open state, this task is the
+        probe.
+        """
+        with self.__lock:
+            if self.state == BREAKER_HALF_OPEN:
+                self.__probing = True
+
+    def record_success(self):
+        """
+        Record a successfully executed task.
+        """
+        with self.__lock:
+            self.score += (1.0 - self.score) * UNIT_HEALTH_SMOOTHING
+            self.consecutive_failures = 0
+            self.__probing = False
+            if self.state != BREAKER_CLOSED:
+                logging.info(f"Circuit breaker of {self.name} closed.")
+            self.state = BREAKER_CLOSED
+            self.open_cnt = 0
+
+    def record_failure(self):
+        """
+        Record a task which failed because of an error of the test unit.
+        """
+        with self.__lock:
+            self.score -= self.score * UNIT_HEALTH_SMOOTHING
+            self.consecutive_failures += 1
+            probe_failed = self.state == BREAKER_HALF_OPEN
+            self.__probing = False
+            threshold = get_config().tu_failure_threshold
+            if probe_failed or (
+                threshold > 0 and self.consecutive_failures >= threshold
+            ):
+                backoff = self.backoff_s
+                self.state = BREAKER_OPEN
+                self.open_until = time.time() + backoff
+                self.open_cnt += 1
+                logging.warning(
+                    f"Circuit breaker of {self.name} opened for {int(backoff)}s after"
+                    f" {self.consecutive_failures} consecutive failures."
+                )
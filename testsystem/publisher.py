@@ -0,0 +1,216 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Write-behind publisher for test run reports. Task workers hand off finished test sets to
+the publisher and return to their test units immediately. Pending publications are
+stored as :py:class:`~testsystem.models.publish_job.PublishJob` in the database. Every
+:py:attr:`~testsystem.config.Config.publish_interval_s` seconds, the publisher thread
+renders the reports of all pending test sets and pushes them with one commit per
+repository. The system status report is regenerated once per flush. Failed
+publications are retried with an increasing delay and survive restarts of the test
+system.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import testsystem.config as cnf
+import testsystem.filesystem as fs
+import testsystem.reporting as reporting
+import testsystem.shared_queue as shared_queue
+
+from testsystem.models import PublishJob, TestSet
+from testsystem.constants import (
+    PUBLISH_BATCH_SIZE,
+    PUBLISH_RETRY_DELAY_S,
+    PUBLISH_RETRY_MAX_DELAY_S,
+)
+
+_publisher_stop_event = threading.Event()
+_publisher_thread: threading.Thread | None = None
+
+
+class _GroupReports:
+    def __init__(self, test_set: TestSet):
+        self.test_set = test_set
+        self.jobs: list[PublishJob] = []
+        self.test_run_report = ""
+        self.group_report = ""
+
+    @property
+    def group_name(self) -> str:
+        return self.test_set.group.group_name
+
+    @property
+    def commit(self) -> str:
+        return self.test_set.commit_hash
+
+
+def submit(test_set: TestSet):
+    """
+    Mark a test set finished and queue the publication of its reports. The reports are
+    published with the next flush of the publisher.
+
+    :param test_set: The finished test set.
+    """
+    PublishJob.enqueue(test_set.id)
+    test_set.finished = True
+
+
+def _get_retry_delay(attempts: int) -> float:
+    return float(min(PUBLISH_RETRY_DELAY_S * 2**attempts, PUBLISH_RETRY_MAX_DELAY_S))
+
+
+def _retry(jobs: list[PublishJob], ex: Exception):
+    for job in jobs:
+        PublishJob.retry(job.id, _get_retry_delay(job.attempts), str(ex))
+
+
+def _collect(jobs: list[PublishJob]) -> dict[str, _GroupReports]:
+    # The reports of the latest test set of a group replace those of older ones
+    reports: dict[str, _GroupReports] = {}
+    for job in jobs:
+        test_set = TestSet.get_by_id(job.test_set_id)
+        if test_set is None:
+            PublishJob.remove(job.id)
+            continue
+        group_name = test_set.group.group_name
+        if group_name in reports:
+            reports[group_name].test_set = test_set
+        else:
+            reports[group_name] = _GroupReports(test_set)
+        reports[group_name].jobs.append(job)
+    return reports
+
+
+def _create_commit_message(reports: list[_GroupReports]) -> str:
+    if len(reports) == 1:
+        return f"Test Report {reports[0].group_name} {reports[0].commit[0:8]}"
+    lines = [f"{r.group_name} {r.commit[0:8]}" for r in reports]
+    return f"Test Reports ({len(reports)} groups)\n\n" + "\n".join(lines)
+
+
+def process_jobs() -> int:
+    """
+    Publish the reports of all due jobs. The test run reports and the system status
+    report are pushed with a single commit to the system repository. Each group
+    repository gets a single commit with the latest group report. Failed jobs are
+    postponed.
+
+    :returns: Number of successfully processed jobs.
+    """
+    jobs = PublishJob.get_due(PUBLISH_BATCH_SIZE)
+    if len(jobs) == 0:
+        return 0
+    published: list[_GroupReports] = []
+    for group_reports in _collect(jobs).values():
+        try:
+            test_set = group_reports.test_set
+            group_reports.test_run_report = reporting.create_md_report_for_test_set(
+                test_set
+            )
+            group_reports.group_report = reporting.create_md_group_report(
+                test_set=test_set
+            )
+            fs.publish_group_report(
+                group_reports.group_name,
+                group_reports.commit,
+                group_reports.group_report,
+            )
+            published.append(group_reports)
+        except Exception as ex:
+            logging.error(
+                f"[PUBLISHER] Publishing reports for group {group_reports.group_name}"
+                f" and commit {group_reports.commit[0:8]} failed. {ex}"
+            )
+            _retry(group_reports.jobs, ex)
+    if len(published) == 0:
+        return 0
+
+    try:
+        fs.publish_system_reports(
+            {r.group_name: r.test_run_report for r in published},
+            reporting.create_md_system_report(),
+            _create_commit_message(published),
+        )
+    except Exception as ex:
+        logging.error(
+            f"[PUBLISHER] Publishing {len(published)} test run reports failed. {ex}"
+        )
+        for group_reports in published:
+            _retry(group_reports.jobs, ex)
+        return 0
+
+    processed = 0
+    for group_reports in published:
+        for job in group_reports.jobs:
+            PublishJob.remove(job.id)
+            processed += 1
+    return processed
+
+
+def _may_publish() -> bool:
+    # With a shared queue, only the leader publishes to avoid concurrent pushes
+    return not shared_queue.enabled() or shared_queue.is_leader()
+
+
+def _run_publisher(stop_event: threading.Event):
+    logging.info("[PUBLISHER] Started successful.")
+    while not stop_event.is_set():
+        if _may_publish():
+            try:
+                process_jobs()
+            except Exception as ex:
+                logging.error(
+                    f"[PUBLISHER] Processing publish jobs failed.", exc_info=ex
+                )
+        stop_event.wait(max(1, cnf.get_config().publish_interval_s))
+    logging.info("[PUBLISHER] Stopped successful.")
+
+
+def start():
+    """
+    Starts the publisher thread. Jobs left over from a previous run are processed first.
+    """
+    global _publisher_thread, _publisher_stop_event
+    assert _publisher_thread is None
+    logging.info("[PUBLISHER] Starting...")
+    _publisher_stop_event.clear()
+    _publisher_thread = threading.Thread(
+        target=_run_publisher, args=(_publisher_stop_event,)
+    )
+    _publisher_thread.start()
+
+
+def stop():
+    """
+    Stops the publisher thread. Pending jobs stay in the database and are processed
+    after the next start.
+    """
+    global _publisher_thread, _publisher_stop_event
+    assert _publisher_thread is not None
+    logging.info("[PUBLISHER] Stopping...")
+    _publisher_stop_event.set()
+    _publisher_thread.join()
+    _publisher_thread = None
@@ -29,7 +29,6 @@ import testsystem.utils as utl
 import testsystem.scheduling as scheduling
 import testsystem.models.test_case_def as tcdef
 
-from collections import defaultdict
 from testsystem.models import (
     TestResult,
     Group,
@@ -37,7 +36,9 @@ from testsystem.models import (
     TestUnit,
     ConnectionInfo,
     TestSet,
+    GroupScore,
 )
+from testsystem.models.group_score import compute_scores
 from testsystem.constants import (
     REPORT_DISABLE_BUILD_OUTPUT,
     REPORT_DISABLE_FLASH_OUTPUT,
@@ -45,6 +46,7 @@ from testsystem.constants import (
     EE_BAD_COMMIT_MESSAGE_URL,
     EE_BAD_COMMIT_MESSAGE_ENABLED,
     EE_BAD_COMMIT_MESSAGES,
+    BREAKER_CLOSED,
 )
 
 
@@ -90,6 +92,8 @@ def create_md_report_for_test_set(test_set: TestSet) -> str:
     commit_hash: str = test_set.commit_hash
     commit_link = conf.get_group_commit_link(group.group_name, commit_hash)
 
+    # Outputs are only loaded for the sections rendered here
+    TestResult.load_texts(test_set.test_results)
     ex_dict = dict()
     for test_result in test_set.test_results:
         tc_def = test_result.tc_def
@@ -196,11 +200,35 @@ def _get_test_unit_section(test_unit: list[TestUnit]) -> str:
         md_status = "OK"
         if not tu.is_available():
             md_status = "Unavailable"
+        elif tu.health.state != BREAKER_CLOSED:
+            md_status = f"Circuit {tu.health.state}"
+        elif tu.health.degraded:
+            md_status = "Degraded"
+        md_status += f"<br/>Health: {int(round(tu.health.score * 100))}%"
         md_table += f"|{md_msp}|{md_pico}|{md_cons}|{md_status}|\n"
 
     return md_table + "\n\n"
 
 
+def _get_test_run_table(test_units: list[TestUnit]) -> str:
+    test_runs = scheduling.get_active_test_runs()
+    predictions = scheduling.predict_completion_times(test_units)
+    md_table = "|Group Number|Commit|Remaining Tests|Expected Completion|\n"
+    md_table += "|---|:---:|---:|---|\n"
+    for test_run in sorted(test_runs, key=lambda tr: tr.test_set.id):
+        group_nr = test_run.test_set.group.group_nr
+        remaining_cnt = len(test_run.tc_defs) - len(test_run.finished_tcs)
+        prediction = predictions.get(test_run.test_set.id, None)
+        if prediction is None:
+            md_prediction = "Unknown"
+        else:
+            md_prediction = utl.to_local_time_str(prediction * 1000)
+        md_table += (
+            f"|{group_nr}|{test_run.commit[0:8]}|{remaining_cnt}|{md_prediction}|\n"
+        )
+    return md_table + "\n\n"
+
+
 def create_md_system_report() -> str:
     conf = cnf.get_config()
     groups = Group.get_by_term(conf.term)
@@ -217,6 +245,10 @@ def create_md_system_report() -> str:
     md_result += f"## Test Units ({len(test_units)})\n\n"
     md_result += _get_test_unit_section(test_units)
 
+    test_run_cnt = len(scheduling.get_active_test_runs())
+    md_result += f"## Test Runs ({test_run_cnt})\n\n"
+    md_result += _get_test_run_table(test_units)
+
     md_result += f"## Groups ({len(groups)})\n\n"
     md_result += _get_group_table(groups, conf)
 
@@ -233,23 +265,17 @@ def _format_result(result: float | None) -> float | int | None:
 
 
 class GroupStats:
-    def __init__(self, group: Group, commit: str | None = None) -> None:
-        if commit is None:
-            self._test_set = group.get_latest_finished_test_set()
-        else:
-            self._test_set = group.get_test_set(commit=commit)
-        self._exercise_results = defaultdict(float)
-        self._total = 0
-        if self._test_set is not None:
-            for result in self._test_set.test_results:
-                tc_def = result.tc_def
-                if tc_def is None:
-                    continue
-                if result.contribute_to_score:
-                    result_value = result.score
-                    self._exercise_results[tc_def.exercise_nr] += result_value
-                    self._total += int(result_value)
+    def __init__(
+        self,
+        group: Group,
+        total: int,
+        exercise_results: dict[int, int],
+        ranking_results: dict[int, float | None],
+    ) -> None:
         self._group = group
+        self._total = total
+        self._exercise_results = exercise_results
+        self._ranking_results = ranking_results
 
     @property
     def total(self) -> int:
@@ -268,15 +294,56 @@ class GroupStats:
         return self._group.group_nr
 
     def get_exercise_result(self, exercise_nr: int) -> int:
-        return int(self._exercise_results[exercise_nr])
+        return int(self._exercise_results.get(exercise_nr, 0))
 
     def get_test_case_result(self, tc_id: int) -> float | int | None:
-        result = None
-        if self._test_set is not None:
-            for test_result in self._test_set.test_results:
-                if test_result.test_case_id == tc_id:
-                    result = test_result.result
-        return _format_result(result)
+        return _format_result(self._ranking_results.get(tc_id))
+
+
+def _get_group_stats(
+    groups: list[Group],
+    group_nr: int | None = None,
+    commit: str | None = None,
+) -> list[GroupStats]:
+    # Scores are materialized when a test set is finished, so no results are scanned
+    group_ids = [g.id for g in groups]
+    scores = GroupScore.get_by_groups(group_ids)
+    if any(g.id not in scores or scores[g.id].is_stale for g in groups):
+        latest = TestSet.get_latest_finished_test_sets(group_ids)
+        outdated = [
+            (group_id, test_set_id, commit_time)
+            for group_id, test_set_id, commit_time in latest
+            if group_id not in scores
+            or scores[group_id].is_stale
+            or scores[group_id].test_set_id != test_set_id
+        ]
+        if len(outdated) > 0:
+            GroupScore.rebuild(outdated)
+            scores = GroupScore.get_by_groups(group_ids)
+
+    stats_array = []
+    for group in groups:
+        score = scores.get(group.id)
+        total, exercise_results, ranking_results = 0, {}, {}
+        if group.group_nr == group_nr and commit is not None:
+            test_set = group.get_test_set(commit=commit)
+            if test_set is not None:
+                total, exercise_results, ranking_results = compute_scores(
+                    [
+                        (r.test_case_id, r.successful, r.result)
+                        for r in test_set.test_results
+                    ]
+                )
+        elif score is not None:
+            total = score.total
+            exercise_results = {
+                int(ex): int(value) for ex, value in score.exercise_results.items()
+            }
+            ranking_results = {
+                int(tc_id): value for tc_id, value in score.ranking_results.items()
+            }
+        stats_array.append(GroupStats(group, total, exercise_results, ranking_results))
+    return stats_array
 
 
 def _create_md_group_stat_table(
@@ -299,13 +366,7 @@ def _create_md_group_stat_table(
     md_result = md_header + "\n" + md_divider + "\n"
 
     # Get stats
-    stats_array = []
-    for group in groups:
-        if group.group_nr == group_nr and commit is not None:
-            stats_array.append(GroupStats(group, commit=commit))
-        else:
-            stats_array.append(GroupStats(group))
-
+    stats_array = _get_group_stats(groups, group_nr, commit)
     stats_array.sort(key=lambda x: x.total, reverse=True)
 
     # Create table rows
@@ -29,30 +29,82 @@ import random
 import numpy as np
 import testsystem.config as cnf
 import testsystem.filesystem as fs
-import testsystem.reporting as reporting
+import testsystem.impact as impact
+import testsystem.shared_queue as shared_queue
+import testsystem.publisher as publisher
 import testsystem.models.test_set as testset
 import testsystem.models.task_worker as task_worker
+import testsystem.models.test_unit as test_unit
 
-
-from testsystem.models import Task, Group, TestCaseDef, TestCase, TestSet, TestCaseTask
+from typing import Callable, TypeVar
+from testsystem.models import (
+    Task,
+    Group,
+    TestCaseDef,
+    TestCase,
+    TestSet,
+    TestCaseTask,
+    TestCaseRuntime,
+    GroupShare,
+    QueuedTask,
+)
 from testsystem.exceptions import MSPConnectionError, GitError, ProcessError
 from testsystem.constants import (
     SCHEDULER_PAUSE_S,
     TUTAG_SCOPE,
     LEGACY_TASK_PRIO,
     FORCE_TEST_TAG_PRIO,
+    SHARED_QUEUE_CLAIM_RETRIES,
 )
 
+_T = TypeVar("_T", Task, QueuedTask)
+
 _scheduled_tasks: list[Task] = []
 _scheduled_tasks_lock = threading.Lock()
+_priority_band_width = 0.0
+
+# Tasks assigned to a worker. An entry is removed when the worker requests a new task.
+_running_tasks: dict[task_worker.TaskWorker, Task | QueuedTask] = {}
+_scope_workers: set[task_worker.TaskWorker] = set()
+# Workers claiming a task from the shared queue without holding the lock
+_claiming_workers: set[task_worker.TaskWorker] = set()
+
+_active_test_runs: dict[int, TestRun] = {}
+_active_test_runs_lock = threading.Lock()
+_shared_test_run_lock = threading.Lock()
 
 _schedule_stop_event = threading.Event()
 _scheduling_thread: threading.Thread | None = None
 
 _last_prio_reset_timestamp = 0
 
+# Group id -> (commit hash, first seen timestamp, last change timestamp)
+_pending_commits: dict[int, tuple[str, float, float]] = {}
+
 _poll_interval_s: int | None = None
 
+# Time source for scheduling decisions. This is replaced for simulations.
+_clock: Callable[[], float] | None = None
+
+
+def set_clock(clock: Callable[[], float] | None):
+    """
+    Set the time source used for scheduling decisions, e.g. a virtual clock for
+    simulations.
+
+    :param clock: Function returning the current time in seconds, or ``None`` to use
+        the system time.
+    """
+    global _clock
+    _clock = clock
+
+
+def _now() -> float:
+    global _clock
+    if _clock is None:
+        return time.time()
+    return _clock()
+
 
 def poll_interval() -> int | None:
     global _poll_interval_s
@@ -63,12 +115,23 @@ class TestRun:
     __test__ = False
 
     def __init__(
-        self, tc_defs: list[TestCaseDef], test_set: TestSet, test_env: fs.TestEnv
+        self,
+        tc_defs: list[TestCaseDef],
+        test_set: TestSet,
+        test_env: fs.TestEnv,
+        tagged: bool = False,
     ):
         self.tc_defs = tc_defs
         self.test_set = test_set
         self.test_env = test_env
+        self.tagged = tagged
+        self.tasks: list[TestCaseTask] = []
         self.finished_tcs: list[TestCase] = []
+        self.cancelled_cnt = 0
+        # Number of tasks from the shared queue this instance executes for this run
+        self.in_flight = 0
+        self.superseded = False
+        self.completed = False
         self.lock = threading.Lock()
 
     @property
@@ -89,26 +152,96 @@ class TestRun:
         if priority is None:
             priority = self.test_set.group.get_priority()
         assert priority is not None
-        tasks = []
-        for tc_def in self.tc_defs:
-            tu_tag = None
-            if tc_def.timing:
-                tu_tag = TUTAG_SCOPE
-            task = TestCaseTask(
-                self.test_set.group,
-                priority,
-                tc_def,
-                self.test_env,
-                test_unit_tag=tu_tag,
-                callback=self.test_finished,
-                error_callback=self.test_failed,
+        tasks = [self._create_task(tc, priority) for tc in self.tc_defs]
+        self.tasks = tasks
+        return list(tasks)
+
+    def _create_task(self, tc_def: TestCaseDef, priority: float) -> TestCaseTask:
+        tu_tag = None
+        if tc_def.timing:
+            tu_tag = TUTAG_SCOPE
+        task = TestCaseTask(
+            self.test_set.group,
+            priority,
+            tc_def,
+            self.test_env,
+            test_unit_tag=tu_tag,
+            callback=self.test_finished,
+            error_callback=self.test_failed,
+        )
+        task.expected_runtime = TestCaseRuntime.get_expected_runtime(tc_def)
+        return task
+
+    def supersede(self) -> bool:
+        """
+        Cancel this test run in favour of a newer commit. All queued tasks of this run
+        are removed from the queue. Tasks already running are waited for, and their
+        results are dropped. As soon as no task of this run is running anymore, the test
+        environment is cleaned up and the test set is deleted. With the shared task
+        queue, only tasks running on this instance are waited for.
+
+        :returns: Returns ``True`` if the test run was superseded, or ``False`` if it
+            already completed.
+        """
+        with self.lock:
+            if self.completed or self.superseded:
+                return False
+            self.superseded = True
+        if shared_queue.enabled():
+            cancelled_cnt = QueuedTask.remove_test_set(self.test_set.id)
+        else:
+            cancelled_cnt = unschedule_tasks(self.tasks)
+        logging.info(
+            f"Superseded test run for group {self.group_name} cancelled"
+            f" {cancelled_cnt} queued tasks (Commit={self.commit[0:8]})."
+        )
+        with self.lock:
+            self.cancelled_cnt += cancelled_cnt
+            if self.__is_done():
+                self.__discard()
+        return True
+
+    def __is_done(self) -> bool:
+        if shared_queue.enabled():
+            return self.in_flight == 0
+        return len(self.finished_tcs) + self.cancelled_cnt >= len(self.tasks)
+
+    def __discard(self):
+        _unregister_test_run(self)
+        try:
+            self.test_set.delete()
+        except Exception as ex:
+            logging.error(
+                f"Deleting superseded test set for group {self.group_name} and commit"
+                f" {self.commit[0:8]} failed. {ex}"
             )
-            tasks.append(task)
-        return tasks
+        finally:
+            self.test_env.cleanup()
 
-    def task_finished(self, test_case: TestCase):
+    def task_finished(self, test_case: TestCase, queue_id: int | None = None):
+        if queue_id is not None:
+            self.__shared_task_finished(test_case, queue_id)
+            return
         with self.lock:
+            if self.superseded:
+                # Results of superseded test runs are dropped.
+                self.cancelled_cnt += 1
+                if self.__is_done():
+                    self.__discard()
+                return
+            tc_id = test_case.definition.id
+            if tc_id in [tc.definition.id for tc in self.finished_tcs]:
+                # The first result of a speculatively duplicated task is kept
+                self.cancelled_cnt += 1
+                logging.info(
+                    f"Dropped duplicate result of test case {test_case.definition.name}"
+                    f" for group {self.group_name} (Commit={self.commit[0:8]})."
+                )
+                return
             self.finished_tcs.append(test_case)
+            duplicates = [t for t in self.tasks if t.test_case_def.id == tc_id]
+            if len(duplicates) > 1:
+                self.cancelled_cnt += unschedule_tasks(duplicates)
             tc_finished_cnt = len(self.finished_tcs)
             logging.info(
                 f"Test run for group {self.group_name} completed {tc_finished_cnt} out"
@@ -116,10 +249,96 @@ class TestRun:
             )
             test_case.timestamp = int(time.time() * 1000)
             self.test_set = testset.add_result(self.test_set, test_case.result)
+            completed = tc_finished_cnt == len(self.tc_defs)
+            self.completed = completed
+
+        if completed:
+            self.__test_run_finished()
+
+    def __shared_task_finished(self, test_case: TestCase, queue_id: int):
+        test_case.timestamp = int(time.time() * 1000)
+        with self.lock:
+            self.in_flight -= 1
+            stored = not self.superseded and QueuedTask.complete(
+                queue_id, shared_queue.node_name(), self.test_set.id, test_case.result
+            )
+            shared_queue.remove_claim(queue_id)
+            if not stored:
+                # The test run was superseded or the lease expired
+                self.cancelled_cnt += 1
+                logging.info(
+                    f"Dropped result of test case {test_case.definition.name} for group"
+                    f" {self.group_name} (Commit={self.commit[0:8]})."
+                )
+                if self.superseded and self.__is_done():
+                    self.__discard()
+                return
+            self.finished_tcs.append(test_case)
+            logging.info(
+                f"Test run for group {self.group_name} completed test case"
+                f" {test_case.definition.name} (Commit={self.commit[0:8]})."
+            )
+            # Results buffered by this instance must be stored before any instance
+            # can finish the test set.
+            testset.flush_results(self.test_set.id)
+            completed = (
+                QueuedTask.count(self.test_set.id) == 0
+                and self.test_set.try_set_finished()
+            )
+            self.completed = completed
 
-        if tc_finished_cnt == len(self.tc_defs):
+        if completed:
+            test_set = TestSet.get_by_id(self.test_set.id)
+            assert test_set is not None
+            self.test_set = test_set
             self.__test_run_finished()
 
+    def __shared_task_failed(self, test_case_task: TestCaseTask):
+        assert test_case_task.queue_id is not None
+        QueuedTask.release(
+            test_case_task.queue_id,
+            shared_queue.node_name(),
+            priority=test_case_task.priority,
+        )
+        shared_queue.remove_claim(test_case_task.queue_id)
+        with self.lock:
+            self.in_flight -= 1
+            if self.superseded and self.__is_done():
+                self.__discard()
+
+    def speculate(self, task: TestCaseTask) -> TestCaseTask | None:
+        """
+        Create a speculative duplicate of a straggling task of this test run. The
+        duplicate never runs on the test unit of the original task. The first result of
+        the original and the duplicate is used, the other one is dropped.
+
+        :param task: The straggling task.
+
+        :returns: The duplicate or ``None`` if the test case already has a result.
+        """
+        with self.lock:
+            if self.superseded or self.completed:
+                return None
+            tc_id = task.test_case_def.id
+            if tc_id in [tc.definition.id for tc in self.finished_tcs]:
+                return None
+            duplicate = self._create_task(task.test_case_def, task.priority)
+            duplicate.excluded_test_units = list(task.excluded_test_units)
+            if task.test_unit is not None:
+                duplicate.excluded_test_units.append(task.test_unit)
+            self.tasks.append(duplicate)
+        return duplicate
+
+    def finish(self):
+        """
+        Finish this test run without waiting for tasks. This is used if all results of
+        the test run are already available.
+        """
+        assert len(self.finished_tcs) == 0
+        with self.lock:
+            self.completed = True
+        self.__test_run_finished()
+
     def test_finished(self, test_case_task: TestCaseTask):
         tc = test_case_task.test_case
         success_status = "SUCCESS"
@@ -129,12 +348,75 @@ class TestRun:
             f"Test case {tc.definition.name} for group {tc.group_name} finished after"
             f" {np.round(test_case_task.runtime, 3)}s. Status: {success_status}"
         )
-        self.task_finished(tc)
+        self.task_finished(tc, test_case_task.queue_id)
+        TestCaseRuntime.add_sample(
+            test_case_task.test_case_def.id, test_case_task.runtime
+        )
 
     def test_failed(self, test_case_task: TestCaseTask, err: Exception):
         test_case_task.test_unit.msp430.set_defective()  # type: ignore
         test_case_task.priority = 9
         tc = test_case_task.test_case
+        max_attempts = cnf.get_config().task_max_attempts
+        if max_attempts > 0 and test_case_task.attempts >= max_attempts:
+            logging.error(
+                (
+                    f"Test case {tc.definition.name} for group {tc.group_name} failed"
+                    f" {test_case_task.attempts} times. Give up {test_case_task}."
+                ),
+                exc_info=err,
+            )
+            tc.successful = False
+            tc.result.output = (
+                f"Infrastructure error after {test_case_task.attempts} attempts. The"
+                f" test system failed to execute this test case: {err}"
+            )
+            self.task_finished(tc, test_case_task.queue_id)
+            return
+        if test_case_task.queue_id is not None:
+            self.__shared_task_failed(test_case_task)
+            logging.error(
+                (
+                    f"Test case {tc.definition.name} for group {tc.group_name} failed"
+                    f" after {np.round(test_case_task.runtime, 3)}s. Return"
+                    f" {test_case_task} to the shared queue."
+                ),
+                exc_info=err,
+            )
+            return
+        with self.lock:
+            superseded = self.superseded
+            tc_id = test_case_task.test_case_def.id
+            # A speculative duplicate of the task may have delivered the result already
+            obsolete = not superseded and (
+                self.completed
+                or tc_id in [tc.definition.id for tc in self.finished_tcs]
+            )
+            if obsolete:
+                self.cancelled_cnt += 1
+            elif not superseded:
+                schedule_task(test_case_task)
+        if obsolete:
+            logging.error(
+                (
+                    f"Test case {tc.definition.name} for group {tc.group_name} failed"
+                    f" after {np.round(test_case_task.runtime, 3)}s. The test case"
+                    " already has a result and the task is not rescheduled."
+                ),
+                exc_info=err,
+            )
+            return
+        if superseded:
+            logging.error(
+                (
+                    f"Test case {tc.definition.name} for group {tc.group_name} failed"
+                    f" after {np.round(test_case_task.runtime, 3)}s. Test run is"
+                    " superseded and the task is not rescheduled."
+                ),
+                exc_info=err,
+            )
+            self.task_finished(tc)
+            return
         logging.error(
             (
                 f"Test case {tc.definition.name} for group {tc.group_name} failed after"
@@ -142,16 +424,12 @@ class TestRun:
             ),
             exc_info=err,
         )
-        schedule_task(test_case_task)
 
     def __test_run_finished(self):
+        # Reports are published by the publisher thread, so the worker is free again
         try:
-            self.test_set.set_finished()
-            md_test_report = reporting.create_md_report_for_test_set(self.test_set)
-            md_group_report = reporting.create_md_group_report(test_set=self.test_set)
-            fs.publish_test_run_report(self.group_name, self.commit, md_test_report)
-            fs.publish_group_report(self.group_name, self.commit, md_group_report)
-            fs.publish_system_status_report(reporting.create_md_system_report())
+            testset.flush_results(self.test_set.id)
+            publisher.submit(self.test_set)
         except Exception as ex:
             logging.error(
                 f"Finishing test run for group {self.group_name} and commit"
@@ -160,13 +438,210 @@ class TestRun:
             # Delete test set to restart a test run for this commit
             self.test_set.delete()
         finally:
+            _unregister_test_run(self)
             self.test_env.cleanup()
 
 
+def _register_test_run(test_run: TestRun):
+    global _active_test_runs, _active_test_runs_lock
+    with _active_test_runs_lock:
+        _active_test_runs[test_run.test_set.id] = test_run
+    GroupShare.activate(test_run.test_set.group_id)
+
+
+def _unregister_test_run(test_run: TestRun):
+    global _active_test_runs, _active_test_runs_lock
+    with _active_test_runs_lock:
+        if _active_test_runs.get(test_run.test_set.id) is not test_run:
+            return
+        del _active_test_runs[test_run.test_set.id]
+    GroupShare.deactivate(test_run.test_set.group_id)
+
+
+def _get_active_test_run(test_set_id: int) -> TestRun | None:
+    global _active_test_runs, _active_test_runs_lock
+    with _active_test_runs_lock:
+        return _active_test_runs.get(test_set_id, None)
+
+
+def get_active_test_runs() -> list[TestRun]:
+    """
+    Get all test runs, which are currently in progress.
+
+    :returns: List of active test runs.
+    """
+    global _active_test_runs, _active_test_runs_lock
+    with _active_test_runs_lock:
+        return list(_active_test_runs.values())
+
+
+def predict_completion_times(
+    test_units: list[test_unit.TestUnit],
+) -> dict[int, float | None]:
+    """
+    Predict when the active test runs will be completed. The prediction simulates the
+    assignment of running and queued tasks to the available test units based on the
+    expected runtime of each task.
+
+    :param test_units: The test units executing tasks.
+
+    :returns: A dictionary with test set ids as keys and the predicted completion
+        timestamps in seconds as values. The value is ``None`` if a test run has queued
+        tasks, which cannot be executed by any available test unit.
+    """
+    global _scheduled_tasks, _scheduled_tasks_lock
+    timestamp = _now()
+    units = [tu for tu in test_units if tu.is_available()]
+    free_at = [timestamp] * len(units)
+    test_runs = get_active_test_runs()
+    run_by_task: dict[int, TestRun] = {}
+    completion: dict[int, float | None] = {}
+    for test_run in test_runs:
+        completion[test_run.test_set.id] = timestamp
+        for task in test_run.tasks:
+            run_by_task[id(task)] = test_run
+            if task.start_time <= 0 or task.finish_time > 0:
+                continue
+            end = max(task.start_time + task.expected_runtime, timestamp)
+            for i, unit in enumerate(units):
+                if unit is task.test_unit:
+                    free_at[i] = max(free_at[i], end)
+            completion[test_run.test_set.id] = max(
+                completion[test_run.test_set.id], end
+            )
+
+    with _scheduled_tasks_lock:
+        queued_tasks = list(_scheduled_tasks)
+    for task in queued_tasks:
+        if id(task) not in run_by_task:
+            continue
+        test_set_id = run_by_task[id(task)].test_set.id
+        candidates = []
+        for i, unit in enumerate(units):
+            if unit in task.excluded_test_units:
+                continue
+            if task.use_specific_test_unit:
+                if task.specific_test_unit is unit:
+                    candidates.append(i)
+            elif unit.has_tag(task.test_unit_tag):
+                candidates.append(i)
+        if len(candidates) == 0:
+            completion[test_set_id] = None
+            continue
+        i = min(candidates, key=lambda c: free_at[c])
+        free_at[i] += task.expected_runtime
+        if completion[test_set_id] is not None:
+            completion[test_set_id] = max(completion[test_set_id], free_at[i])
+    return completion
+
+
+def _get_shared_test_run(test_set_id: int) -> TestRun | None:
+    """
+    Get the test run for a task from the shared queue. If the test run was started by
+    another test system instance, the test environment is set up on this instance.
+
+    :param test_set_id: The test set of the task.
+
+    :returns: The test run or ``None`` if the test set is finished or doesn't exist.
+    """
+    global _shared_test_run_lock
+    with _shared_test_run_lock:
+        test_run = _get_active_test_run(test_set_id)
+        if test_run is not None:
+            return test_run
+        test_set = TestSet.get_by_id(test_set_id)
+        if test_set is None or test_set.finished:
+            return None
+        group: Group = test_set.group
+        fs.load_group(group.group_name)
+        test_env = fs.setup_test_env(group.group_name, test_set.commit_hash)
+        assert test_env.commit_hash == test_set.commit_hash
+        logging.info(
+            f"Join test run for group {group.group_name} and commit"
+            f" {test_set.commit_hash[0:8]}."
+        )
+        test_run = TestRun([], test_set, test_env)
+        _register_test_run(test_run)
+        return test_run
+
+
+def _release_idle_test_runs():
+    """
+    Clean up test runs, which have no tasks left in the shared queue and no tasks
+    running on this instance. The test run is finished by the instance executing its
+    last task.
+    """
+    for test_run in get_active_test_runs():
+        with test_run.lock:
+            idle = test_run.in_flight == 0
+            idle = idle and not test_run.completed and not test_run.superseded
+        if not idle or QueuedTask.count(test_run.test_set.id) > 0:
+            continue
+        logging.debug(
+            f"Release test run for group {test_run.group_name} and commit"
+            f" {test_run.commit[0:8]}."
+        )
+        _unregister_test_run(test_run)
+        test_run.test_env.cleanup()
+
+
+def get_running_tasks() -> list[tuple[task_worker.TaskWorker, Task]]:
+    """
+    Get the tasks currently executed by the workers of this test system instance.
+
+    :returns: List of workers and the task they are running.
+    """
+    global _scheduled_tasks_lock, _running_tasks
+    with _scheduled_tasks_lock:
+        return [
+            (worker, task)
+            for worker, task in _running_tasks.items()
+            if isinstance(task, Task) and task.start_time > 0 and task.finish_time == 0
+        ]
+
+
+def speculate(task: Task) -> Task | None:
+    """
+    Schedule a speculative duplicate of a straggling test case task (see
+    :py:meth:`TestRun.speculate`). Tasks from the shared queue are not duplicated,
+    because their leases already protect against lost test system instances.
+
+    :param task: The straggling task.
+
+    :returns: The scheduled duplicate or ``None`` if no duplicate was scheduled.
+    """
+    if task.queue_id is not None:
+        return None
+    for test_run in get_active_test_runs():
+        if any(t is task for t in test_run.tasks):
+            assert isinstance(task, TestCaseTask)
+            duplicate = test_run.speculate(task)
+            if duplicate is not None:
+                schedule_task(duplicate)
+            return duplicate
+    return None
+
+
+def _get_supersedable_test_runs(group: Group) -> list[TestRun]:
+    """
+    Get all active test runs of a group, which can be superseded by a newer commit.
+    Test runs for tagged commits are never superseded.
+    """
+    global _active_test_runs, _active_test_runs_lock
+    with _active_test_runs_lock:
+        return [
+            tr
+            for tr in _active_test_runs.values()
+            if tr.test_set.group_id == group.id and not tr.tagged and not tr.completed
+        ]
+
+
 def _handle_priority_reset(groups: list[Group]):
     global _last_prio_reset_timestamp
     config = cnf.get_config()
-    timestamp = time.time()
+    if config.scheduling_policy != "queue_time":
+        return
+    timestamp = _now()
     last_reset_delta = timestamp - _last_prio_reset_timestamp
     prio_valid_s = config.prio_reset_h * 3600
     if last_reset_delta >= prio_valid_s:
@@ -179,6 +654,9 @@ def _handle_priority_reset(groups: list[Group]):
             )
             for task in _scheduled_tasks:
                 task.priority = LEGACY_TASK_PRIO
+            _scheduled_tasks.sort(key=_task_order_key)
+        if shared_queue.enabled():
+            QueuedTask.set_priority(LEGACY_TASK_PRIO)
         _last_prio_reset_timestamp = timestamp
         logging.info(f"Reset group priorities to default.")
         for group in groups:
@@ -187,7 +665,11 @@ def _handle_priority_reset(groups: list[Group]):
 
 
 def _setup_tasks(
-    group: Group, commit: str, tc_defs: list[TestCaseDef], priority: float | None = None
+    group: Group,
+    commit: str,
+    tc_defs: list[TestCaseDef],
+    priority: float | None = None,
+    tagged: bool = False,
 ) -> list[Task]:
     test_env = fs.setup_test_env(group.group_name, commit)
     assert test_env.commit_hash == commit
@@ -195,51 +677,230 @@ def _setup_tasks(
         f"Setup test case tasks for group {group.group_name} and commit {commit[0:8]}."
     )
     test_set = TestSet.get_or_create(group.id, test_env.commit_hash)
-    test_set.update(test_env.commit_time, test_env.commit_msg)
-    test_run = TestRun(tc_defs, test_set, test_env)
-    return test_run.get_tasks(priority)
+    test_set.update(
+        test_env.commit_time,
+        test_env.commit_msg,
+        test_env.public_commit_hash,
+        test_env.tc_version,
+    )
+    tc_defs, inherited_results = impact.select_test_cases(
+        group, test_env, tc_defs, full_run=tagged
+    )
+    for result in inherited_results:
+        test_set = testset.add_result(test_set, result)
+    if shared_queue.enabled():
+        # Another instance may finish the test set
+        testset.flush_results(test_set.id)
+    test_run = TestRun(tc_defs, test_set, test_env, tagged=tagged)
+    if len(tc_defs) == 0:
+        test_run.finish()
+        return []
+    tasks = test_run.get_tasks(priority)
+    _register_test_run(test_run)
+    return tasks
+
+
+def _is_commit_settled(group: Group, commit: str) -> bool:
+    """
+    Debounce new commits of a group. A commit is settled if the branch head did not
+    change for :py:attr:`~testsystem.config.Config.commit_debounce_s` seconds or if the
+    first pending commit was detected more than
+    :py:attr:`~testsystem.config.Config.commit_debounce_max_s` seconds ago.
+
+    :param group: The group to check.
+    :param commit: The current head commit of the group.
+
+    :returns: Returns ``True`` if the commit can be scheduled.
+    """
+    global _pending_commits
+    conf = cnf.get_config()
+    if conf.commit_debounce_s <= 0:
+        return True
+    timestamp = _now()
+    pending = _pending_commits.get(group.id, None)
+    if pending is None:
+        first_seen, last_change = timestamp, timestamp
+    elif pending[0] != commit:
+        first_seen, last_change = pending[1], timestamp
+    else:
+        first_seen, last_change = pending[1], pending[2]
+    quiet = timestamp - last_change >= conf.commit_debounce_s
+    overdue = (
+        conf.commit_debounce_max_s > 0
+        and timestamp - first_seen >= conf.commit_debounce_max_s
+    )
+    if quiet or overdue:
+        _pending_commits.pop(group.id, None)
+        return True
+    _pending_commits[group.id] = (commit, first_seen, last_change)
+    return False
+
 
+class _PollingPass:
+    """
+    State of all groups for one polling pass of the scheduler. The group repositories
+    are loaded first, and the latest test sets and the test sets of all candidate
+    commits are then queried at once, so the number of database queries per pass does
+    not depend on the number of groups.
+    """
+
+    def __init__(self, groups: list[Group], tags: list[str]):
+        self.heads: dict[int, str] = {}
+        self.tagged_commits: dict[int, list[str]] = {}
+        for group in groups:
+            try:
+                fs.load_group(group.group_name)
+                head = fs.get_latest_commit(group.group_name)
+                tagged_commits = fs.get_tagged_group_commit(group.group_name, tags)
+            except GitError as ex:
+                logging.warning(
+                    f"Failed to load new tasks for group {group.group_name}. {ex.msg}"
+                )
+                continue
+            self.heads[group.id] = head
+            self.tagged_commits[group.id] = tagged_commits
+        group_ids = list(self.heads.keys())
+        self.latest_test_sets = TestSet.get_latest_test_sets(group_ids)
+        candidates = [
+            (id, commit)
+            for id in group_ids
+            for commit in dict.fromkeys([self.heads[id]] + self.tagged_commits[id])
+        ]
+        self.tested_commits = TestSet.get_existing_commits(candidates)
 
-def _check_group_for_new_tasks(group: Group, tc_defs: list[TestCaseDef]) -> list[Task]:
+    def is_loaded(self, group: Group) -> bool:
+        return group.id in self.heads
+
+    def is_tested(self, group: Group, commit: str) -> bool:
+        return (group.id, commit) in self.tested_commits
+
+    def set_tested(self, group: Group, commit: str):
+        self.tested_commits.add((group.id, commit))
+
+
+def _check_group_for_new_tasks(
+    group: Group, tc_defs: list[TestCaseDef], polling_pass: _PollingPass
+) -> list[Task]:
     group_name = group.group_name
     try:
-        fs.load_group(group_name)
-        latest_test_set = group.get_latest_test_set()
+        latest_test_set = polling_pass.latest_test_sets.get(group.id, None)
         latest_commit = None
+        superseded_runs: list[TestRun] = []
         if latest_test_set is not None:
             if not latest_test_set.finished:
-                return []
+                if not cnf.get_config().supersede_test_runs:
+                    return []
+                superseded_runs = _get_supersedable_test_runs(group)
+                if latest_test_set.id not in [tr.test_set.id for tr in superseded_runs]:
+                    return []
             latest_commit = latest_test_set.commit_hash
-        next_commit = fs.get_latest_commit(group_name)
-        if next_commit != latest_commit and not TestSet.exists(group.id, next_commit):
+        next_commit = polling_pass.heads[group.id]
+        if next_commit != latest_commit and not polling_pass.is_tested(
+            group, next_commit
+        ):
+            tagged = next_commit in polling_pass.tagged_commits[group.id]
+            if not tagged and not _is_commit_settled(group, next_commit):
+                logging.debug(
+                    f"Wait for branch of group {group_name} to settle at commit"
+                    f" {next_commit[0:8]}."
+                )
+                return []
+            _pending_commits.pop(group.id, None)
             lc_hash = "None" if latest_commit is None else latest_commit[0:8]
             logging.info(
                 f"Found new commit {next_commit[0:8]} for group {group_name}. Latest"
                 f" tested commit is {lc_hash}."
             )
-            return _setup_tasks(group, next_commit, tc_defs)
+            for test_run in superseded_runs:
+                test_run.supersede()
+            polling_pass.set_tested(group, next_commit)
+            return _setup_tasks(group, next_commit, tc_defs, tagged=tagged)
+        _pending_commits.pop(group.id, None)
     except GitError as ex:
         logging.warning(f"Failed to load new tasks for group {group_name}. {ex.msg}")
     return []
 
 
+def _resume_test_run(test_set: TestSet, tc_defs: list[TestCaseDef]) -> list[Task]:
+    group: Group = test_set.group
+    commit = test_set.commit_hash
+    fs.load_group(group.group_name)
+    tags = cnf.get_config().force_test_tags
+    tagged = commit in fs.get_tagged_group_commit(group.group_name, tags)
+    test_env = fs.setup_test_env(group.group_name, commit)
+    assert test_env.commit_hash == commit
+    finished_tc_ids = set([r.test_case_id for r in test_set.test_results])
+    tc_defs = [tc_def for tc_def in tc_defs if tc_def.id not in finished_tc_ids]
+    logging.info(
+        f"Resume test run for group {group.group_name} and commit {commit[0:8]}."
+        f" {len(tc_defs)} test cases are missing."
+    )
+    test_run = TestRun(tc_defs, test_set, test_env, tagged=tagged)
+    if len(tc_defs) == 0:
+        test_run.finish()
+        return []
+    priority = FORCE_TEST_TAG_PRIO if tagged else None
+    tasks = test_run.get_tasks(priority)
+    _register_test_run(test_run)
+    return tasks
+
+
+def resume_unfinished_test_runs() -> int:
+    """
+    Resume test runs of unfinished test sets, e.g. after a restart of the test system.
+    Only test cases without a result in the test set are scheduled again. Tasks of
+    tagged commits get the force test tag priority, all other tasks get the current
+    group priority. Test sets which can't be resumed are deleted. This should only be
+    used during start-up.
+
+    With the shared task queue, test sets with queued tasks are skipped, because they
+    are still executed by the test system instances. This is used by the leader.
+
+    :returns: The number of scheduled tasks.
+    """
+    tc_defs = TestCaseDef.get()
+    task_cnt = 0
+    for test_set in TestSet.get_unfinished_test_sets():
+        if shared_queue.enabled() and (
+            _get_active_test_run(test_set.id) is not None
+            or QueuedTask.count(test_set.id) > 0
+        ):
+            continue
+        try:
+            tasks = _resume_test_run(test_set, tc_defs)
+        except Exception as ex:
+            logging.error(
+                f"Resuming test run for commit {test_set.commit_hash[0:8]} failed."
+                f" Delete test set. {ex}"
+            )
+            test_set.delete()
+            continue
+        _schedule_tasks(tasks)
+        task_cnt += len(tasks)
+    logging.info(f"[SCHEDULER] Resumed test runs with {task_cnt} tasks.")
+    return task_cnt
+
+
 def _check_group_for_forced_tasks(
-    group: Group, tc_defs: list[TestCaseDef], tags: list[str]
+    group: Group, tc_defs: list[TestCaseDef], polling_pass: _PollingPass
 ) -> list[Task]:
     group_name = group.group_name
     tasks: list[Task] = []
     try:
-        fs.load_group(group_name)
-        tagged_commits = fs.get_tagged_group_commit(group_name, tags)
-        for tagged_commit in tagged_commits:
-            if not TestSet.exists(group.id, tagged_commit):
+        for tagged_commit in polling_pass.tagged_commits[group.id]:
+            if not polling_pass.is_tested(group, tagged_commit):
                 logging.info(
                     f"Found untested tagged commit {tagged_commit[0:8]} for group"
                     f" {group_name}."
                 )
+                polling_pass.set_tested(group, tagged_commit)
                 tasks.extend(
                     _setup_tasks(
-                        group, tagged_commit, tc_defs, priority=FORCE_TEST_TAG_PRIO
+                        group,
+                        tagged_commit,
+                        tc_defs,
+                        priority=FORCE_TEST_TAG_PRIO,
+                        tagged=True,
                     )
                 )
     except GitError as ex:
@@ -249,10 +910,22 @@ def _check_group_for_forced_tasks(
 
 def _run_scheduling(stop_event: threading.Event):
     logging.info("[SCHEDULER] Started successful.")
+    leader = False
     while not stop_event.is_set():
         try:
             start_time = time.time()
             conf = cnf.get_config()
+            if shared_queue.enabled():
+                _release_idle_test_runs()
+                if not shared_queue.is_leader():
+                    leader = False
+                    time.sleep(SCHEDULER_PAUSE_S)
+                    continue
+                if not leader:
+                    # Take over test runs of a previous leader
+                    leader = True
+                    if conf.resume_test_runs:
+                        resume_unfinished_test_runs()
             groups = Group.get_by_term(conf.term)
             _handle_priority_reset(groups)
             tc_defs = TestCaseDef.get()
@@ -262,15 +935,16 @@ def _run_scheduling(stop_event: threading.Event):
                 logging.error(f"Loading public repo failed. {ex.msg}")
                 break
             random.shuffle(groups)
+            polling_pass = _PollingPass(groups, conf.force_test_tags)
             for group in groups:
-                tasks = _check_group_for_new_tasks(group, tc_defs)
+                if not polling_pass.is_loaded(group):
+                    continue
+                tasks = _check_group_for_new_tasks(group, tc_defs, polling_pass)
                 tasks.extend(
-                    _check_group_for_forced_tasks(group, tc_defs, conf.force_test_tags)
+                    _check_group_for_forced_tasks(group, tc_defs, polling_pass)
                 )
                 if len(tasks) > 0:
-                    task_cnt = 0
-                    for t in tasks:
-                        task_cnt = schedule_task(t)
+                    task_cnt = _schedule_tasks(tasks)
                     logging.info(
                         f"[SCHEDULER] Added {len(tasks)} new tasks for"
                         f" {group.group_name}. There are currently {task_cnt} tasks"
@@ -314,26 +988,47 @@ def stop():
     _scheduling_thread.join()
 
 
+def _task_order_key(task: Task) -> tuple[float, float, float]:
+    global _priority_band_width
+    if _priority_band_width <= 0:
+        return (task.priority, 0.0, 0.0)
+    band = np.floor(task.priority / _priority_band_width)
+    return (band, task.expected_runtime, task.priority)
+
+
+def _update_band_width(band_width: float):
+    global _scheduled_tasks, _priority_band_width
+    if band_width != _priority_band_width:
+        _priority_band_width = band_width
+        _scheduled_tasks.sort(key=_task_order_key)
+
+
 def schedule_task(task: Task) -> int:
     """
-    Add a new task the the queue.
+    Add a new task the the queue. Tasks are ordered by priority band, by expected
+    runtime within a band (shortest expected job first) and finally by priority. Tasks
+    with equal keys keep their insertion order.
 
     :param task: The task to schedule.
 
     :returns: Returns the current new size of the queue.
     """
     global _scheduled_tasks, _scheduled_tasks_lock
+    band_width = cnf.get_config().priority_band_width
     with _scheduled_tasks_lock:
-        task.schedule_time = time.time()
+        _update_band_width(band_width)
+        task.schedule_time = _now()
+        task_key = _task_order_key(task)
         added = False
         for i in range(len(_scheduled_tasks)):
-            if _scheduled_tasks[i].priority > task.priority:
+            queued_key = _task_order_key(_scheduled_tasks[i])
+            if queued_key > task_key:
                 _scheduled_tasks.insert(i, task)
                 added = True
                 break
             else:
                 assert (
-                    _scheduled_tasks[i].priority <= task.priority
+                    queued_key <= task_key
                 ), "Scheduled tasks list must be ordered at any time."
         if not added:
             _scheduled_tasks.append(task)
@@ -342,50 +1037,254 @@ def schedule_task(task: Task) -> int:
     return queue_len
 
 
+def _schedule_tasks(tasks: list[Task]) -> int:
+    """
+    Add the tasks of active test runs to the queue. With the shared task queue, the
+    tasks are added to the database in a single transaction.
+
+    :param tasks: The tasks to schedule.
+
+    :returns: Returns the current new size of the queue.
+    """
+    if not shared_queue.enabled():
+        queue_len = queue_size()
+        for task in tasks:
+            queue_len = schedule_task(task)
+        return queue_len
+    task_ids = set([id(t) for t in tasks])
+    timestamp = _now()
+    queued_tasks = []
+    for test_run in get_active_test_runs():
+        for task in test_run.tasks:
+            if id(task) not in task_ids:
+                continue
+            assert isinstance(task, TestCaseTask)
+            queued_tasks.append(
+                QueuedTask(
+                    test_set_id=test_run.test_set.id,
+                    test_case_id=task.test_case_def.id,
+                    priority=task.priority,
+                    expected_runtime=task.expected_runtime,
+                    test_unit_tag=task.test_unit_tag,
+                    schedule_time=timestamp,
+                )
+            )
+    return QueuedTask.enqueue(queued_tasks)
+
+
+def unschedule_tasks(tasks: list[Task]) -> int:
+    """
+    Remove tasks from the queue. Tasks which are not queued anymore are ignored.
+
+    :param tasks: The tasks to remove.
+
+    :returns: Returns the number of tasks actually removed from the queue.
+    """
+    global _scheduled_tasks, _scheduled_tasks_lock
+    with _scheduled_tasks_lock:
+        queue_len = len(_scheduled_tasks)
+        _scheduled_tasks[:] = [t for t in _scheduled_tasks if t not in tasks]
+        removed_cnt = queue_len - len(_scheduled_tasks)
+    logging.debug(f"Removed {removed_cnt} tasks from queue.")
+    return removed_cnt
+
+
+def _may_run_general_task(worker: task_worker.TaskWorker, reserved: int) -> bool:
+    """
+    Check if a scope worker may run a task which does not require a scope, without
+    reducing the number of scope units available for timing tests below the reserved
+    capacity. Scope workers claiming a task from the shared queue count as busy.
+    """
+    global _running_tasks, _scope_workers, _claiming_workers
+    if reserved <= 0 or not worker.test_unit.has_tag(TUTAG_SCOPE):
+        return True
+    busy_cnt = 0
+    for w, t in _running_tasks.items():
+        if w in _scope_workers and not t.use_tagged_test_unit:
+            busy_cnt += 1
+    for w in _claiming_workers:
+        if w in _scope_workers and w is not worker:
+            busy_cnt += 1
+    return busy_cnt < len(_scope_workers) - reserved
+
+
+def _select_task(
+    worker: task_worker.TaskWorker,
+    tasks: list[_T],
+    conf: cnf.Config,
+    may_run_general: bool,
+) -> _T | None:
+    """
+    Select the task a worker should run next from an ordered list of tasks.
+    ``may_run_general`` is the result of :py:func:`_may_run_general_task` for the worker.
+    """
+    scope_worker = worker.test_unit.has_tag(TUTAG_SCOPE)
+    prefer_scope_tasks = scope_worker and conf.tu_scope_preference
+    next_task = None
+    general_task = None
+    for task in tasks:
+        if worker.test_unit in task.excluded_test_units:
+            continue
+        if task.use_specific_test_unit:
+            if task.specific_test_unit == worker.test_unit:
+                next_task = task
+        elif task.use_tagged_test_unit:
+            if worker.test_unit.has_tag(task.test_unit_tag):
+                next_task = task
+        elif prefer_scope_tasks:
+            if general_task is None:
+                general_task = task
+        else:
+            general_task = task
+            break
+
+        if next_task is not None:
+            break
+
+    if next_task is None and general_task is not None and may_run_general:
+        next_task = general_task
+    return next_task
+
+
+def _claim_shared_task(
+    worker: task_worker.TaskWorker, conf: cnf.Config, may_run_general: bool
+) -> QueuedTask | None:
+    """
+    Lease the next task for a worker from the shared queue. The selection is retried if
+    another instance leased the selected task in the meantime.
+    """
+    _update_band_width(conf.priority_band_width)
+    name = shared_queue.node_name()
+    prefer_tagged = worker.test_unit.has_tag(TUTAG_SCOPE) and conf.tu_scope_preference
+    for _ in range(SHARED_QUEUE_CLAIM_RETRIES):
+        candidates = QueuedTask.get_available(
+            tags=worker.test_unit.tags,
+            prefer_tagged=prefer_tagged,
+        )
+        candidates.sort(key=lambda t: (_task_order_key(t), t.id))  # type: ignore
+        queued_task = _select_task(worker, candidates, conf, may_run_general)
+        if queued_task is None:
+            return None
+        if QueuedTask.claim(queued_task.id, name, conf.queue_lease_s):
+            return queued_task
+    return None
+
+
+def _create_shared_task(queued_task: QueuedTask) -> TestCaseTask | None:
+    """
+    Create the task for a leased task from the shared queue. The lease is returned if
+    the task can't be created.
+    """
+    try:
+        tc_def = TestCaseDef.get_by_id(queued_task.test_case_id)
+        test_run = _get_shared_test_run(queued_task.test_set_id)
+    except Exception as ex:
+        logging.error(f"[SCHEDULER] Preparing {queued_task} failed. {ex}")
+        QueuedTask.release(queued_task.id, shared_queue.node_name())
+        return None
+    if test_run is None or tc_def is None:
+        logging.warning(f"[SCHEDULER] Remove outdated {queued_task} from queue.")
+        QueuedTask.remove(queued_task.id, shared_queue.node_name())
+        return None
+    with test_run.lock:
+        if test_run.superseded:
+            return None
+        test_run.in_flight += 1
+    task = test_run._create_task(tc_def, queued_task.priority)
+    task.queue_id = queued_task.id
+    task.attempts = queued_task.attempts
+    task.schedule_time = queued_task.schedule_time
+    task.expected_runtime = queued_task.expected_runtime
+    shared_queue.add_claim(queued_task.id)
+    return task
+
+
 def get_next_task(worker: task_worker.TaskWorker) -> Task | None:
     """
     Get the next task from the schedule queue. If a task is returned it is also removed
     from the queue.
 
+    Workers with a scope unit prefer tasks that require a scope (see
+    :py:attr:`~testsystem.config.Config.tu_scope_preference`). They fall back to
+    general tasks only if no task in the queue requires a scope, and only as long as
+    :py:attr:`~testsystem.config.Config.tu_scope_reserved` scope units stay free for
+    timing tests.
+
+    With the shared task queue, the task is leased from the database if no task is
+    queued in memory.
+
     :param worker: The worker which will run the task.
 
     :returns: Returns the next task in queue for the specific task worker or None if
         nothing is to be done.
     """
-    global _scheduled_tasks, _scheduled_tasks_lock
+    global _scheduled_tasks, _scheduled_tasks_lock, _running_tasks, _scope_workers
+    global _claiming_workers
+    conf = cnf.get_config()
     with _scheduled_tasks_lock:
-        next_task: Task | None = None
-        for i in range(len(_scheduled_tasks)):
-            task = _scheduled_tasks[i]
-            if task.use_specific_test_unit:
-                if task.specific_test_unit == worker.test_unit:
-                    next_task = task
-            elif task.use_tagged_test_unit:
-                if worker.test_unit.has_tag(task.test_unit_tag):
-                    next_task = task
-            else:
-                next_task = task
-
-            if next_task is not None:
-                break
-
+        _running_tasks.pop(worker, None)
+        if worker.test_unit.has_tag(TUTAG_SCOPE):
+            _scope_workers.add(worker)
+        may_run_general = _may_run_general_task(worker, conf.tu_scope_reserved)
+        next_task = _select_task(worker, _scheduled_tasks, conf, may_run_general)
         if next_task is not None:
             _scheduled_tasks.remove(next_task)
+            _running_tasks[worker] = next_task
             logging.info(
                 f"[SCHEDULER] Assign {next_task} to {worker}. There are"
                 f" {len(_scheduled_tasks)} remaining tasks in queue."
             )
+            return next_task
+        if not shared_queue.enabled():
+            return None
+        # Reserve the worker, the database is queried without holding the lock
+        _claiming_workers.add(worker)
 
-        return next_task
+    shared_task = None
+    try:
+        queued_task = _claim_shared_task(worker, conf, may_run_general)
+        if queued_task is not None:
+            shared_task = _create_shared_task(queued_task)
+    finally:
+        with _scheduled_tasks_lock:
+            _claiming_workers.discard(worker)
+            if shared_task is not None:
+                _running_tasks[worker] = shared_task
+    if shared_task is not None:
+        logging.info(f"[SCHEDULER] Assign {shared_task} from shared queue to {worker}.")
+    return shared_task
+
+
+def clear():
+    """
+    Remove all queued tasks and reset the scheduling state. The scheduling thread must
+    not be running.
+    """
+    global _scheduled_tasks, _scheduled_tasks_lock, _running_tasks, _scope_workers
+    global _active_test_runs, _active_test_runs_lock, _pending_commits
+    global _last_prio_reset_timestamp, _claiming_workers
+    with _scheduled_tasks_lock:
+        _scheduled_tasks.clear()
+        _running_tasks.clear()
+        _scope_workers.clear()
+        _claiming_workers.clear()
+    with _active_test_runs_lock:
+        _active_test_runs.clear()
+    _pending_commits.clear()
+    _last_prio_reset_timestamp = 0
 
 
 def queue_size() -> int:
     """
     Get the current queue size. The result is not guaranteed to be still valid when read
-    by the caller.
+    by the caller. With the shared task queue, this includes all tasks in the database,
+    which are not leased by any test system instance.
 
     :returns: Queue length.
     """
     global _scheduled_tasks_lock, _scheduled_tasks
     with _scheduled_tasks_lock:
-        return len(_scheduled_tasks)
+        queue_len = len(_scheduled_tasks)
+    if shared_queue.enabled():
+        queue_len += QueuedTask.count_available()
+    return queue_len
@@ -0,0 +1,159 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Coordination of test system instances sharing a task queue in the database (see
+:py:attr:`~testsystem.config.Config.queue_backend`). A heartbeat thread renews the
+leases of all tasks this instance executes and competes for the leader lease. Only the
+leader polls the group repositories for new commits.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import logging
+import threading
+import testsystem.config as cnf
+
+from testsystem.models import QueuedTask, Lease
+from testsystem.constants import LEADER_LEASE_NAME
+
+_claimed_ids: set[int] = set()
+_claimed_ids_lock = threading.Lock()
+_leader = False
+
+_heartbeat_stop_event = threading.Event()
+_heartbeat_thread: threading.Thread | None = None
+
+
+def enabled() -> bool:
+    """
+    Check if the shared task queue is used.
+
+    :returns: Returns ``True`` if the queue is stored in the database.
+    """
+    return cnf.get_config().queue_backend == "database"
+
+
+def node_name() -> str:
+    """
+    Get the name of this test system instance.
+
+    :returns: The configured node name or a name derived from host name and process id.
+    """
+    name = cnf.get_config().node_name
+    if name != "":
+        return name
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def is_leader() -> bool:
+    """
+    Check if this test system instance is the leader. Without shared task queue, the
+    instance is always the leader.
+
+    :returns: Returns ``True`` if this instance polls the group repositories.
+    """
+    global _leader
+    return not enabled() or _leader
+
+
+def add_claim(queue_id: int):
+    """
+    Renew the lease of a queued task on each heartbeat until it is removed.
+
+    :param queue_id: The id of the leased task.
+    """
+    with _claimed_ids_lock:
+        _claimed_ids.add(queue_id)
+
+
+def remove_claim(queue_id: int):
+    """
+    Stop renewing the lease of a queued task.
+
+    :param queue_id: The id of the leased task.
+    """
+    with _claimed_ids_lock:
+        _claimed_ids.discard(queue_id)
+
+
+def heartbeat():
+    """
+    Renew the leases of all running tasks and acquire or renew the leader lease.
+    """
+    global _leader
+    conf = cnf.get_config()
+    name = node_name()
+    with _claimed_ids_lock:
+        queue_ids = list(_claimed_ids)
+    renewed_cnt = QueuedTask.renew(queue_ids, name, conf.queue_lease_s)
+    if renewed_cnt < len(queue_ids):
+        logging.warning(
+            f"[QUEUE] Lost the lease of {len(queue_ids) - renewed_cnt} running tasks."
+        )
+    leader = Lease.acquire(LEADER_LEASE_NAME, name, conf.queue_lease_s)
+    if leader != _leader:
+        logging.info(f"[QUEUE] {name} is {'now' if leader else 'no longer'} leader.")
+    _leader = leader
+
+
+def _run_heartbeat(stop_event: threading.Event):
+    logging.info("[QUEUE] Started successful.")
+    while not stop_event.wait(max(1, cnf.get_config().queue_heartbeat_s)):
+        try:
+            heartbeat()
+        except Exception as ex:
+            logging.error(f"[QUEUE] Heartbeat failed.", exc_info=ex)
+    logging.info("[QUEUE] Stopped successful.")
+
+
+def start():
+    """
+    Starts the heartbeat thread. The first heartbeat is sent before this call returns,
+    so the leader role is already decided.
+    """
+    global _heartbeat_thread, _heartbeat_stop_event
+    assert _heartbeat_thread is None
+    logging.info(f"[QUEUE] Starting {node_name()}...")
+    heartbeat()
+    _heartbeat_stop_event.clear()
+    _heartbeat_thread = threading.Thread(
+        target=_run_heartbeat, args=(_heartbeat_stop_event,)
+    )
+    _heartbeat_thread.start()
+
+
+def stop():
+    """
+    Stops the heartbeat thread and releases the leader lease.
+    """
+    global _heartbeat_thread, _heartbeat_stop_event, _leader
+    assert _heartbeat_thread is not None
+    logging.info("[QUEUE] Stopping...")
+    _heartbeat_stop_event.set()
+    _heartbeat_thread.join()
+    _heartbeat_thread = None
+    if _leader:
+        Lease.release(LEADER_LEASE_NAME, node_name())
+        _leader = False
@@ -0,0 +1,612 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Discrete-event simulation of the task scheduling. The simulation drives the real
+scheduling module (:py:mod:`testsystem.scheduling`) and real
+:py:class:`~testsystem.models.Group` objects with a virtual clock, synthetic commit
+traces, simulated test units and task durations. The polling pass of the scheduler runs
+unchanged, with the git repositories, the test set queries and the test run setup
+replaced by simulated ones. No hardware and no git repositories are required. The
+database is replaced with an in-memory database for the duration of a simulation run.
+"""
+
+from __future__ import annotations
+
+import copy
+import random
+import contextlib
+import unittest.mock as mock
+import numpy as np
+import sqlalchemy as sa
+import testsystem.db as db
+import testsystem.config as cnf
+import testsystem.scheduling as scheduling
+
+from sqlalchemy.pool import StaticPool
+from testsystem.models import Task, Group, GroupShare
+from testsystem.constants import TUTAG_SCOPE
+
+SIM_TERM = "SIM"
+
+
+class SimTestCase:
+    """
+    Simulated test case.
+
+    :param runtime: Mean runtime of the test case in seconds.
+    :param timing: Flag if the test case requires a test unit with a scope.
+    """
+
+    def __init__(self, runtime: float, timing: bool = False):
+        self.runtime = runtime
+        self.timing = timing
+
+
+class SimCommit:
+    """
+    Simulated commit of a group.
+
+    :param timestamp: Push time in seconds relative to the simulation start.
+    :param group_nr: The group number.
+    :param tagged: Flag if the commit is tagged with a force test tag.
+    """
+
+    def __init__(self, timestamp: float, group_nr: int, tagged: bool = False):
+        self.timestamp = timestamp
+        self.group_nr = group_nr
+        self.tagged = tagged
+        self.id = 0
+
+
+class SimTestUnit:
+    """
+    Simulated test unit.
+
+    :param name: Name of the test unit.
+    :param scope: Flag if the test unit has a scope connected.
+    """
+
+    def __init__(self, name: str, scope: bool = False):
+        self.name = name
+        self.scope = scope
+        self.busy_time = 0.0
+
+    def __repr__(self) -> str:
+        return self.name
+
+    def is_available(self) -> bool:
+        return True
+
+    def has_tag(self, tag: str | None) -> bool:
+        return tag is None or (self.scope and tag == TUTAG_SCOPE)
+
+
+class _SimWorker:
+    def __init__(self, test_unit: SimTestUnit):
+        self.test_unit = test_unit
+        self.task: SimTask | None = None
+        self.busy_until = 0.0
+
+    def __repr__(self) -> str:
+        return f"Worker {self.test_unit.name}"
+
+
+class SimTask(Task):
+    """
+    Simulated test case task.
+    """
+
+    def __init__(
+        self,
+        test_run: SimTestRun,
+        test_case: SimTestCase,
+        priority: float,
+        duration: float,
+    ):
+        tag = TUTAG_SCOPE if test_case.timing else None
+        super().__init__(priority, tag=tag)
+        self.test_run = test_run
+        self.expected_runtime = test_case.runtime
+        self.duration = duration
+
+    def __repr__(self) -> str:
+        return f"Simulated Task (Group={self.test_run.group.group_nr})"
+
+
+class _SimTestSet:
+    def __init__(self, id: int, group_id: int, commit_hash: str):
+        self.id = id
+        self.group_id = group_id
+        self.commit_hash = commit_hash
+        self.finished = False
+
+
+class SimTestRun:
+    """
+    Simulated test run for a commit of a group. It is registered as active test run of
+    the scheduler, so the scheduler can supersede it.
+    """
+
+    def __init__(self, test_set_id: int, group: Group, commit: SimCommit, tagged: bool):
+        self.test_set = _SimTestSet(test_set_id, group.id, str(commit.id))
+        self.group = group
+        self.commit = commit
+        self.tagged = tagged
+        self.tasks: list[SimTask] = []
+        self.remaining_cnt = 0
+        self.superseded = False
+        self.finish_time: float | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.finish_time is not None
+
+    @property
+    def completed(self) -> bool:
+        return self.finished
+
+    def supersede(self) -> bool:
+        scheduling.unschedule_tasks(self.tasks)  # type: ignore
+        self.superseded = True
+        scheduling._unregister_test_run(self)  # type: ignore
+        return True
+
+
+class _SimRepositories:
+    """
+    Replaces the group repositories (:py:mod:`testsystem.filesystem`) for the
+    scheduler.
+    """
+
+    def __init__(self):
+        self.heads: dict[str, SimCommit] = {}
+        self.tagged_commits: dict[str, list[SimCommit]] = {}
+
+    def load_group(self, group_name: str):
+        pass
+
+    def get_latest_commit(self, group_name: str) -> str:
+        return str(self.heads[group_name].id)
+
+    def get_tagged_group_commit(self, group_name: str, tags: list[str]) -> list[str]:
+        return [str(c.id) for c in self.tagged_commits.get(group_name, [])]
+
+
+class _SimTestSets:
+    """
+    Replaces the test set queries (:py:class:`~testsystem.models.TestSet`) for the
+    scheduler.
+    """
+
+    def __init__(self):
+        self.latest: dict[int, _SimTestSet] = {}
+        self.commits: set[tuple[int, str]] = set()
+
+    def get_latest_test_sets(self, group_ids: list[int]) -> dict[int, _SimTestSet]:
+        return {id: self.latest[id] for id in group_ids if id in self.latest}
+
+    def get_existing_commits(
+        self, candidates: list[tuple[int, str]]
+    ) -> set[tuple[int, str]]:
+        return set(candidates) & self.commits
+
+
+class Workload:
+    """
+    Synthetic workload for a simulation.
+
+    :param group_cnt: Number of groups.
+    :param commits: Commit trace. Commits are sorted by push time.
+    :param test_cases: Test cases executed for each commit.
+    :param runtime_jitter: Relative standard deviation of the actual task runtime.
+    """
+
+    def __init__(
+        self,
+        group_cnt: int,
+        commits: list[SimCommit],
+        test_cases: list[SimTestCase],
+        runtime_jitter: float = 0.1,
+    ):
+        self.group_cnt = group_cnt
+        self.commits = sorted(commits, key=lambda c: c.timestamp)
+        for i, commit in enumerate(self.commits):
+            commit.id = i
+        self.test_cases = test_cases
+        self.runtime_jitter = runtime_jitter
+
+    @staticmethod
+    def default_test_cases(
+        general_cnt: int = 45, timing_cnt: int = 12, seed: int = 0
+    ) -> list[SimTestCase]:
+        """
+        Create a set of test cases similar to a full test run.
+
+        :param general_cnt: Number of test cases without timing requirements.
+        :param timing_cnt: Number of timing test cases.
+        :param seed: Seed for the random runtimes.
+
+        :returns: List of test cases.
+        """
+        rnd = random.Random(seed)
+        test_cases = [SimTestCase(rnd.uniform(8, 20)) for _ in range(general_cnt)]
+        test_cases += [
+            SimTestCase(rnd.uniform(30, 60), True) for _ in range(timing_cnt)
+        ]
+        return test_cases
+
+    @classmethod
+    def generate(
+        cls,
+        group_cnt: int = 20,
+        duration_h: float = 8,
+        commits_per_group_h: float = 0.5,
+        burst_prob: float = 0.3,
+        burst_size: int = 3,
+        tagged_prob: float = 0.05,
+        test_cases: list[SimTestCase] | None = None,
+        seed: int = 0,
+    ) -> Workload:
+        """
+        Generate a workload with Poisson commit arrivals per group. A push may be
+        followed by a burst of further pushes within a few minutes.
+
+        :param group_cnt: Number of groups.
+        :param duration_h: Duration of the commit trace in hours.
+        :param commits_per_group_h: Mean push rate per group and hour.
+        :param burst_prob: Probability of a push being followed by a burst.
+        :param burst_size: Number of additional pushes in a burst.
+        :param tagged_prob: Probability of a commit being tagged.
+        :param test_cases: Test cases for each commit. If not set, the default test
+            cases are used.
+        :param seed: Random seed.
+
+        :returns: The generated workload.
+        """
+        rnd = random.Random(seed)
+        if test_cases is None:
+            test_cases = cls.default_test_cases(seed=seed)
+        duration_s = duration_h * 3600
+        commits = []
+        for group_nr in range(1, group_cnt + 1):
+            timestamp = rnd.expovariate(commits_per_group_h / 3600)
+            while timestamp < duration_s:
+                commits.append(
+                    SimCommit(timestamp, group_nr, rnd.random() < tagged_prob)
+                )
+                if rnd.random() < burst_prob:
+                    burst_time = timestamp
+                    for _ in range(burst_size):
+                        burst_time += rnd.uniform(10, 90)
+                        commits.append(
+                            SimCommit(burst_time, group_nr, rnd.random() < tagged_prob)
+                        )
+                timestamp += rnd.expovariate(commits_per_group_h / 3600)
+        return cls(group_cnt, commits, test_cases)
+
+
+class SimResult:
+    """
+    Metrics of a simulation run.
+    """
+
+    def __init__(self):
+        #: Simulated time in seconds until the last task finished.
+        self.duration = 0.0
+        #: Number of test runs with a report.
+        self.reports = 0
+        #: Number of superseded test runs.
+        self.superseded = 0
+        #: Time from each push until a report for this or a newer commit of the group.
+        self.time_to_report: list[float] = []
+        #: Mean time to report per group number.
+        self.group_time_to_report: dict[int, float] = {}
+        #: Busy time per test unit name.
+        self.busy_time: dict[str, float] = {}
+        #: Names of the test units with a scope.
+        self.scope_units: list[str] = []
+
+    @property
+    def throughput(self) -> float:
+        """
+        Reports per hour.
+        """
+        if self.duration <= 0:
+            return 0.0
+        return self.reports / (self.duration / 3600)
+
+    def percentile(self, q: float) -> float:
+        """
+        Percentile of the time to report in seconds.
+
+        :param q: Percentile between 0 and 100.
+        """
+        if len(self.time_to_report) == 0:
+            return float("nan")
+        return float(np.percentile(self.time_to_report, q))
+
+    @property
+    def fairness(self) -> float:
+        """
+        Jain's fairness index of the mean time to report per group. ``1`` means all
+        groups wait equally long for their reports.
+        """
+        values = np.array(list(self.group_time_to_report.values()))
+        if len(values) == 0 or np.sum(values**2) == 0:
+            return 1.0
+        return float(np.sum(values) ** 2 / (len(values) * np.sum(values**2)))
+
+    def utilisation(self, scope: bool | None = None) -> float:
+        """
+        Fraction of the simulated time the test units were busy.
+
+        :param scope: If set, only consider test units with (``True``) or without
+            (``False``) scope.
+        """
+        names = [
+            n
+            for n in self.busy_time
+            if scope is None or (n in self.scope_units) == scope
+        ]
+        if len(names) == 0 or self.duration <= 0:
+            return 0.0
+        busy_time = sum(self.busy_time[n] for n in names)
+        return busy_time / (len(names) * self.duration)
+
+    def summary(self) -> str:
+        """
+        One-line summary of the metrics.
+        """
+        return (
+            f"throughput={self.throughput:6.1f}/h"
+            f" p50={self.percentile(50):7.0f}s p95={self.percentile(95):7.0f}s"
+            f" p99={self.percentile(99):7.0f}s fairness={self.fairness:5.3f}"
+            f" util={self.utilisation():5.3f}"
+            f" scope-util={self.utilisation(True):5.3f}"
+            f" superseded={self.superseded}"
+        )
+
+
+class Simulation:
+    """
+    Discrete-event simulation of the scheduler.
+
+    :param workload: The workload to replay.
+    :param test_units: The simulated test unit pool.
+    :param config: Configuration used by the scheduler. Term and group ids are set by
+        the simulation.
+    :param poll_interval_s: Interval in which the simulated scheduler polls the groups.
+    :param seed: Random seed for task durations and polling order.
+    """
+
+    def __init__(
+        self,
+        workload: Workload,
+        test_units: list[SimTestUnit],
+        config: cnf.Config | None = None,
+        poll_interval_s: float = 30,
+        seed: int = 0,
+    ):
+        self.workload = workload
+        self.test_units = test_units
+        self.config = copy.copy(config if config is not None else cnf.Config())
+        self.config.term = SIM_TERM
+        self.config.group_ids = list(range(1, workload.group_cnt + 1))
+        self.poll_interval_s = poll_interval_s
+        self.seed = seed
+        self.now = 0.0
+
+    def run(self) -> SimResult:
+        """
+        Run the simulation.
+
+        :returns: The collected metrics.
+        """
+        engine = sa.create_engine(
+            "sqlite+pysqlite:///:memory:",
+            echo=False,
+            future=True,
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+        )
+        Group.flush_queue_times()
+        prev_engine = db.set_engine(engine)
+        cnf.set_config_override(self.config)
+        scheduling.clear()
+        scheduling.set_clock(lambda: self.now)
+        GroupShare.clear_cache()
+        self.__repos = _SimRepositories()
+        self.__test_sets = _SimTestSets()
+        try:
+            with contextlib.ExitStack() as stack:
+                stack.enter_context(mock.patch.object(scheduling, "fs", self.__repos))
+                stack.enter_context(
+                    mock.patch.object(scheduling, "TestSet", self.__test_sets)
+                )
+                stack.enter_context(
+                    mock.patch.object(scheduling, "_setup_tasks", self.__setup_tasks)
+                )
+                return self.__run()
+        finally:
+            scheduling.clear()
+            scheduling.set_clock(None)
+            GroupShare.clear_cache()
+            Group.flush_queue_times()
+            cnf.set_config_override(None)
+            db.set_engine(prev_engine)
+            engine.dispose()
+
+    def __run(self) -> SimResult:
+        self.now = 0.0
+        self.__rnd = random.Random(self.seed)
+        self.__result = SimResult()
+        self.__result.busy_time = {tu.name: 0.0 for tu in self.test_units}
+        self.__result.scope_units = [tu.name for tu in self.test_units if tu.scope]
+        self.__workers = [_SimWorker(tu) for tu in self.test_units]
+        self.__heads: dict[int, SimCommit] = {}
+        self.__tagged_commits: dict[int, list[SimCommit]] = {}
+        self.__waiting_commits: dict[int, list[SimCommit]] = {}
+        self.__scheduled_commits: set[int] = set()
+        self.__active_runs: list[SimTestRun] = []
+        self.__time_to_report: list[tuple[SimCommit, float]] = []
+        for tu in self.test_units:
+            tu.busy_time = 0.0
+
+        commits = self.workload.commits
+        commit_idx = 0
+        next_poll = 0.0
+        while True:
+            self.__finish_tasks()
+            while (
+                commit_idx < len(commits) and commits[commit_idx].timestamp <= self.now
+            ):
+                self.__push(commits[commit_idx])
+                commit_idx += 1
+            if self.now >= next_poll:
+                self.__poll()
+                next_poll += self.poll_interval_s
+            self.__dispatch()
+
+            if commit_idx >= len(commits) and not self.__pending():
+                break
+            busy = [w.busy_until for w in self.__workers if w.task is not None]
+            events = busy + [next_poll]
+            if commit_idx < len(commits):
+                events.append(commits[commit_idx].timestamp)
+            self.now = min(events)
+
+        self.__result.superseded = len([r for r in self.__active_runs if r.superseded])
+        self.__result.duration = max(
+            [r.finish_time for r in self.__active_runs if r.finish_time is not None]
+            + [self.now]
+        )
+        group_ttr: dict[int, list[float]] = {}
+        for commit, ttr in self.__time_to_report:
+            group_ttr.setdefault(commit.group_nr, []).append(ttr)
+            self.__result.time_to_report.append(ttr)
+        self.__result.group_time_to_report = {
+            nr: float(np.mean(v)) for nr, v in group_ttr.items()
+        }
+        return self.__result
+
+    def __pending(self) -> bool:
+        if any(w.task is not None for w in self.__workers):
+            return True
+        # Queued tasks, which can't be assigned to any idle test unit, are not pending.
+        for commit in self.__heads.values():
+            if commit.id not in self.__scheduled_commits:
+                return True
+        for commits in self.__tagged_commits.values():
+            if any(c.id not in self.__scheduled_commits for c in commits):
+                return True
+        return False
+
+    def __push(self, commit: SimCommit):
+        group_name = Group.get_name(commit.group_nr, SIM_TERM)
+        self.__heads[commit.group_nr] = commit
+        self.__repos.heads[group_name] = commit
+        self.__waiting_commits.setdefault(commit.group_nr, []).append(commit)
+        if commit.tagged:
+            self.__tagged_commits.setdefault(commit.group_nr, []).append(commit)
+            self.__repos.tagged_commits.setdefault(group_name, []).append(commit)
+
+    def __poll(self):
+        groups = Group.get_by_term(SIM_TERM)
+        scheduling._handle_priority_reset(groups)
+        self.__rnd.shuffle(groups)
+        # Groups without commits have no repository yet
+        groups = [g for g in groups if g.group_name in self.__repos.heads]
+        polling_pass = scheduling._PollingPass(groups, self.config.force_test_tags)
+        for group in groups:
+            tasks = scheduling._check_group_for_new_tasks(group, [], polling_pass)
+            tasks.extend(
+                scheduling._check_group_for_forced_tasks(group, [], polling_pass)
+            )
+            scheduling._schedule_tasks(tasks)
+
+    def __setup_tasks(
+        self,
+        group: Group,
+        commit: str,
+        tc_defs: list,
+        priority: float | None = None,
+        tagged: bool = False,
+    ) -> list[Task]:
+        # Replaces scheduling._setup_tasks
+        if priority is None:
+            priority = group.get_priority()
+        sim_commit = self.workload.commits[int(commit)]
+        test_run = SimTestRun(len(self.__active_runs) + 1, group, sim_commit, tagged)
+        jitter = self.workload.runtime_jitter
+        for tc in self.workload.test_cases:
+            duration = max(0.1, self.__rnd.gauss(tc.runtime, tc.runtime * jitter))
+            test_run.tasks.append(SimTask(test_run, tc, priority, duration))
+        test_run.remaining_cnt = len(test_run.tasks)
+        self.__scheduled_commits.add(sim_commit.id)
+        self.__test_sets.latest[group.id] = test_run.test_set
+        self.__test_sets.commits.add((group.id, commit))
+        self.__active_runs.append(test_run)
+        scheduling._register_test_run(test_run)  # type: ignore
+        return list(test_run.tasks)
+
+    def __dispatch(self):
+        workers = list(self.__workers)
+        self.__rnd.shuffle(workers)
+        for worker in workers:
+            if worker.task is not None or not worker.test_unit.is_available():
+                continue
+            task = scheduling.get_next_task(worker)  # type: ignore
+            if task is None:
+                continue
+            assert isinstance(task, SimTask)
+            task.test_unit = worker.test_unit  # type: ignore
+            task.start_time = self.now
+            task.test_run.group.add_queue_time(task.wait_time)
+            worker.task = task
+            worker.busy_until = self.now + task.duration
+
+    def __finish_tasks(self):
+        for worker in self.__workers:
+            task = worker.task
+            if task is None or worker.busy_until > self.now:
+                continue
+            worker.task = None
+            task.finish_time = worker.busy_until
+            self.__result.busy_time[worker.test_unit.name] += task.duration
+            test_run = task.test_run
+            test_run.group.add_service_time(task.duration)
+            if test_run.superseded:
+                continue
+            test_run.remaining_cnt -= 1
+            if test_run.remaining_cnt == 0:
+                self.__report(test_run, task.finish_time)
+
+    def __report(self, test_run: SimTestRun, timestamp: float):
+        test_run.finish_time = timestamp
+        test_run.test_set.finished = True
+        scheduling._unregister_test_run(test_run)  # type: ignore
+        self.__result.reports += 1
+        waiting = self.__waiting_commits.get(test_run.commit.group_nr, [])
+        for commit in [c for c in waiting if c.timestamp <= test_run.commit.timestamp]:
+            self.__time_to_report.append((commit, timestamp - commit.timestamp))
+            waiting.remove(commit)
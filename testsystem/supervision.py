@@ -0,0 +1,191 @@
+#
+# Copyright 2023 EAS Group
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the “Software”), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies
+# or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE
+# OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Supervision of running tasks. The supervision thread compares the runtime of each
+running test case task with its expected duration. Stragglers are duplicated on an idle
+compatible test unit (speculative execution), and hung tasks are cancelled by killing
+their external processes. If a worker does not return from a cancelled task, its thread
+is replaced.
+"""
+
+from __future__ import annotations
+
+import time
+import logging
+import threading
+import testsystem.config as cnf
+import testsystem.utils as utils
+import testsystem.scheduling as scheduling
+
+from testsystem.models import Task, TaskWorker, TestCaseTask, TestCaseRuntime
+from testsystem.constants import (
+    SUPERVISION_INTERVAL_S,
+    STRAGGLER_GRACE_S,
+    WORKER_RECYCLE_DELAY_S,
+)
+
+# Ids of tasks flagged as stragglers
+_stragglers: set[int] = set()
+# Task id -> timestamp of the cancellation
+_cancelled_tasks: dict[int, float] = {}
+_recycled_task_ids: set[int] = set()
+
+_supervision_stop_event = threading.Event()
+_supervision_thread: threading.Thread | None = None
+
+
+def get_straggler_limit(task: TestCaseTask, conf: cnf.Config) -> float:
+    """
+    Get the runtime after which a task is considered a straggler.
+
+    :param task: The running task.
+    :param conf: The current configuration.
+
+    :returns: The limit in seconds.
+    """
+    tc_def = task.test_case_def
+    expected = float(tc_def.runtime)
+    tc_runtime = TestCaseRuntime.get(tc_def.id)
+    if tc_runtime is not None and tc_runtime.count > 0:
+        expected = max(expected, tc_runtime.mean + 3 * tc_runtime.std)
+    return expected * conf.straggler_factor + STRAGGLER_GRACE_S
+
+
+def _has_idle_unit(task: Task, workers: list[TaskWorker]) -> bool:
+    for worker in workers:
+        if not worker.running or not worker.idle or worker.test_unit is task.test_unit:
+            continue
+        if worker.test_unit in task.excluded_test_units:
+            continue
+        if task.use_tagged_test_unit and not worker.test_unit.has_tag(
+            task.test_unit_tag
+        ):
+            continue
+        if worker.test_unit.is_available():
+            return True
+    return False
+
+
+def _cancel(worker: TaskWorker, task: Task, timestamp: float):
+    task_id = id(task)
+    cancel_timestamp = _cancelled_tasks.get(task_id, None)
+    if cancel_timestamp is None:
+        _cancelled_tasks[task_id] = timestamp
+        killed_cnt = utils.kill_processes(task.thread_id)
+        logging.error(
+            f"[SUPERVISOR] Cancel hung {task} on {worker}. Killed {killed_cnt}"
+            " processes."
+        )
+    elif (
+        timestamp - cancel_timestamp >= WORKER_RECYCLE_DELAY_S
+        and task_id not in _recycled_task_ids
+    ):
+        _recycled_task_ids.add(task_id)
+        worker.recycle()
+
+
+def check(workers: list[TaskWorker]):
+    """
+    Check all running tasks once. Stragglers are flagged and, if enabled, duplicated.
+    Hung tasks are cancelled.
+
+    :param workers: The workers of this test system instance.
+    """
+    conf = cnf.get_config()
+    if conf.straggler_factor <= 0:
+        return
+    timestamp = time.time()
+    running_tasks = scheduling.get_running_tasks()
+    running_ids = set([id(task) for _, task in running_tasks])
+    _stragglers.intersection_update(running_ids)
+    _recycled_task_ids.intersection_update(running_ids)
+    for task_id in list(_cancelled_tasks.keys()):
+        if task_id not in running_ids:
+            del _cancelled_tasks[task_id]
+
+    for worker, task in running_tasks:
+        if not isinstance(task, TestCaseTask):
+            continue
+        runtime = timestamp - task.start_time
+        limit = get_straggler_limit(task, conf)
+        if runtime < limit:
+            continue
+        if id(task) not in _stragglers:
+            _stragglers.add(id(task))
+            logging.warning(
+                f"[SUPERVISOR] {task} on {worker} is a straggler. Running for"
+                f" {int(runtime)}s, expected at most {int(limit)}s."
+            )
+            if conf.speculative_execution and _has_idle_unit(task, workers):
+                duplicate = scheduling.speculate(task)
+                if duplicate is not None:
+                    logging.info(f"[SUPERVISOR] Scheduled speculative {duplicate}.")
+        if conf.hung_task_factor > 0 and runtime >= limit * conf.hung_task_factor:
+            _cancel(worker, task, timestamp)
+
+
+def clear():
+    """
+    Reset the supervision state. The supervision thread must not be running.
+    """
+    _stragglers.clear()
+    _cancelled_tasks.clear()
+    _recycled_task_ids.clear()
+
+
+def _run_supervision(stop_event: threading.Event, workers: list[TaskWorker]):
+    logging.info("[SUPERVISOR] Started successful.")
+    while not stop_event.wait(SUPERVISION_INTERVAL_S):
+        try:
+            check(workers)
+        except Exception as ex:
+            logging.error(f"[SUPERVISOR] Task supervision failed.", exc_info=ex)
+    logging.info("[SUPERVISOR] Stopped successful.")
+
+
+def start(workers: list[TaskWorker]):
+    """
+    Starts the supervision thread.
+
+    :param workers: The workers to supervise.
+    """
+    global _supervision_thread, _supervision_stop_event
+    assert _supervision_thread is None
+    logging.info("[SUPERVISOR] Starting...")
+    _supervision_stop_event.clear()
+    _supervision_thread = threading.Thread(
+        target=_run_supervision, args=(_supervision_stop_event, workers)
+    )
+    _supervision_thread.start()
+
+
+def stop():
+    """
+    Stops the supervision thread.
+    """
+    global _supervision_thread, _supervision_stop_event
+    assert _supervision_thread is not None
+    logging.info("[SUPERVISOR] Stopping...")
+    _supervision_stop_event.set()
+    _supervision_thread.join()
+    _supervision_thread = None
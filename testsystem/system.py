@@ -30,6 +30,11 @@ import testsystem.selftest as selftest
 import testsystem.filesystem as fs
 import testsystem.reporting as reporting
 import testsystem.scheduling as scheduling
+import testsystem.accounting as accounting
+import testsystem.db_writer as db_writer
+import testsystem.shared_queue as shared_queue
+import testsystem.supervision as supervision
+import testsystem.publisher as publisher
 
 from testsystem.device_discovery import discover_pico_scopes
 from testsystem.models import (
@@ -148,7 +153,9 @@ def _startup_routine() -> list[TestUnit]:
 
     fs.init_fs()
     fs.load_public()
-    TestSet.delete_unfinished_test_sets()
+    # Unfinished test sets of a shared queue may belong to other instances
+    if not get_config().resume_test_runs and not shared_queue.enabled():
+        TestSet.delete_unfinished_test_sets()
 
     test_units, msps, pico_scopes = discover_process()
     if len(test_units) == 0:
@@ -179,21 +186,38 @@ def _idle():
 def _schedule_group_tasks():
     test_units = _startup_routine()
 
+    db_writer.start()
+    accounting.start()
+    if shared_queue.enabled():
+        shared_queue.start()
+    publisher.start()
+
     task_workers: list[TaskWorker] = []
     for i, tu in enumerate(test_units):
         worker = TaskWorker(tu, f"WORKER {i+1}")
         worker.start()
         task_workers.append(worker)
+    supervision.start(task_workers)
 
+    # With a shared queue, the leader resumes test runs in the scheduling thread
+    if get_config().resume_test_runs and not shared_queue.enabled():
+        scheduling.resume_unfinished_test_runs()
     scheduling.start()
 
     _idle()
 
     scheduling.stop()
+    supervision.stop()
 
     for worker in task_workers:
         worker.stop()
 
+    publisher.stop()
+    if shared_queue.enabled():
+        shared_queue.stop()
+    accounting.stop()
+    db_writer.stop()
+
 
 def _run():
     c = cnf.get_config()
@@ -30,10 +30,10 @@ import numpy as np
 import multiprocessing as mp
 import testsystem.filesystem as fs
 import testsystem.tool_chain as toolchain
-import testsystem.filesystem as fs
+import testsystem.impact as impact
 
 from testsystem.models import MSP430, TestCase, PicoMeasure
-from testsystem.utils import run_external_task
+from testsystem.utils import run_external_task, register_process, unregister_process
 from testsystem.constants import (
     MSP430_FLASHER,
     MSP430_ELF_SIZE,
@@ -215,6 +215,7 @@ def run_test(tc: TestCase, test_env: fs.TestEnv):
 
         tc.directory = fs.load_test_case(test_env, tc.name)
         toolchain.build_test_case(tc)
+        impact.record_dependencies(tc, test_env)
         if tc.timing:
             run_timing_test(tc)
         elif tc.size:
@@ -316,9 +317,13 @@ def run_timing_test(tc: TestCase):
         )
         process.start()
         logging.debug(f"Start timing measure in new process (PID={process.pid}).")
-        while not parent_conn.poll(0.1) and process.is_alive():
-            pass
-        process.join()
+        register_process(process)
+        try:
+            while not parent_conn.poll(0.1) and process.is_alive():
+                pass
+            process.join()
+        finally:
+            unregister_process(process)
         if process.exitcode == 0:
             logging.debug(
                 f"Timing measure process (PID={process.pid}) finished as expected."
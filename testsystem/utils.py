@@ -23,10 +23,15 @@ from __future__ import annotations
 
 import uuid
 import logging
+import threading
 import pandas as pd
 
 from subprocess import Popen, PIPE, TimeoutExpired
 
+# Thread id -> processes started by the thread, which are still running
+_external_processes: dict[int, list] = {}
+_external_processes_lock = threading.Lock()
+
 
 def get_uuid() -> int:
     return uuid.uuid4().int
@@ -67,6 +72,53 @@ def url_as_web_link(url: str) -> str:
         return url
 
 
+def register_process(process):
+    """
+    Register a process started by the current thread, so it can be killed by
+    :py:func:`kill_processes`.
+
+    :param process: A process with a ``kill`` method, e.g. a ``subprocess.Popen`` or a
+        ``multiprocessing.Process``.
+    """
+    with _external_processes_lock:
+        processes = _external_processes.setdefault(threading.get_ident(), [])
+        processes.append(process)
+
+
+def unregister_process(process):
+    """
+    Remove a process registered by the current thread.
+
+    :param process: The process to remove.
+    """
+    thread_id = threading.get_ident()
+    with _external_processes_lock:
+        processes = _external_processes.get(thread_id, [])
+        if process in processes:
+            processes.remove(process)
+        if len(processes) == 0:
+            _external_processes.pop(thread_id, None)
+
+
+def kill_processes(thread_id: int) -> int:
+    """
+    Kill all registered processes of a thread. This unblocks a thread waiting for a hung
+    external task.
+
+    :param thread_id: The identifier of the thread (see ``threading.get_ident``).
+
+    :returns: The number of killed processes.
+    """
+    with _external_processes_lock:
+        processes = list(_external_processes.get(thread_id, []))
+    for process in processes:
+        try:
+            process.kill()
+        except Exception as ex:
+            logging.warning(f"Failed to kill process (PID={process.pid}). {ex}")
+    return len(processes)
+
+
 def run_external_task(args, input=None, timeout=10) -> tuple[int, str, str]:
     """
     Interface to safely run an external task. This function should be used any time the
@@ -83,6 +135,7 @@ def run_external_task(args, input=None, timeout=10) -> tuple[int, str, str]:
     """
     process = Popen(args, stdin=PIPE, stderr=PIPE, stdout=PIPE)
     logging.debug(f"Run external task (PID={process.pid}): {args}")
+    register_process(process)
     try:
         if input is None:
             stdout, stderr = process.communicate(timeout=timeout)
@@ -100,6 +153,7 @@ def run_external_task(args, input=None, timeout=10) -> tuple[int, str, str]:
         raise ex
     finally:
         process.kill()
+        unregister_process(process)
 
 
 def to_bool(value: int | str) -> bool: